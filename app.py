@@ -2,19 +2,30 @@ import json
 import os
 import re
 import shutil
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional, List, Tuple, Dict
 from uuid import uuid4
 
-from flask import Flask, render_template, request, redirect, url_for, abort, send_file, flash
+from flask import Flask, Response, render_template, request, redirect, url_for, abort, send_file, flash, stream_with_context
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
 
 from services.quote_ingest import QuoteDraft, process_quote_submission
 from services.booking_ingest import BookingDraft, process_booking_submission
 from services.llm_client import LLMNotConfigured
-from services.todo_ingest import process_todo_submission
+from services.metrics import metrics
+from services.draft_lifecycle import READY, DraftIndex, DraftSweeper
+from services.draft_preview import PREVIEW_FILENAME, PreviewLog
+from services.ingest_queue import DONE, FAILED, QUEUED, IngestQueue
+from services.pdf_extract import pdf_pool
+from services.lead_cache import json_cache, start_watcher
+from services.lead_index import SUMMARY_SORT_COLUMNS, Page
+from services.lead_layout import LAYOUTS
+from services.lead_store import JsonLeadStore, LeadStore, SqliteLeadStore, next_index_key
+from services.text_blobs import BLOB_FIELDS, blob_bytes, move_blobs, read_blob, write_blobs
+from services.todo_ingest import TodoBatchIncomplete, process_todo_batch
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'skydesk-dev-secret')
@@ -31,38 +42,43 @@ LEAD_DIRECTORIES = {
     'booking': BOOKING_DIR,
 }
 
-RECORD_FILENAME = 'record.json'
-COMMUNICATIONS_FILENAME = 'communications.json'
-TODOS_FILENAME = 'todos.json'
+LEAD_INDEX_PATH = BASE_DIR / 'leads' / 'index.sqlite3'
+LEAD_DB_PATH = BASE_DIR / 'leads' / 'skydesk.sqlite3'
+# 'json' keeps the per-lead directory layout; 'sqlite' stores records in LEAD_DB_PATH
+STORAGE_BACKEND = os.environ.get('SKYDESK_STORAGE', 'json').strip().lower()
+# Where new lead directories go: flat (leads/<type>/<id>), date (<type>/<YYYY>/<MM>/<id>) or hash
+LEAD_LAYOUT = os.environ.get('SKYDESK_LEAD_LAYOUT', 'flat').strip().lower()
+# Parsed lead JSON files kept in memory; 0 disables the cache (handy when debugging)
+LEAD_CACHE_SIZE = int(os.environ.get('SKYDESK_LEAD_CACHE_SIZE', '4096'))
+# Evict cache entries on filesystem events as well (needs the optional watchdog package)
+LEAD_CACHE_WATCH = os.environ.get('SKYDESK_LEAD_CACHE_WATCH', '').strip().lower() in {'1', 'true', 'yes', 'on'}
+TODOS_PAGE_SIZE = 100
+COMMUNICATIONS_PAGE_SIZE = 50
+LEADS_PAGE_SIZE = 50
+LEADS_MAX_PAGE_SIZE = 200
+# PDF ingestion runs in a background pool; uploads redirect to a polling status page
+INGEST_WORKERS = int(os.environ.get('SKYDESK_INGEST_WORKERS', '2'))
+INGEST_MAX_ATTEMPTS = int(os.environ.get('SKYDESK_INGEST_ATTEMPTS', '3'))
+# How often the processing page's event stream checks for new preview fields, and when it gives up
+PREVIEW_POLL_SECONDS = 0.25
+PREVIEW_STREAM_SECONDS = 600
 
 TMP_DIR = BASE_DIR / 'tmp'
 QUOTE_DRAFT_DIR = TMP_DIR / 'quote_drafts'
 BOOKING_DRAFT_DIR = TMP_DIR / 'booking_drafts'
+DRAFT_INDEX_PATH = TMP_DIR / 'drafts.sqlite3'
+# Unconfirmed drafts idle this long are deleted, oldest first beyond the quota; 0 disables either limit
+DRAFT_TTL_HOURS = float(os.environ.get('SKYDESK_DRAFT_TTL_HOURS', '72'))
+DRAFT_QUOTA_MB = float(os.environ.get('SKYDESK_DRAFT_QUOTA_MB', '2048'))
+DRAFT_SWEEP_MINUTES = float(os.environ.get('SKYDESK_DRAFT_SWEEP_MINUTES', '15'))
 
-
-def get_record_payload_path(directory: Path, record_id: str) -> Path:
-    return directory / record_id / RECORD_FILENAME
-
-
-def get_record_directory(directory: Path, record_id: str) -> Path:
-    return directory / record_id
-
-
-def _load_json_object(path: Path) -> dict:
-    if not path.exists():
-        return {}
-    try:
-        with path.open('r', encoding='utf-8') as h:
-            data = json.load(h)
-            return data if isinstance(data, dict) else {}
-    except (OSError, json.JSONDecodeError):
-        return {}
-
-
-def _save_json_object(path: Path, data: dict) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open('w', encoding='utf-8') as h:
-        json.dump(data, h, indent=2)
+draft_index = DraftIndex(DRAFT_INDEX_PATH, {'quote': QUOTE_DRAFT_DIR, 'booking': BOOKING_DRAFT_DIR})
+draft_sweeper = DraftSweeper(
+    draft_index,
+    ttl=DRAFT_TTL_HOURS * 3600,
+    quota_bytes=int(DRAFT_QUOTA_MB * 1024 * 1024),
+    interval=DRAFT_SWEEP_MINUTES * 60,
+)
 
 
 def quote_draft_paths(draft_id: str) -> Tuple[Path, Path, Path]:
@@ -78,14 +94,18 @@ def save_quote_draft(draft_id: str, draft: QuoteDraft, *, notes: str, original_f
     draft_dir.mkdir(parents=True, exist_ok=True)
     data = {
         'parsed': draft.parsed,
-        'raw_response': draft.raw_response,
-        'transcript': draft.transcript,
+        # Transcript and raw answer go to gzip side files, loaded only when the source panel opens
+        'blobs': write_blobs(draft_dir, {'transcript': draft.transcript, 'raw_response': draft.raw_response}),
         'notes': notes,
         'original_filename': original_filename,
         'pdf_filename': 'source.pdf',
+        'template': draft.template,
+        'prompt_version': draft.prompt_version,
+        'timings': draft.timings,
     }
     with data_path.open('w', encoding='utf-8') as handle:
         json.dump(data, handle, indent=2)
+    draft_index.upsert('quote', draft_id, status=READY, original_filename=original_filename)
 
 
 def load_quote_draft(draft_id: str) -> Optional[dict]:
@@ -105,29 +125,19 @@ def delete_quote_draft(draft_id: str) -> None:
     draft_dir, _, _ = quote_draft_paths(draft_id)
     if draft_dir.exists():
         shutil.rmtree(draft_dir, ignore_errors=True)
+    draft_index.remove('quote', draft_id)
 
 
 def persist_quote(record_id: str, payload: dict, *, pdf_source: Path, metadata: dict) -> None:
-    record_dir = get_record_directory(QUOTE_DIR, record_id)
-    if record_dir.exists():
-        raise ValueError('A quote with this ID already exists.')
+    lead_store.create_record('quote', record_id, payload, metadata=metadata)
+    move_blobs(pdf_source.parent, lead_store.record_directory('quote', record_id), metadata.get('blobs'))
 
-    record_dir.mkdir(parents=True, exist_ok=True)
-
-    target_payload = record_dir / RECORD_FILENAME
-    with target_payload.open('w', encoding='utf-8') as handle:
-        json.dump(payload, handle, indent=2)
-
-    documents_dir = record_dir / 'documents'
+    documents_dir = lead_store.record_directory('quote', record_id) / 'documents'
     documents_dir.mkdir(parents=True, exist_ok=True)
     original_name = secure_filename(metadata.get('original_filename') or 'quote.pdf') or 'quote.pdf'
     target_pdf = documents_dir / original_name
     shutil.move(str(pdf_source), target_pdf)
 
-    meta_path = record_dir / 'metadata.json'
-    with meta_path.open('w', encoding='utf-8') as handle:
-        json.dump(metadata, handle, indent=2)
-
 
 def booking_draft_paths(draft_id: str) -> Tuple[Path, Path, Path]:
     draft_dir = BOOKING_DRAFT_DIR / draft_id
@@ -142,14 +152,18 @@ def save_booking_draft(draft_id: str, draft: BookingDraft, *, notes: str, origin
     draft_dir.mkdir(parents=True, exist_ok=True)
     data = {
         'parsed': draft.parsed,
-        'raw_response': draft.raw_response,
-        'transcript': draft.transcript,
+        # Transcript and raw answer go to gzip side files, loaded only when the source panel opens
+        'blobs': write_blobs(draft_dir, {'transcript': draft.transcript, 'raw_response': draft.raw_response}),
         'notes': notes,
         'original_filename': original_filename,
         'pdf_filename': 'source.pdf',
+        'template': draft.template,
+        'prompt_version': draft.prompt_version,
+        'timings': draft.timings,
     }
     with data_path.open('w', encoding='utf-8') as handle:
         json.dump(data, handle, indent=2)
+    draft_index.upsert('booking', draft_id, status=READY, original_filename=original_filename)
 
 
 def load_booking_draft(draft_id: str) -> Optional[dict]:
@@ -169,28 +183,48 @@ def delete_booking_draft(draft_id: str) -> None:
     draft_dir, _, _ = booking_draft_paths(draft_id)
     if draft_dir.exists():
         shutil.rmtree(draft_dir, ignore_errors=True)
+    draft_index.remove('booking', draft_id)
 
 
 def persist_booking(record_id: str, payload: dict, *, pdf_source: Path, metadata: dict) -> None:
-    record_dir = get_record_directory(BOOKING_DIR, record_id)
-    if record_dir.exists():
-        raise ValueError('A booking with this ID already exists.')
-
-    record_dir.mkdir(parents=True, exist_ok=True)
-
-    target_payload = record_dir / RECORD_FILENAME
-    with target_payload.open('w', encoding='utf-8') as handle:
-        json.dump(payload, handle, indent=2)
+    lead_store.create_record('booking', record_id, payload, metadata=metadata)
+    move_blobs(pdf_source.parent, lead_store.record_directory('booking', record_id), metadata.get('blobs'))
 
-    documents_dir = record_dir / 'documents'
+    documents_dir = lead_store.record_directory('booking', record_id) / 'documents'
     documents_dir.mkdir(parents=True, exist_ok=True)
     original_name = secure_filename(metadata.get('original_filename') or 'booking.pdf') or 'booking.pdf'
     target_pdf = documents_dir / original_name
     shutil.move(str(pdf_source), target_pdf)
 
-    meta_path = record_dir / 'metadata.json'
-    with meta_path.open('w', encoding='utf-8') as handle:
-        json.dump(metadata, handle, indent=2)
+
+def draft_blobs(draft: dict) -> dict:
+    """The draft's side-file header, writing the side files first for drafts that still hold the text inline."""
+    if draft.get('blobs') is not None:
+        return draft['blobs']
+    return write_blobs(draft['pdf_path'].parent, draft)
+
+
+def source_text_header(data: dict) -> dict:
+    """Which source texts a draft or metadata dict has, for the lazy source panel."""
+    if data.get('blobs') is not None:
+        return data['blobs']
+    return {field: {'chars': len(data[field])} for field in BLOB_FIELDS if data.get(field)}
+
+
+def send_text_blob(directory: Path, field: str, data: dict) -> Response:
+    """A transcript or raw answer as plain text, passing the stored gzip through when the client accepts it."""
+    compressed = blob_bytes(directory, field)
+    if compressed is not None and request.accept_encodings['gzip']:
+        response = Response(compressed, mimetype='text/plain')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    else:
+        text = read_blob(directory, field, data)
+        if text is None:
+            abort(404)
+        response = Response(text, mimetype='text/plain')
+    response.headers['Cache-Control'] = 'private, max-age=300'
+    return response
 
 
 def build_quote_timeline(payload: dict) -> List[dict]:
@@ -333,8 +367,7 @@ def build_booking_timeline(payload: dict) -> List[dict]:
 @app.route('/')
 @app.route('/dashboard')
 def dashboard():
-    leads_by_type = {key: load_leads(key) for key in LEAD_DIRECTORIES}
-    lead_totals = {key: len(items) for key, items in leads_by_type.items()}
+    lead_totals = {key: lead_store.count(key) for key in LEAD_DIRECTORIES}
 
     type_labels = {
         'enquiry': 'Enquiry',
@@ -342,40 +375,34 @@ def dashboard():
         'booking': 'Booking',
     }
 
-    def parse_sort_key(raw: Optional[str]) -> datetime:
-        if not raw:
-            return datetime.min
-        cleaned = raw.replace('Z', '+00:00') if raw.endswith('Z') else raw
-        try:
-            dt_value = datetime.fromisoformat(cleaned)
-            if dt_value.tzinfo is not None:
-                return dt_value.astimezone(timezone.utc).replace(tzinfo=None)
-            return dt_value
-        except ValueError:
-            pass
-        for fmt in ('%Y-%m-%d', '%d %b %Y'):
-            try:
-                return datetime.strptime(raw, fmt)
-            except ValueError:
-                continue
-        return datetime.min
-
     recent_leads = []
-    for record_type, items in leads_by_type.items():
-        for item in items:
-            enriched = item.copy()
-            enriched['type_label'] = type_labels.get(record_type, record_type.title())
-            enriched['detail_url'] = url_for('lead_detail', record_type=record_type, record_id=item['record_id'])
-            recent_leads.append(enriched)
+    for item in lead_store.recent(6):
+        record_type = item['record_type']
+        enriched = item.copy()
+        enriched['type_label'] = type_labels.get(record_type, record_type.title())
+        enriched['detail_url'] = url_for('lead_detail', record_type=record_type, record_id=item['record_id'])
+        recent_leads.append(enriched)
+
+    active_todos = collect_active_todos(type_labels=type_labels, limit=5)
+    more_count = max(lead_store.count_active_todos() - len(active_todos), 0)
+
+    # Uploads nobody has confirmed yet, straight from the draft index
+    pending_drafts = []
+    for item in draft_index.pending(limit=5):
+        enriched = item.copy()
+        enriched['type_label'] = type_labels.get(item['kind'], item['kind'].title())
+        enriched['status_url'] = url_for('draft_status', record_type=item['kind'], draft_id=item['draft_id'])
+        enriched['updated_display'] = datetime.fromtimestamp(item['updated_at']).strftime('%d %b %Y %H:%M')
+        pending_drafts.append(enriched)
 
-    recent_leads.sort(key=lambda lead: parse_sort_key(lead.get('submitted_at_value')), reverse=True)
-    recent_leads = recent_leads[:6]
-
-    all_todos = collect_active_todos(type_labels=type_labels)
-    active_todos = all_todos[:5]
-    more_count = max(len(all_todos) - len(active_todos), 0)
-
-    return render_template('dashboard.html', lead_totals=lead_totals, recent_leads=recent_leads, active_todos=active_todos, active_todos_more=more_count)
+    return render_template(
+        'dashboard.html',
+        lead_totals=lead_totals,
+        recent_leads=recent_leads,
+        active_todos=active_todos,
+        active_todos_more=more_count,
+        pending_drafts=pending_drafts,
+    )
 
 
 @app.route('/leads/new', methods=['GET', 'POST'])
@@ -459,48 +486,14 @@ def leads_new():
             quote_file.save(pdf_path)
 
             notes_value = (request.form.get('notes') or '').strip()
-
-            try:
-                draft = process_quote_submission(pdf_path, notes=notes_value)
-            except LLMNotConfigured as exc:
-                shutil.rmtree(draft_dir, ignore_errors=True)
-                error_messages = [str(exc)]
-                return (
-                    render_template(
-                        'leads_new.html',
-                        active_record_type='quote',
-                        form_data=form_defaults,
-                        field_errors={},
-                        error_messages=error_messages,
-                        month_options=month_options,
-                        year_options=year_options,
-                    ),
-                    500,
-                )
-            except Exception as exc:  # pragma: no cover - depends on external service
-                shutil.rmtree(draft_dir, ignore_errors=True)
-                error_messages = [f'Unable to parse the quote PDF: {exc}']
-                return (
-                    render_template(
-                        'leads_new.html',
-                        active_record_type='quote',
-                        form_data=form_defaults,
-                        field_errors={},
-                        error_messages=error_messages,
-                        month_options=month_options,
-                        year_options=year_options,
-                    ),
-                    500,
-                )
-
-            save_quote_draft(
+            ingest_queue.submit(
+                'quote',
                 draft_id,
-                draft,
                 notes=notes_value,
                 original_filename=quote_file.filename,
             )
-
-            return redirect(url_for('quote_confirm', draft_id=draft_id))
+            draft_index.upsert('quote', draft_id, status=QUEUED, original_filename=quote_file.filename)
+            return redirect(url_for('draft_status', record_type='quote', draft_id=draft_id))
 
         if record_type == 'booking':
             booking_file = request.files.get('booking_pdf')
@@ -540,48 +533,14 @@ def leads_new():
             booking_file.save(pdf_path)
 
             notes_value = (request.form.get('notes') or '').strip()
-
-            try:
-                draft = process_booking_submission(pdf_path, notes=notes_value)
-            except LLMNotConfigured as exc:
-                shutil.rmtree(draft_dir, ignore_errors=True)
-                error_messages = [str(exc)]
-                return (
-                    render_template(
-                        'leads_new.html',
-                        active_record_type='booking',
-                        form_data=form_defaults,
-                        field_errors={},
-                        error_messages=error_messages,
-                        month_options=month_options,
-                        year_options=year_options,
-                    ),
-                    500,
-                )
-            except Exception as exc:  # pragma: no cover - depends on external service
-                shutil.rmtree(draft_dir, ignore_errors=True)
-                error_messages = [f'Unable to parse the booking PDF: {exc}']
-                return (
-                    render_template(
-                        'leads_new.html',
-                        active_record_type='booking',
-                        form_data=form_defaults,
-                        field_errors={},
-                        error_messages=error_messages,
-                        month_options=month_options,
-                        year_options=year_options,
-                    ),
-                    500,
-                )
-
-            save_booking_draft(
+            ingest_queue.submit(
+                'booking',
                 draft_id,
-                draft,
                 notes=notes_value,
                 original_filename=booking_file.filename,
             )
-
-            return redirect(url_for('booking_confirm', draft_id=draft_id))
+            draft_index.upsert('booking', draft_id, status=QUEUED, original_filename=booking_file.filename)
+            return redirect(url_for('draft_status', record_type='booking', draft_id=draft_id))
 
         abort(400, description='Unsupported record type')
 
@@ -598,10 +557,50 @@ def leads_new():
 
 @app.route('/leads')
 def leads():
-    leads_by_type = {key: load_leads(key) for key in LEAD_DIRECTORIES}
     requested_type = (request.args.get('record_type') or 'enquiry').strip().lower()
     active_record_type = requested_type if requested_type in LEAD_DIRECTORIES else 'enquiry'
-    return render_template('leads.html', leads_by_type=leads_by_type, active_record_type=active_record_type)
+    sort = (request.args.get('sort') or 'submitted_at').strip().lower()
+    if sort not in SUMMARY_SORT_COLUMNS:
+        sort = 'submitted_at'
+    # Newest first by default, A-Z for the text columns
+    direction = (request.args.get('dir') or ('desc' if sort == 'submitted_at' else 'asc')).strip().lower()
+    if direction not in ('asc', 'desc'):
+        direction = 'asc'
+    per_page = min(max(request.args.get('per_page', LEADS_PAGE_SIZE, type=int), 1), LEADS_MAX_PAGE_SIZE)
+    search = (request.args.get('q') or '').strip()
+
+    total = lead_store.count(active_record_type, search=search)
+    result = lead_store.summary_page(
+        active_record_type,
+        sort=sort,
+        descending=direction == 'desc',
+        search=search,
+        limit=per_page,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+    )
+    page_count = max((total + per_page - 1) // per_page, 1)
+    return render_template(
+        'leads.html',
+        leads=result.rows,
+        active_record_type=active_record_type,
+        sort=sort,
+        direction=direction,
+        search=search,
+        page=page_number(result, page_count),
+        page_count=page_count,
+        next_cursor=result.next_cursor,
+        prev_cursor=result.prev_cursor,
+        per_page=per_page,
+        total=total,
+    )
+
+
+def page_number(result: Page, page_count: int) -> int:
+    """Position shown as "Page N of M"; it rides along in the URL next to the cursor."""
+    if result.prev_cursor is None:
+        return 1
+    return min(max(request.args.get('page', 2, type=int), 2), page_count)
 
 
 @app.route('/todos')
@@ -611,8 +610,93 @@ def todos():
         'quote': 'Quote',
         'booking': 'Booking',
     }
-    items = collect_active_todos(type_labels=type_labels)
-    return render_template('todos.html', items=items)
+    total = lead_store.count_active_todos()
+    result = lead_store.active_todo_page(
+        limit=TODOS_PAGE_SIZE, after=request.args.get('after'), before=request.args.get('before')
+    )
+    page_count = max((total + TODOS_PAGE_SIZE - 1) // TODOS_PAGE_SIZE, 1)
+    return render_template(
+        'todos.html',
+        items=label_active_todos(result.rows, type_labels=type_labels),
+        page=page_number(result, page_count),
+        page_count=page_count,
+        next_cursor=result.next_cursor,
+        prev_cursor=result.prev_cursor,
+        total=total,
+    )
+
+
+@app.route('/leads/<any(quote, booking):record_type>/processing/<draft_id>')
+def draft_status(record_type: str, draft_id: str):
+    confirm_url = url_for(f'{record_type}_confirm', draft_id=draft_id)
+    load_draft = load_quote_draft if record_type == 'quote' else load_booking_draft
+    job = ingest_queue.status(record_type, draft_id)
+    if job is None or job.get('status') == DONE:
+        if load_draft(draft_id):
+            return redirect(confirm_url)
+        abort(404)
+    return render_template('draft_status.html', job=job, record_type=record_type, draft_id=draft_id)
+
+
+@app.route('/leads/<any(quote, booking):record_type>/processing/<draft_id>/status')
+def draft_status_json(record_type: str, draft_id: str):
+    job = ingest_queue.status(record_type, draft_id)
+    if job is None:
+        abort(404)
+    return {
+        'status': job.get('status'),
+        'attempts': job.get('attempts'),
+        'error': job.get('error') if job.get('status') == FAILED else None,
+        'timings': job.get('timings') or {},
+        'confirm_url': url_for(f'{record_type}_confirm', draft_id=draft_id) if job.get('status') == DONE else None,
+    }
+
+
+@app.route('/metrics')
+def metrics_view():
+    """Rolling LLM and ingestion-stage histograms for this process, as JSON."""
+    return metrics.snapshot()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/leads/<any(quote, booking):record_type>/processing/<draft_id>/events')
+def draft_events(record_type: str, draft_id: str):
+    """Server-Sent Events: each extracted field as it arrives, then the final job status."""
+    if ingest_queue.status(record_type, draft_id) is None:
+        abort(404)
+    preview = PreviewLog(ingest_queue.directories[record_type] / draft_id / PREVIEW_FILENAME)
+    confirm_url = url_for(f'{record_type}_confirm', draft_id=draft_id)
+
+    def generate():
+        offset = 0
+        last_status = None
+        deadline = time.monotonic() + PREVIEW_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            # Read the job first so fields written just before it finished are still sent
+            job = ingest_queue.status(record_type, draft_id) or {}
+            events, offset = preview.read_from(offset)
+            for event in events:
+                yield _sse('field', event)
+            status = job.get('status')
+            if status != last_status:
+                last_status = status
+                yield _sse('status', {'status': status, 'attempts': job.get('attempts')})
+            if status == DONE:
+                yield _sse('done', {'confirm_url': confirm_url})
+                return
+            if status == FAILED or status is None:
+                return
+            if not events:
+                yield ': keep-alive\n\n'
+            time.sleep(PREVIEW_POLL_SECONDS)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @app.route('/leads/quote/confirm/<draft_id>', methods=['GET', 'POST'])
@@ -620,6 +704,8 @@ def quote_confirm(draft_id: str):
     draft = load_quote_draft(draft_id)
     if not draft:
         abort(404)
+    # A draft under review is in use: restart its TTL so the sweeper leaves it alone
+    draft_index.touch('quote', draft_id)
 
     payload = draft['parsed']
     error_message: Optional[str] = None
@@ -733,10 +819,11 @@ def quote_confirm(draft_id: str):
 
         if error_message is None:
             metadata = {
-                'raw_response': draft.get('raw_response'),
-                'transcript': draft.get('transcript'),
+                'blobs': draft_blobs(draft),
                 'notes': draft.get('notes'),
                 'original_filename': draft.get('original_filename'),
+                'prompt_version': draft.get('prompt_version'),
+                'timings': draft.get('timings'),
                 'saved_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
             }
             pdf_path: Path = draft['pdf_path']
@@ -756,8 +843,8 @@ def quote_confirm(draft_id: str):
         notes=draft.get('notes'),
         original_filename=draft.get('original_filename'),
         error_message=error_message,
-        raw_response=draft.get('raw_response'),
-        transcript=draft.get('transcript'),
+        source_text=source_text_header(draft),
+        extraction_warnings=(draft.get('timings') or {}).get('warnings') or [],
     )
 
 
@@ -766,6 +853,8 @@ def booking_confirm(draft_id: str):
     draft = load_booking_draft(draft_id)
     if not draft:
         abort(404)
+    # A draft under review is in use: restart its TTL so the sweeper leaves it alone
+    draft_index.touch('booking', draft_id)
 
     payload = draft['parsed']
     error_message: Optional[str] = None
@@ -921,10 +1010,11 @@ def booking_confirm(draft_id: str):
 
         if error_message is None:
             metadata = {
-                'raw_response': draft.get('raw_response'),
-                'transcript': draft.get('transcript'),
+                'blobs': draft_blobs(draft),
                 'notes': payload_candidate.get('notes'),
                 'original_filename': draft.get('original_filename'),
+                'prompt_version': draft.get('prompt_version'),
+                'timings': draft.get('timings'),
                 'saved_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
             }
             pdf_path: Path = draft['pdf_path']
@@ -949,12 +1039,29 @@ def booking_confirm(draft_id: str):
         notes=draft.get('notes'),
         original_filename=draft.get('original_filename'),
         error_message=error_message,
-        raw_response=draft.get('raw_response'),
-        transcript=draft.get('transcript'),
+        source_text=source_text_header(draft),
+        extraction_warnings=(draft.get('timings') or {}).get('warnings') or [],
         transactions=transactions,
     )
 
 
+@app.route('/leads/<any(quote, booking):record_type>/confirm/<draft_id>/source/<any(transcript, raw_response):field>')
+def draft_source_text(record_type: str, draft_id: str, field: str):
+    draft = load_quote_draft(draft_id) if record_type == 'quote' else load_booking_draft(draft_id)
+    if not draft:
+        abort(404)
+    return send_text_blob(draft['pdf_path'].parent, field, draft)
+
+
+@app.route('/leads/<any(quote, booking):record_type>/<record_id>/source/<any(transcript, raw_response):field>')
+def record_source_text(record_type: str, record_id: str, field: str):
+    if not lead_store.exists(record_type, record_id):
+        abort(404)
+    directory = lead_store.record_directory(record_type, record_id)
+    metadata = {} if blob_bytes(directory, field) is not None else lead_store.load_metadata(record_type, record_id)
+    return send_text_blob(directory, field, metadata)
+
+
 @app.route('/leads/quote/confirm/<draft_id>/pdf')
 def quote_draft_pdf(draft_id: str):
     draft = load_quote_draft(draft_id)
@@ -966,7 +1073,7 @@ def quote_draft_pdf(draft_id: str):
 
 @app.route('/leads/quote/<record_id>/document/<path:filename>')
 def quote_document(record_id: str, filename: str):
-    directory = (get_record_directory(QUOTE_DIR, record_id) / 'documents').resolve()
+    directory = (lead_store.record_directory('quote', record_id) / 'documents').resolve()
     file_path = (directory / filename).resolve()
     if not str(file_path).startswith(str(directory)) or not file_path.exists():
         abort(404)
@@ -984,7 +1091,7 @@ def booking_draft_pdf(draft_id: str):
 
 @app.route('/leads/booking/<record_id>/document/<path:filename>')
 def booking_document(record_id: str, filename: str):
-    directory = (get_record_directory(BOOKING_DIR, record_id) / 'documents').resolve()
+    directory = (lead_store.record_directory('booking', record_id) / 'documents').resolve()
     file_path = (directory / filename).resolve()
     if not str(file_path).startswith(str(directory)) or not file_path.exists():
         abort(404)
@@ -993,7 +1100,7 @@ def booking_document(record_id: str, filename: str):
 
 @app.route('/leads/enquiry/<record_id>/document/<path:filename>')
 def enquiry_document(record_id: str, filename: str):
-    directory = (get_record_directory(ENQUIRY_DIR, record_id) / 'documents').resolve()
+    directory = (lead_store.record_directory('enquiry', record_id) / 'documents').resolve()
     file_path = (directory / filename).resolve()
     if not str(file_path).startswith(str(directory)) or not file_path.exists():
         abort(404)
@@ -1007,19 +1114,12 @@ def lead_detail(record_type: str, record_id: str):
     if not directory:
         abort(404)
 
-    payload_path = get_record_payload_path(directory, record_id)
-    if not payload_path.exists():
-        abort(404)
-
-    try:
-        with payload_path.open('r', encoding='utf-8') as handle:
-            payload = json.load(handle)
-    except (OSError, json.JSONDecodeError):
+    payload = lead_store.load_record(record_type, record_id)
+    if payload is None:
         abort(404)
 
     default_timestamp = datetime.utcnow().strftime('%Y-%m-%dT%H:%M')
-    record_dir = get_record_directory(directory, record_id)
-    record_dir = get_record_directory(directory, record_id)
+    record_dir = lead_store.record_directory(record_type, record_id)
 
     def apply_journal_update() -> Optional[str]:
         form_type = request.form.get('form_type', 'notes')
@@ -1029,16 +1129,6 @@ def lead_detail(record_type: str, record_id: str):
             return 'notes'
 
         if form_type == 'log':
-            comm_index_path = record_dir / COMMUNICATIONS_FILENAME
-            index = _load_json_object(comm_index_path)
-            # derive next numeric key
-            next_idx = 1
-            if index:
-                try:
-                    next_idx = max(int(k) for k in index.keys() if str(k).isdigit()) + 1
-                except ValueError:
-                    next_idx = 1
-
             actor_raw = (request.form.get('actor') or '').strip().lower()
             direction_raw = (request.form.get('log_direction') or '').strip().lower()
             if not actor_raw:
@@ -1048,9 +1138,8 @@ def lead_detail(record_type: str, record_id: str):
                 'method': (request.form.get('log_method') or 'Unspecified').strip(),
                 'body': (request.form.get('log_body') or '').strip(),
             }
-            index[str(next_idx)] = entry
             try:
-                _save_json_object(comm_index_path, index)
+                lead_store.append_communication(record_type, record_id, entry)
             except OSError:
                 flash('Could not save the communication log.', 'error')
             return 'log'
@@ -1067,7 +1156,12 @@ def lead_detail(record_type: str, record_id: str):
             today_str = datetime.utcnow().strftime('%d-%m-%Y')
 
             try:
-                todo = process_todo_submission(lead_id=lead_id_for_todo, today=today_str, text=text)
+                # A pasted list ("call hotel by Fri; chase deposit 1 Nov") becomes one To Do per task
+                todos = process_todo_batch(lead_id=lead_id_for_todo, today=today_str, text=text)
+            except TodoBatchIncomplete as exc:
+                # Keep what was read locally; only the tasks that needed the assistant are reported
+                todos = exc.items
+                flash(f'{exc} Not added: ' + '; '.join(exc.unresolved), 'error')
             except LLMNotConfigured as exc:
                 # Fallback: store raw text locally without LLM enrichment
                 todos = payload.setdefault('todos', [])
@@ -1085,26 +1179,19 @@ def lead_detail(record_type: str, record_id: str):
                 flash(f'Unable to process task via assistant: {exc}', 'error')
                 return 'todo_add'
 
-            # Persist to standalone todos.json within the record directory
-            todos_index_path = record_dir / TODOS_FILENAME
-            existing = _load_json_object(todos_index_path)
-            next_idx = 1
-            if existing:
-                try:
-                    next_idx = max(int(k) for k in existing.keys() if str(k).isdigit()) + 1
-                except ValueError:
-                    next_idx = 1
-            entry_key = str(next_idx)
+            # Persist to the lead's standalone To Do index in a single write
+            existing = lead_store.load_todos(record_type, record_id)
             client_now = (request.form.get('client_now') or '').strip() or None
             created_at = client_now or datetime.utcnow().isoformat(timespec='seconds')
-            existing[entry_key] = {
-                'text': todo.task if 'todo' in locals() else text,
-                'due_date': (todo.date_to_be_done if 'todo' in locals() else None) or None,
-                'status': 'Active',
-                'created_at': created_at,
-            }
+            for todo in todos:
+                existing[next_index_key(existing)] = {
+                    'text': todo.task,
+                    'due_date': todo.date_to_be_done or None,
+                    'status': 'Active',
+                    'created_at': created_at,
+                }
             try:
-                _save_json_object(todos_index_path, existing)
+                lead_store.save_todos(record_type, record_id, existing)
             except OSError:
                 flash('Could not save the To Do file.', 'error')
             return 'todo_add'
@@ -1113,8 +1200,7 @@ def lead_detail(record_type: str, record_id: str):
             todo_id = (request.form.get('todo_id') or '').strip()
             desired_str = (request.form.get('done') or '').strip().lower()
             desired = True if desired_str in {'1', 'true', 'yes', 'on'} else False
-            todos_index_path = record_dir / TODOS_FILENAME
-            existing = _load_json_object(todos_index_path)
+            existing = lead_store.load_todos(record_type, record_id)
             if todo_id in existing:
                 existing[todo_id]['status'] = 'Completed' if desired else 'Active'
             else:
@@ -1123,15 +1209,14 @@ def lead_detail(record_type: str, record_id: str):
                         item['status'] = 'Completed' if desired else 'Active'
                         break
             try:
-                _save_json_object(todos_index_path, existing)
+                lead_store.save_todos(record_type, record_id, existing)
             except OSError:
                 flash('Could not update the To Do file.', 'error')
             return 'todo_toggle'
 
         if form_type == 'todo_delete':
             todo_id = (request.form.get('todo_id') or '').strip()
-            todos_index_path = record_dir / TODOS_FILENAME
-            existing = _load_json_object(todos_index_path)
+            existing = lead_store.load_todos(record_type, record_id)
             if todo_id in existing:
                 existing.pop(todo_id, None)
             else:
@@ -1143,7 +1228,7 @@ def lead_detail(record_type: str, record_id: str):
                 if to_remove:
                     existing.pop(to_remove, None)
             try:
-                _save_json_object(todos_index_path, existing)
+                lead_store.save_todos(record_type, record_id, existing)
             except OSError:
                 flash('Could not update the To Do file.', 'error')
             return 'todo_delete'
@@ -1180,8 +1265,7 @@ def lead_detail(record_type: str, record_id: str):
         update_kind = apply_journal_update()
         if update_kind:
             try:
-                with payload_path.open('w', encoding='utf-8') as handle:
-                    json.dump(payload, handle, indent=2)
+                lead_store.save_record(record_type, record_id, payload)
             except OSError:
                 abort(500)
             else:
@@ -1204,21 +1288,16 @@ def lead_detail(record_type: str, record_id: str):
         return redirect(url_for('lead_detail', record_type=record_type, record_id=record_id))
 
     # Prefer external communications index if available
-    comm_index_path = (get_record_directory(directory, record_id) / COMMUNICATIONS_FILENAME)
-    comm_index = _load_json_object(comm_index_path)
+    comm_limit = max(request.args.get('comm_limit', COMMUNICATIONS_PAGE_SIZE, type=int), 1)
+    comm_index = lead_store.load_communications(record_type, record_id, limit=comm_limit + 1)
+    communications_more = len(comm_index) > comm_limit
+    if communications_more:
+        comm_index.pop(min(comm_index, key=int))
     communications_source = comm_index if comm_index else (payload.get('communications', []) or [])
     communications_display = build_communication_entries(communications_source)
 
     if record_type == 'quote':
-        record_dir = get_record_directory(directory, record_id)
-        metadata = {}
-        metadata_path = record_dir / 'metadata.json'
-        if metadata_path.exists():
-            try:
-                with metadata_path.open('r', encoding='utf-8') as handle:
-                    metadata = json.load(handle)
-            except (OSError, json.JSONDecodeError):
-                metadata = {}
+        metadata = lead_store.load_metadata(record_type, record_id)
 
         documents: List[str] = []
         documents_dir = record_dir / 'documents'
@@ -1228,7 +1307,7 @@ def lead_detail(record_type: str, record_id: str):
         timeline_entries = build_quote_timeline(payload)
 
         # Build To Dos for UI from external file if available
-        todos_index = _load_json_object(record_dir / TODOS_FILENAME)
+        todos_index = lead_store.load_todos(record_type, record_id)
         todos_ui: List[dict] = []
         if todos_index:
             for key in sorted((k for k in todos_index.keys() if str(k).isdigit()), key=lambda x: int(x)):
@@ -1251,9 +1330,12 @@ def lead_detail(record_type: str, record_id: str):
             record_id=record_id,
             record=payload,
             metadata=metadata,
+            source_text=source_text_header(metadata),
             documents=documents,
             timeline_entries=timeline_entries,
             communications=communications_display,
+            communications_more=communications_more,
+            comm_limit=comm_limit,
             default_timestamp=default_timestamp,
             payments=None,
             status=None,
@@ -1261,15 +1343,7 @@ def lead_detail(record_type: str, record_id: str):
         )
 
     if record_type == 'booking':
-        record_dir = get_record_directory(directory, record_id)
-        metadata = {}
-        metadata_path = record_dir / 'metadata.json'
-        if metadata_path.exists():
-            try:
-                with metadata_path.open('r', encoding='utf-8') as handle:
-                    metadata = json.load(handle)
-            except (OSError, json.JSONDecodeError):
-                metadata = {}
+        metadata = lead_store.load_metadata(record_type, record_id)
 
         documents: List[str] = []
         documents_dir = record_dir / 'documents'
@@ -1281,7 +1355,7 @@ def lead_detail(record_type: str, record_id: str):
         timeline_entries = build_booking_timeline(payload)
 
         # Build To Dos for UI from external file if available
-        todos_index = _load_json_object(record_dir / TODOS_FILENAME)
+        todos_index = lead_store.load_todos(record_type, record_id)
         todos_ui: List[dict] = []
         if todos_index:
             for key in sorted((k for k in todos_index.keys() if str(k).isdigit()), key=lambda x: int(x)):
@@ -1304,11 +1378,14 @@ def lead_detail(record_type: str, record_id: str):
             record_id=record_id,
             record=payload,
             metadata=metadata,
+            source_text=source_text_header(metadata),
             documents=documents,
             payments=payments,
             status=status,
             timeline_entries=timeline_entries,
             communications=communications_display,
+            communications_more=communications_more,
+            comm_limit=comm_limit,
             default_timestamp=default_timestamp,
             todos=todos_ui,
         )
@@ -1334,7 +1411,7 @@ def lead_detail(record_type: str, record_id: str):
     ]
 
     # To Dos for enquiry
-    todos_index = _load_json_object((get_record_directory(directory, record_id) / TODOS_FILENAME))
+    todos_index = lead_store.load_todos(record_type, record_id)
     todos_ui: List[dict] = []
     if todos_index:
         for key in sorted((k for k in todos_index.keys() if str(k).isdigit()), key=lambda x: int(x)):
@@ -1380,6 +1457,8 @@ def lead_detail(record_type: str, record_id: str):
         travellers=traveller_fields,
         record_type_title=record_type.capitalize(),
         communications=communications_display,
+        communications_more=communications_more,
+        comm_limit=comm_limit,
         default_timestamp=default_timestamp,
         documents=documents,
     )
@@ -1418,7 +1497,8 @@ def build_communication_entries(raw_entries) -> List[dict]:
 
     Supports two shapes:
     - Legacy list of dicts with keys: timestamp, method, direction, note
-    - New dict index {"1": {who, method, body}, ...}
+    - Dict index {"1": {who, method, body}, ...} as returned by the lead store
+      (entries migrated from a legacy list keep their original keys)
     """
     # If provided a dict (new storage), convert to ordered list
     if isinstance(raw_entries, dict):
@@ -1428,13 +1508,13 @@ def build_communication_entries(raw_entries) -> List[dict]:
             if not isinstance(entry, dict):
                 continue
             who = (entry.get('who') or 'customer').strip().lower()
-            direction = 'outgoing' if who == 'consultant' else 'incoming'
+            direction = entry.get('direction') or ('outgoing' if who == 'consultant' else 'incoming')
             items.append(
                 {
-                    'timestamp': None,
+                    'timestamp': entry.get('timestamp'),
                     'method': (entry.get('method') or 'Unspecified').strip(),
                     'direction': direction,
-                    'note': (entry.get('body') or '').strip(),
+                    'note': (entry.get('body') or entry.get('note') or '').strip(),
                     '_seq_hint': int(key),
                 }
             )
@@ -1495,9 +1575,26 @@ def build_communication_entries(raw_entries) -> List[dict]:
     return prepared
 
 
-def collect_active_todos(*, type_labels: Dict[str, str]) -> List[dict]:
-    """Scan all records and collect active (not done) To Dos for dashboard display."""
+def collect_active_todos(*, type_labels: Dict[str, str], limit: int) -> List[dict]:
+    """The first ``limit`` active (not done) To Dos across all leads, in due-date order."""
+    return label_active_todos(lead_store.active_todo_page(limit=limit).rows, type_labels=type_labels)
+
+
+def label_active_todos(items: List[dict], *, type_labels: Dict[str, str]) -> List[dict]:
+    """To Do rows from the lead store with their type label and lead URL added."""
     results: List[dict] = []
+    for item in items:
+        record_type = item['record_type']
+        enriched = item.copy()
+        enriched['type_label'] = type_labels.get(record_type, record_type.title())
+        enriched['detail_url'] = url_for('lead_detail', record_type=record_type, record_id=item['record_id'])
+        results.append(enriched)
+    return results
+
+
+def collect_lead_todos(record_type: str, record_id: str, payload: dict, todos_index: dict) -> List[Tuple[str, dict]]:
+    """Active To Dos for one lead as (due sort key, item) pairs for the lead store."""
+    results: List[Tuple[str, dict]] = []
 
     def _parse_due(value: Optional[str]) -> datetime:
         if not value:
@@ -1509,66 +1606,45 @@ def collect_active_todos(*, type_labels: Dict[str, str]) -> List[dict]:
                 continue
         return datetime.max
 
-    for record_type, directory in LEAD_DIRECTORIES.items():
-        if not directory.exists():
+    # Prefer external todos index if available
+    todos: List[dict] = []
+    if todos_index:
+        for key in todos_index.keys():
+            item = todos_index.get(key) or {}
+            if isinstance(item, dict):
+                todos.append({
+                    'text': item.get('text') or '',
+                    'due_date': item.get('due_date') or None,
+                    'done': (item.get('status') or '').lower() == 'completed',
+                    'todo_id': str(key),
+                })
+    else:
+        todos = payload.get('todos') or []
+        if not isinstance(todos, list):
+            todos = []
+    name_display = payload.get('name') or (payload.get('client') or {}).get('name') or 'N/A'
+    for item in todos:
+        if not isinstance(item, dict):
             continue
-        for record_dir in directory.iterdir():
-            if not record_dir.is_dir():
-                continue
-            payload_path = record_dir / RECORD_FILENAME
-            if not payload_path.exists():
-                continue
-            try:
-                with payload_path.open('r', encoding='utf-8') as handle:
-                    payload = json.load(handle)
-            except (OSError, json.JSONDecodeError):
-                continue
-
-            # Prefer external todos index if available
-            todos_path = record_dir / TODOS_FILENAME
-            todos_index = _load_json_object(todos_path)
-            todos: List[dict] = []
-            if todos_index:
-                for key in todos_index.keys():
-                    item = todos_index.get(key) or {}
-                    if isinstance(item, dict):
-                        todos.append({
-                            'text': item.get('text') or '',
-                            'due_date': item.get('due_date') or None,
-                            'done': (item.get('status') or '').lower() == 'completed',
-                            'todo_id': str(key),
-                        })
-            else:
-                todos = payload.get('todos') or []
-                if not isinstance(todos, list):
-                    todos = []
-            name_display = payload.get('name') or (payload.get('client') or {}).get('name') or 'N/A'
-            for item in todos:
-                if not isinstance(item, dict):
-                    continue
-                if item.get('done') is True:
-                    continue
-                text = (item.get('text') or '').strip()
-                if not text:
-                    continue
-                due = (item.get('due_date') or '').strip()
-                results.append(
-                    {
-                        'record_id': record_dir.name,
-                        'record_type': record_type,
-                        'type_label': type_labels.get(record_type, record_type.title()),
-                        'text': text,
-                        'due_display': due or None,
-                        'due_sort': _parse_due(due),
-                        'name_display': name_display,
-                        'detail_url': url_for('lead_detail', record_type=record_type, record_id=record_dir.name),
-                        'todo_id': item.get('todo_id') or item.get('id') or '',
-                    }
-                )
-
-    results.sort(key=lambda x: (x['due_sort'], x['type_label'], x['name_display'].lower()))
-    for item in results:
-        item.pop('due_sort', None)
+        if item.get('done') is True:
+            continue
+        text = (item.get('text') or '').strip()
+        if not text:
+            continue
+        due = (item.get('due_date') or '').strip()
+        results.append(
+            (
+                _parse_due(due).isoformat(),
+                {
+                    'record_id': record_id,
+                    'record_type': record_type,
+                    'text': text,
+                    'due_display': due or None,
+                    'name_display': name_display,
+                    'todo_id': item.get('todo_id') or item.get('id') or '',
+                },
+            )
+        )
     return results
 
 
@@ -1668,13 +1744,7 @@ def build_enquiry_payload(form) -> Tuple[dict, Dict[str, str]]:
 
 
 def persist_enquiry(record_id: str, payload: dict) -> None:
-    ENQUIRY_DIR.mkdir(parents=True, exist_ok=True)
-    record_dir = ENQUIRY_DIR / record_id
-    record_dir.mkdir(parents=True, exist_ok=True)
-    target_path = record_dir / RECORD_FILENAME
-
-    with target_path.open('w', encoding='utf-8') as f:
-        json.dump(payload, f, indent=2)
+    lead_store.create_record('enquiry', record_id, payload)
 
 
 def default_enquiry_form() -> dict:
@@ -1719,71 +1789,123 @@ def get_year_options(span: int = 6) -> List[str]:
     return [str(current_year + offset) for offset in range(span)]
 
 
-def load_leads(record_type: str) -> List[dict]:
-    directory = LEAD_DIRECTORIES.get(record_type)
-    if not directory or not directory.exists():
-        return []
+def build_lead_summary(record_type: str, record_id: str, payload: dict) -> dict:
+    """Summary row shown on list pages; stored per lead in the lead index."""
+    trip_locations: List[str] = []
+    travel_display = 'N/A'
+    travel_value = 'zzzz'
 
-    records: List[dict] = []
-    for record_dir in sorted(directory.iterdir(), reverse=True):
-        if not record_dir.is_dir():
-            continue
+    submitted_raw = payload.get('submitted_at')
+    submitted_display = format_submitted_date(submitted_raw)
+    submitted_value = submitted_raw or ''
 
-        payload_path = record_dir / RECORD_FILENAME
-        if not payload_path.exists():
-            continue
+    if record_type == 'enquiry':
+        schedule = payload.get('schedule', {}) or {}
+        travel_display, travel_value = build_travel_dates(schedule)
+        trip_locations = [payload.get('destination')] if payload.get('destination') else []
+    else:
+        trip = payload.get('trip', {}) or {}
+        trip_locations = trip.get('locations') or []
+        dates = trip.get('dates', {}) or {}
+        start = dates.get('start')
+        end = dates.get('end')
+        if start and end:
+            travel_display = f"{format_travel_date(start)} - {format_travel_date(end)}"
+            travel_value = f"{start}|{end}"
+        elif dates.get('nights'):
+            travel_display = f"{dates.get('nights')} nights"
+        submitted_display = payload.get('issued_at') or submitted_display
+        submitted_value = payload.get('issued_at') or submitted_value
+
+    name_display = payload.get('name') or payload.get('client', {}).get('name') or 'N/A'
+    destination_display = payload.get('destination') or ', '.join(filter(None, trip_locations)) or 'N/A'
 
-        try:
-            with payload_path.open('r', encoding='utf-8') as handle:
-                payload = json.load(handle)
-        except (OSError, json.JSONDecodeError):
-            continue
+    return {
+        'record_id': record_id,
+        'record_type': record_type,
+        'submitted_at_display': submitted_display,
+        'submitted_at_value': submitted_value,
+        'name_display': name_display,
+        'name_value': name_display.lower(),
+        'destination_display': destination_display,
+        'destination_value': destination_display.lower(),
+        'travel_dates_display': travel_display,
+        'travel_dates_value': travel_value,
+    }
 
-        trip_locations: List[str] = []
-        travel_display = 'N/A'
-        travel_value = 'zzzz'
 
-        submitted_raw = payload.get('submitted_at')
-        submitted_display = format_submitted_date(submitted_raw)
-        submitted_value = submitted_raw or ''
+def parse_submitted_sort_key(raw: Optional[str]) -> datetime:
+    if not raw:
+        return datetime.min
+    cleaned = raw.replace('Z', '+00:00') if raw.endswith('Z') else raw
+    try:
+        dt_value = datetime.fromisoformat(cleaned)
+        if dt_value.tzinfo is not None:
+            return dt_value.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt_value
+    except ValueError:
+        pass
+    for fmt in ('%Y-%m-%d', '%d %b %Y'):
+        try:
+            return datetime.strptime(raw, fmt)
+        except ValueError:
+            continue
+    return datetime.min
+
+
+def run_ingest_job(kind: str, draft_dir: Path, job: dict) -> None:
+    """Worker body for ``ingest_queue``: extract the uploaded PDF and save the draft."""
+    params = job.get('params') or {}
+    notes_value = params.get('notes') or ''
+    # Fields are streamed to the processing page while the LLM is still writing
+    preview = PreviewLog(draft_dir / PREVIEW_FILENAME)
+    preview.reset()
+    if kind == 'quote':
+        _, _, pdf_path = quote_draft_paths(draft_dir.name)
+        draft = process_quote_submission(pdf_path, notes=notes_value, on_field=preview.append)
+        save_quote_draft(draft_dir.name, draft, notes=notes_value, original_filename=params.get('original_filename') or '')
+    else:
+        _, _, pdf_path = booking_draft_paths(draft_dir.name)
+        draft = process_booking_submission(pdf_path, notes=notes_value, on_field=preview.append)
+        save_booking_draft(draft_dir.name, draft, notes=notes_value, original_filename=params.get('original_filename') or '')
 
-        if record_type == 'enquiry':
-            schedule = payload.get('schedule', {}) or {}
-            travel_display, travel_value = build_travel_dates(schedule)
-            trip_locations = [payload.get('destination')] if payload.get('destination') else []
-        else:
-            trip = payload.get('trip', {}) or {}
-            trip_locations = trip.get('locations') or []
-            dates = trip.get('dates', {}) or {}
-            start = dates.get('start')
-            end = dates.get('end')
-            if start and end:
-                travel_display = f"{format_travel_date(start)} - {format_travel_date(end)}"
-                travel_value = f"{start}|{end}"
-            elif dates.get('nights'):
-                travel_display = f"{dates.get('nights')} nights"
-            submitted_display = payload.get('issued_at') or submitted_display
-            submitted_value = payload.get('issued_at') or submitted_value
-
-        name_display = payload.get('name') or payload.get('client', {}).get('name') or 'N/A'
-        destination_display = payload.get('destination') or ', '.join(filter(None, trip_locations)) or 'N/A'
-
-        records.append(
-            {
-                'record_id': record_dir.name,
-                'record_type': record_type,
-                'submitted_at_display': submitted_display,
-                'submitted_at_value': submitted_value,
-                'name_display': name_display,
-                'name_value': name_display.lower(),
-                'destination_display': destination_display,
-                'destination_value': destination_display.lower(),
-                'travel_dates_display': travel_display,
-                'travel_dates_value': travel_value,
-            }
-        )
 
-    return records
+def create_lead_store(backend: str) -> LeadStore:
+    builders = {
+        'summarise': build_lead_summary,
+        'sort_key': lambda summary: parse_submitted_sort_key(summary.get('submitted_at_value')).isoformat(),
+        'collect_todos': collect_lead_todos,
+        'layout': LEAD_LAYOUT,
+    }
+    if LEAD_LAYOUT not in LAYOUTS:
+        raise ValueError(f'Unknown SKYDESK_LEAD_LAYOUT: {LEAD_LAYOUT!r}')
+    if backend == 'sqlite':
+        return SqliteLeadStore(LEAD_DB_PATH, LEAD_DIRECTORIES, **builders)
+    if backend != 'json':
+        raise ValueError(f'Unknown SKYDESK_STORAGE backend: {backend!r}')
+    return JsonLeadStore(LEAD_DIRECTORIES, index_path=LEAD_INDEX_PATH, **builders)
+
+
+json_cache.resize(LEAD_CACHE_SIZE)
+lead_store = create_lead_store(STORAGE_BACKEND)
+if LEAD_CACHE_WATCH and json_cache.enabled:
+    start_watcher(LEAD_DIRECTORIES.values())
+
+ingest_queue = IngestQueue(
+    {'quote': QUOTE_DRAFT_DIR, 'booking': BOOKING_DRAFT_DIR},
+    run_ingest_job,
+    max_workers=INGEST_WORKERS,
+    max_attempts=INGEST_MAX_ATTEMPTS,
+    permanent_errors=(LLMNotConfigured,),
+)
+
+
+@app.before_request
+def start_ingest_queue() -> None:
+    # Started lazily so only the serving process (not the debug reloader) resumes queued jobs
+    ingest_queue.start()
+    draft_sweeper.start()
+    pdf_pool.start()
 
 
 def build_travel_dates(schedule: dict) -> Tuple[str, str]:
@@ -0,0 +1,34 @@
+"""Migrate communications.json files to append-only JSONL and compact existing logs."""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import LEAD_DIRECTORIES, lead_store  # noqa: E402
+from services.lead_store import JsonLeadStore  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('record_type', nargs='?', choices=sorted(LEAD_DIRECTORIES), help='Only process this lead type')
+    args = parser.parse_args()
+
+    if not isinstance(lead_store, JsonLeadStore):
+        raise SystemExit('Communication logs are only stored as files by the JSON storage backend (SKYDESK_STORAGE=json).')
+
+    targets = [args.record_type] if args.record_type else list(LEAD_DIRECTORIES)
+    leads = 0
+    entries = 0
+    for record_type in targets:
+        for record_id, _ in lead_store.index.iter_payloads(record_type):
+            written = lead_store.compact_communications(record_type, record_id)
+            if written:
+                leads += 1
+                entries += written
+    print(f'Compacted {entries} touchpoints across {leads} leads')
+
+
+if __name__ == '__main__':
+    main()
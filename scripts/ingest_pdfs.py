@@ -0,0 +1,237 @@
+"""Bulk-ingest a folder of quote or booking PDFs into review drafts or saved leads.
+
+PDF text is extracted by the pdf worker pool while the LLM calls run concurrently
+through the shared scheduler. Progress is checkpointed to a manifest after
+every file, so an interrupted run picks up where it stopped when re-run with
+the same arguments.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import (  # noqa: E402
+    TMP_DIR,
+    booking_draft_paths,
+    delete_booking_draft,
+    delete_quote_draft,
+    draft_blobs,
+    lead_store,
+    load_booking_draft,
+    load_quote_draft,
+    persist_booking,
+    persist_quote,
+    quote_draft_paths,
+    save_booking_draft,
+    save_quote_draft,
+)
+from services import booking_ingest, llm_client, quote_ingest  # noqa: E402
+from services.ingest_cache import file_sha256  # noqa: E402
+from services.llm_scheduler import LLMScheduler  # noqa: E402
+from services.metrics import trace  # noqa: E402
+from services.pdf_extract import pdf_pool  # noqa: E402
+
+DONE_STATUSES = {'drafted', 'persisted'}
+
+PIPELINES = {
+    'quote': {
+        'extract': quote_ingest.extract_quote_transcript,
+        'process': quote_ingest.aprocess_quote_transcript,
+        'paths': quote_draft_paths,
+        'save': save_quote_draft,
+        'load': load_quote_draft,
+        'delete': delete_quote_draft,
+        'persist': persist_quote,
+    },
+    'booking': {
+        'extract': booking_ingest.extract_booking_transcript,
+        'process': booking_ingest.aprocess_booking_transcript,
+        'paths': booking_draft_paths,
+        'save': save_booking_draft,
+        'load': load_booking_draft,
+        'delete': delete_booking_draft,
+        'persist': persist_booking,
+    },
+}
+
+
+def load_manifest(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        with path.open('r', encoding='utf-8') as handle:
+            data = json.load(handle)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_manifest(path: Path, manifest: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with tmp_path.open('w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def store_draft(kind: str, pdf_path: Path, draft, *, notes: str, persist: bool) -> dict:
+    """Write the draft like an upload would; with ``persist`` save the lead straight away."""
+
+    pipeline = PIPELINES[kind]
+    draft_id = uuid4().hex
+    draft_dir, _, draft_pdf = pipeline['paths'](draft_id)
+    draft_dir.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(pdf_path, draft_pdf)
+    pipeline['save'](draft_id, draft, notes=notes, original_filename=pdf_path.name)
+    if not persist:
+        return {'status': 'drafted', 'draft_id': draft_id}
+
+    lead_id = str(draft.parsed.get('lead_id') or '').strip()
+    if not re.fullmatch(r'\d{7}', lead_id):
+        return {'status': 'drafted', 'draft_id': draft_id, 'note': 'No 7-digit lead id; left for review'}
+    if lead_store.exists(kind, lead_id):
+        return {'status': 'drafted', 'draft_id': draft_id, 'note': f'Lead {lead_id} already exists; left for review'}
+
+    payload = {**draft.parsed, 'record_type': kind, 'lead_id': lead_id}
+    metadata = {
+        'blobs': draft_blobs(pipeline['load'](draft_id)),
+        'notes': notes,
+        'original_filename': pdf_path.name,
+        'prompt_version': draft.prompt_version,
+        'timings': draft.timings,
+        'saved_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'source': 'bulk_ingest',
+    }
+    pipeline['persist'](lead_id, payload, pdf_source=draft_pdf, metadata=metadata)
+    pipeline['delete'](draft_id)
+    return {'status': 'persisted', 'record_id': lead_id}
+
+
+async def ingest(
+    args: argparse.Namespace,
+    pdf_paths: list[Path],
+    digests: dict[Path, str],
+    manifest: dict,
+    manifest_path: Path,
+) -> dict:
+    pipeline = PIPELINES[args.kind]
+    # Keep the extraction pool busy while LLM calls are in flight, without reading the whole folder ahead
+    in_flight = asyncio.Semaphore(args.workers + args.concurrency)
+    totals = {'tokens': 0, 'extract_seconds': 0.0, 'llm_seconds': 0.0, 'done': 0}
+
+    async def handle(pdf_path: Path, key: str, sha256: str) -> None:
+        async with in_flight:
+            entry = {'sha256': sha256, 'started_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z'}
+            started = time.perf_counter()
+            try:
+                # One trace per file, so the extraction warnings end up in the draft's timings
+                with trace() as timings:
+                    transcript = await asyncio.to_thread(pipeline['extract'], pdf_path, sha256=sha256)
+                    extracted = time.perf_counter()
+                    totals['extract_seconds'] += extracted - started
+                    draft = await pipeline['process'](transcript, notes=args.notes)
+                    totals['llm_seconds'] += time.perf_counter() - extracted
+                entry.update(await asyncio.to_thread(
+                    store_draft, args.kind, pdf_path, draft, notes=args.notes or '', persist=args.persist
+                ))
+                entry['tokens'] = draft.tokens
+                totals['tokens'] += draft.tokens
+                if timings.warnings:
+                    entry['warnings'] = list(timings.warnings)
+            except llm_client.LLMNotConfigured:
+                raise
+            except Exception as exc:
+                entry.update({'status': 'failed', 'error': str(exc) or exc.__class__.__name__})
+            entry['seconds'] = round(time.perf_counter() - started, 3)
+            manifest[key] = entry
+            save_manifest(manifest_path, manifest)
+
+            totals['done'] += 1
+            target = entry.get('record_id') or entry.get('draft_id') or entry.get('error')
+            print(f'[{totals["done"]}/{len(pdf_paths)}] {entry["status"]:<9} {key} -> {target} ({entry["seconds"]}s)')
+            for warning in entry.get('warnings', ()):
+                print(f'    warning: {warning}')
+
+    tasks = []
+    for pdf_path in pdf_paths:
+        key = pdf_path.relative_to(args.directory).as_posix()
+        tasks.append(handle(pdf_path, key, digests[pdf_path]))
+    await asyncio.gather(*tasks)
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('kind', choices=sorted(PIPELINES), help='Which parser to run the PDFs through')
+    parser.add_argument('directory', type=Path, help='Folder searched recursively for *.pdf')
+    parser.add_argument('--persist', action='store_true', help='Save leads directly when the PDF yields a new 7-digit lead id (default: leave review drafts)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='PDF worker processes (default: CPU count; limits come from SKYDESK_PDF_*)')
+    parser.add_argument('--concurrency', type=int, default=llm_client.scheduler.max_concurrency, help='Concurrent LLM calls (default: SKYDESK_LLM_CONCURRENCY)')
+    parser.add_argument('--notes', default=None, help='Consultant notes sent with every PDF')
+    parser.add_argument('--manifest', type=Path, default=None, help='Checkpoint file (default: tmp/bulk_ingest/<kind>-<folder>.json)')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many pending PDFs')
+    args = parser.parse_args()
+
+    args.directory = args.directory.resolve()
+    if not args.directory.is_dir():
+        raise SystemExit(f'{args.directory} is not a directory')
+    args.workers = max(args.workers, 1)
+    args.concurrency = max(args.concurrency, 1)
+    llm_client.scheduler = LLMScheduler(max_concurrency=args.concurrency)
+    if pdf_pool.workers:
+        pdf_pool.workers = args.workers
+
+    manifest_path = args.manifest or TMP_DIR / 'bulk_ingest' / f'{args.kind}-{args.directory.name}.json'
+    manifest = load_manifest(manifest_path)
+
+    pending = []
+    digests: dict[Path, str] = {}
+    skipped = 0
+    for pdf_path in sorted(args.directory.rglob('*.pdf')):
+        entry = manifest.get(pdf_path.relative_to(args.directory).as_posix())
+        # Each file is read once to hash it; the digest is reused for the manifest and the transcript cache
+        digests[pdf_path] = file_sha256(pdf_path)
+        # A finished entry is only skipped while the file is unchanged
+        if entry and entry.get('status') in DONE_STATUSES and entry.get('sha256') == digests[pdf_path]:
+            skipped += 1
+            continue
+        pending.append(pdf_path)
+    if args.limit is not None:
+        pending = pending[: args.limit]
+
+    print(f'{len(pending)} PDFs to ingest, {skipped} already done (manifest: {manifest_path})')
+    if not pending:
+        return
+
+    started = time.perf_counter()
+    try:
+        totals = asyncio.run(ingest(args, pending, digests, manifest, manifest_path))
+    except llm_client.LLMNotConfigured as exc:
+        raise SystemExit(str(exc))
+    elapsed = time.perf_counter() - started
+
+    counts: dict[str, int] = {}
+    for pdf_path in pending:
+        status = manifest[pdf_path.relative_to(args.directory).as_posix()]['status']
+        counts[status] = counts.get(status, 0) + 1
+    print(', '.join(f'{count} {status}' for status, count in sorted(counts.items())) + f' in {elapsed:.1f}s')
+    print(
+        f'{len(pending) / elapsed * 60:.1f} PDFs/min, {totals["tokens"] / elapsed:.1f} tokens/s '
+        f'(extraction {totals["extract_seconds"]:.1f}s, LLM {totals["llm_seconds"]:.1f}s summed across files)'
+    )
+    if counts.get('failed'):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""Local OpenAI-compatible chat-completions server for offline ingestion runs.
+
+Replays the ``parsed`` payloads of saved drafts (``tmp/*_drafts/*/draft.json``)
+with configurable latency, server errors and 429s, so the ingest queue,
+retries and throughput can be benchmarked without network access or API
+credits. Point the app at it with
+``SKYDESK_LLM_BASE_URL=http://127.0.0.1:8099/v1``.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from uuid import uuid4
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_DRAFTS = ('tmp/quote_drafts/*/draft.json', 'tmp/booking_drafts/*/draft.json')
+
+# Matches the key lists in template-gap and chunk instructions ("ONLY these top-level keys ...: a, b")
+ONLY_KEYS = re.compile(r'ONLY these (?:top-level )?keys[^:]*:\s*([\w, ]+)')
+STREAM_CHUNK_CHARS = 24
+
+
+def load_answers(patterns: list[str]) -> list[dict]:
+    answers = []
+    for pattern in patterns:
+        for path in sorted(REPO_ROOT.glob(pattern)):
+            try:
+                with path.open('r', encoding='utf-8') as handle:
+                    parsed = json.load(handle).get('parsed')
+            except (OSError, ValueError):
+                continue
+            if isinstance(parsed, dict):
+                answers.append(parsed)
+    return answers
+
+
+class StubState:
+    """Canned answers, fault injection and counters shared by the handler threads."""
+
+    def __init__(self, args: argparse.Namespace, answers: list[dict]) -> None:
+        self.args = args
+        self.answers = answers
+        self.by_lead = {str(answer.get('lead_id')): answer for answer in answers if answer.get('lead_id')}
+        self._cycle = itertools.cycle(answers)
+        self._random = random.Random(args.seed)
+        self._lock = threading.Lock()
+        self._recent: deque[float] = deque()
+        self.counts = {'requests': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0, 'streamed': 0}
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def roll(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def latency(self) -> float:
+        with self._lock:
+            spread = self._random.uniform(-self.args.jitter, self.args.jitter)
+        return max(self.args.latency + spread, 0.0)
+
+    def take_request_budget(self) -> tuple[bool, dict[str, str]]:
+        """Sliding one-minute request window; returns whether the call fits and the rate-limit headers."""
+
+        if not self.args.rpm:
+            return True, {}
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            allowed = len(self._recent) < self.args.rpm
+            if allowed:
+                self._recent.append(now)
+            reset = 60 - (now - self._recent[0]) if self._recent else 0
+            remaining = self.args.rpm - len(self._recent)
+        headers = {
+            'x-ratelimit-limit-requests': str(self.args.rpm),
+            'x-ratelimit-remaining-requests': str(max(remaining, 0)),
+            'x-ratelimit-reset-requests': f'{reset:.3f}s',
+        }
+        return allowed, headers
+
+    def answer_for(self, messages: list[dict]) -> dict:
+        system = '\n'.join(str(message.get('content') or '') for message in messages if message.get('role') == 'system')
+        user = str(messages[-1].get('content') or '') if messages else ''
+
+        todo = re.match(r'LEAD_ID:\s*(\S*)\s*\nTODAY:.*\nTASK:\s*(.*)', user, flags=re.DOTALL)
+        if todo:
+            return {'lead_id': todo.group(1), 'task': todo.group(2).strip(), 'date_to_be_done': ''}
+        batch = re.match(r'LEAD_ID:\s*(\S*)\s*\nTODAY:.*\nTASKS:\s*\n(.*)', user, flags=re.DOTALL)
+        if batch:
+            tasks = re.findall(r'^\d+\.\s*(.*)$', batch.group(2), flags=re.MULTILINE)
+            return {'todos': [{'lead_id': batch.group(1), 'task': task.strip(), 'date_to_be_done': ''} for task in tasks]}
+
+        answer = next((known for lead_id, known in self.by_lead.items() if lead_id in user), None)
+        if answer is None:
+            with self._lock:
+                answer = next(self._cycle, {})
+        keys = ONLY_KEYS.search(system)
+        if keys:
+            wanted = [key.strip() for key in keys.group(1).split(',') if key.strip()]
+            answer = {key: answer.get(key) for key in wanted}
+        return answer
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):  # noqa: A002 - signature from BaseHTTPRequestHandler
+            if state.args.verbose:
+                super().log_message(format, *args)
+
+        def _send_json(self, status: int, payload: dict, headers: dict[str, str]) -> None:
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/').endswith('/models'):
+                self._send_json(200, {'object': 'list', 'data': [{'id': state.args.model, 'object': 'model'}]}, {})
+            elif self.path.rstrip('/') == '/stats':
+                self._send_json(200, state.counts, {})
+            else:
+                self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}}, {})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._send_json(400, {'error': {'message': 'Invalid JSON body', 'type': 'invalid_request_error'}}, {})
+                return
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}}, {})
+                return
+            state.count('requests')
+
+            allowed, headers = state.take_request_budget()
+            if not allowed or state.roll() < state.args.rate_limit_rate:
+                state.count('rate_limited')
+                headers['retry-after-ms'] = str(int(state.args.retry_after * 1000))
+                error = {'message': 'Rate limit reached (stub)', 'type': 'requests', 'code': 'rate_limit_exceeded'}
+                self._send_json(429, {'error': error}, headers)
+                return
+            if state.roll() < state.args.error_rate:
+                state.count('errors')
+                time.sleep(state.latency() / 2)
+                self._send_json(500, {'error': {'message': 'Injected server error (stub)', 'type': 'server_error'}}, headers)
+                return
+
+            messages = body.get('messages') or []
+            content = json.dumps(state.answer_for(messages), ensure_ascii=False)
+            prompt_tokens = sum(len(str(message.get('content') or '')) for message in messages) // 4
+            usage = {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(content) // 4,
+                'total_tokens': prompt_tokens + len(content) // 4,
+            }
+            model = body.get('model') or state.args.model
+            if body.get('stream'):
+                self._stream(content, model, usage, headers, include_usage=bool((body.get('stream_options') or {}).get('include_usage')))
+                return
+
+            time.sleep(state.latency())
+            state.count('ok')
+            self._send_json(200, {
+                'id': f'chatcmpl-stub-{uuid4().hex[:12]}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+                'usage': usage,
+            }, headers)
+
+        def _stream(self, content: str, model: str, usage: dict, headers: dict[str, str], *, include_usage: bool) -> None:
+            total = state.latency()
+            time.sleep(total * state.args.ttfb_share)
+            self.send_response(200)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+
+            completion_id = f'chatcmpl-stub-{uuid4().hex[:12]}'
+            pieces = [content[index : index + STREAM_CHUNK_CHARS] for index in range(0, len(content), STREAM_CHUNK_CHARS)]
+            delay = total * (1 - state.args.ttfb_share) / max(len(pieces), 1)
+
+            def event(choices: list, extra: dict = None) -> bytes:
+                chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model, 'choices': choices}
+                chunk.update(extra or {})
+                return f'data: {json.dumps(chunk)}\n\n'.encode('utf-8')
+
+            for piece in pieces:
+                self.wfile.write(event([{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]))
+                self.wfile.flush()
+                time.sleep(delay)
+            self.wfile.write(event([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+            if include_usage:
+                self.wfile.write(event([], {'usage': usage}))
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+            state.count('ok')
+            state.count('streamed')
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--drafts', nargs='+', default=list(DEFAULT_DRAFTS), help='Glob(s) of draft.json files to replay, relative to the repo')
+    parser.add_argument('--model', default='gpt-4.1-nano', help='Model id reported by /v1/models')
+    parser.add_argument('--latency', type=float, default=1.0, help='Mean seconds per completion (default: 1.0)')
+    parser.add_argument('--jitter', type=float, default=0.25, help='Uniform +/- seconds added to --latency')
+    parser.add_argument('--ttfb-share', type=float, default=0.2, help='Share of a streamed completion\'s latency spent before the first delta')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 429')
+    parser.add_argument('--rpm', type=int, default=0, help='Requests per minute before 429s; also sends x-ratelimit-* headers (0: unlimited)')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Seconds advertised in retry-after-ms on 429s')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible latency and fault injection')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+    args.ttfb_share = min(max(args.ttfb_share, 0.0), 1.0)
+
+    answers = load_answers(args.drafts)
+    if not answers:
+        raise SystemExit(f'No draft.json payloads matched {", ".join(args.drafts)}')
+
+    state = StubState(args, answers)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    print(f'Replaying {len(answers)} canned answers on http://{args.host}:{server.server_port}/v1 (Ctrl+C to stop)')
+    print(f'  export SKYDESK_LLM_BASE_URL=http://{args.host}:{server.server_port}/v1')
+    started = time.perf_counter()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        elapsed = time.perf_counter() - started
+        counts = state.counts
+        print(
+            f'{counts["requests"]} requests in {elapsed:.1f}s: {counts["ok"]} ok ({counts["streamed"]} streamed), '
+            f'{counts["rate_limited"]} rate limited, {counts["errors"]} errors'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Move lead directories into a flat, date- or hash-sharded layout.
+
+Safe to run while the app is serving: records resolve in every layout, and each
+move is a single directory rename. Re-running skips records already in place,
+so an interrupted migration simply resumes.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import LEAD_DIRECTORIES  # noqa: E402
+from services.lead_layout import LAYOUTS, iter_record_directories, relocate_record, shard_parts  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('layout', choices=LAYOUTS, help='Target layout')
+    parser.add_argument('record_type', nargs='?', choices=sorted(LEAD_DIRECTORIES), help='Only migrate this lead type')
+    parser.add_argument('--dry-run', action='store_true', help='Report what would move without touching disk')
+    args = parser.parse_args()
+
+    targets = [args.record_type] if args.record_type else list(LEAD_DIRECTORIES)
+    started = time.perf_counter()
+    moved = skipped = failed = 0
+    for record_type in targets:
+        directory = LEAD_DIRECTORIES[record_type]
+        for record_dir in list(iter_record_directories(directory)):
+            if args.dry_run:
+                in_place = directory.joinpath(*shard_parts(record_dir.name, args.layout)) == record_dir
+                skipped += in_place
+                moved += not in_place
+                continue
+            try:
+                if relocate_record(directory, record_dir, args.layout):
+                    moved += 1
+                else:
+                    skipped += 1
+            except OSError as exc:
+                # Typically a file held open on Windows; the next run retries it
+                failed += 1
+                print(f'Could not move {record_dir}: {exc}')
+    elapsed = time.perf_counter() - started
+    verb = 'Would move' if args.dry_run else 'Moved'
+    print(f'{verb} {moved} leads, {skipped} already in place, {failed} failed ({elapsed:.1f}s)')
+    if not args.dry_run and failed:
+        raise SystemExit(1)
+    print(f'Set SKYDESK_LEAD_LAYOUT={args.layout} so new leads are created in the same layout.')
+
+
+if __name__ == '__main__':
+    main()
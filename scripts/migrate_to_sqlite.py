@@ -0,0 +1,30 @@
+"""Bulk-load an existing leads/ JSON tree into the SQLite storage backend."""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import LEAD_DB_PATH, LEAD_DIRECTORIES, LEAD_INDEX_PATH, create_lead_store  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('record_type', nargs='?', choices=sorted(LEAD_DIRECTORIES), help='Only migrate this lead type')
+    parser.add_argument('--batch-size', type=int, default=500, help='Records per transaction (default: 500)')
+    args = parser.parse_args()
+
+    source = create_lead_store('json')
+    target = create_lead_store('sqlite')
+
+    started = time.perf_counter()
+    loaded = target.bulk_load(source, record_type=args.record_type, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f'Loaded {loaded} leads into {LEAD_DB_PATH} in {elapsed:.1f}s')
+    print(f'Documents stay under {LEAD_INDEX_PATH.parent}; set SKYDESK_STORAGE=sqlite to switch the app over.')
+
+
+if __name__ == '__main__':
+    main()
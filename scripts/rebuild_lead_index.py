@@ -0,0 +1,38 @@
+"""Rebuild or verify the lead index (leads/index.sqlite3) from the JSON records."""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import LEAD_DIRECTORIES, lead_store  # noqa: E402
+from services.lead_store import JsonLeadStore  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('record_type', nargs='?', choices=sorted(LEAD_DIRECTORIES), help='Only process this lead type')
+    parser.add_argument('--check', action='store_true', help='Compare indexed active To Dos with each lead\'s todos.json instead of rebuilding')
+    parser.add_argument('--repair', action='store_true', help='With --check, re-sync any lead that has drifted')
+    args = parser.parse_args()
+
+    if not isinstance(lead_store, JsonLeadStore):
+        raise SystemExit('The lead index is only used by the JSON storage backend (SKYDESK_STORAGE=json).')
+    lead_index = lead_store.index
+
+    if args.check:
+        mismatched = lead_index.verify_todos(args.record_type, repair=args.repair)
+        for record_type, record_id in mismatched:
+            print(f'{"Repaired" if args.repair else "Drifted"}: {record_type}/{record_id}')
+        print(f'{len(mismatched)} leads with To Do drift')
+        if mismatched and not args.repair:
+            raise SystemExit(1)
+        return
+
+    written = lead_index.rebuild(args.record_type)
+    print(f'Indexed {written} leads into {lead_index.db_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Delete abandoned quote/booking drafts (tmp/*_drafts) past the TTL or beyond the disk quota."""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import DRAFT_QUOTA_MB, DRAFT_TTL_HOURS, draft_index  # noqa: E402
+from services.draft_lifecycle import DraftSweeper  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ttl-hours', type=float, default=DRAFT_TTL_HOURS, help=f'Idle hours before a draft expires (default: {DRAFT_TTL_HOURS:g}; 0: never)')
+    parser.add_argument('--quota-mb', type=float, default=DRAFT_QUOTA_MB, help=f'Disk budget for all drafts (default: {DRAFT_QUOTA_MB:g}; 0: unlimited)')
+    parser.add_argument('--dry-run', action='store_true', help='List what would be removed without deleting anything')
+    parser.add_argument('--list', action='store_true', help='Only list pending drafts from the index')
+    args = parser.parse_args()
+
+    if args.list:
+        draft_index.reconcile()
+        for item in draft_index.pending():
+            print(f'{item["kind"]:8} {item["draft_id"]}  {item["status"]:7} {item["bytes"] / 1024:9.1f} KB  {item["original_filename"] or ""}')
+        count, size = draft_index.totals()
+        print(f'{count} drafts, {size / 1048576:.1f} MB')
+        return
+
+    sweeper = DraftSweeper(draft_index, ttl=args.ttl_hours * 3600, quota_bytes=int(args.quota_mb * 1024 * 1024), interval=0)
+    report = sweeper.sweep(dry_run=args.dry_run)
+    for kind, draft_id in report.removed:
+        print(f'{"Would remove" if args.dry_run else "Removed"}: {kind}/{draft_id}')
+    print(('[dry run] ' if args.dry_run else '') + report.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -2,15 +2,43 @@
 
 from __future__ import annotations
 
-import json
-from dataclasses import dataclass
-import re
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from pathlib import Path
 from typing import Optional
 
 from . import llm_client
-
-PROMPT_PATH = Path('ops/assistants/booking_parser.md')
+from .chunked_extraction import CHUNK_SIZE, CHUNK_THRESHOLD, build_requests, merge_chunks, needs_chunking
+from .ingest_cache import extraction_key, ingest_cache
+from .json_extract import extract_json_object
+from .json_stream import FieldCallback, stream_json_fields
+from .metrics import timed, trace
+from .pdf_extract import extract_pdf_text
+from .prompt_registry import Prompt, prompts
+from .template_parser import OPTIONAL_FIELDS, TemplateMatch, match_template
+from .transcript_compactor import compact_transcript
+
+PROMPT_NAME = 'booking_parser'
+
+# Top-level shape of the booking_parser output format (chunk answers hold a subset)
+SCHEMA = {
+    'record_type': str,
+    'lead_id': (str, int),
+    'issued_at': str,
+    'client': dict,
+    'other_pax': list,
+    'trip': dict,
+    'accommodation': list,
+    'flights': list,
+    'services': list,
+    'totals': dict,
+    'payments': dict,
+    'status': dict,
+    'notes': str,
+    'assistant_notes': str,
+}
 
 
 @dataclass(frozen=True)
@@ -18,71 +46,156 @@ class BookingDraft:
     parsed: dict
     raw_response: str
     transcript: str
+    tokens: int = 0  # LLM tokens spent producing this draft (0 when served from cache)
+    template: Optional[dict] = None  # layout match summary when the template parser ran
+    prompt_version: Optional[str] = None  # hash of the prompt the LLM answered (None when it was not asked)
+    timings: Optional[dict] = None  # per-stage seconds, LLM calls, tokens and cost for this draft
 
 
-def _extract_pdf_text(pdf_path: Path) -> str:
-    try:
-        from pypdf import PdfReader  # lazy import to avoid boot-time crash
-    except ImportError as exc:  # pragma: no cover - environment dependent
-        raise RuntimeError(
-            'PDF ingestion requires the pypdf package. Install with: pip install pypdf'
-        ) from exc
-
-    reader = PdfReader(str(pdf_path))
-    return '\n'.join(page.extract_text() or '' for page in reader.pages)
-
-
-def _load_prompt() -> str:
-    return PROMPT_PATH.read_text(encoding='utf-8').strip()
-
-
-def _build_messages(prompt: str, transcript: str, notes: Optional[str]) -> list[dict[str, str]]:
+def _build_messages(
+    prompt: Prompt, transcript: str, notes: Optional[str], instructions: str = ''
+) -> list[dict[str, str]]:
     user_content = transcript
     if notes:
         user_content = f"{user_content}\n\nCONSULTANT_NOTES:\n{notes.strip()}"
-    return [
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": user_content},
-    ]
-
-
-def process_booking_submission(pdf_path: Path, *, notes: Optional[str] = None) -> BookingDraft:
-    transcript = _extract_pdf_text(pdf_path)
-    prompt = _load_prompt()
-    messages = _build_messages(prompt, transcript, notes)
-
-    response = llm_client.chat(messages, enforce_json=True)
-
-    parsed = _coerce_json_object(response.content)
-
-    if not isinstance(parsed, dict):
-        raise ValueError('LLM response must be a JSON object for booking ingestion.')
-
-    return BookingDraft(parsed=parsed, raw_response=response.content, transcript=transcript)
-
-
-def _coerce_json_object(text: str) -> dict:
-    """Attempt to parse JSON, tolerating code fences or surrounding prose."""
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
-
-    for pattern in (r"```json\s*(.*?)```", r"```\s*(.*?)```"):
-        matches = re.findall(pattern, text, flags=re.IGNORECASE | re.DOTALL)
-        for block in matches:
-            try:
-                return json.loads(block.strip())
-            except Exception:
-                continue
-
-    start = text.find('{')
-    end = text.rfind('}')
-    if start != -1 and end != -1 and end > start:
-        candidate = text[start : end + 1]
-        try:
-            return json.loads(candidate)
-        except Exception:
-            pass
+    # Per-document instructions follow the static prompt so the prefix stays cacheable
+    messages = [prompt.message()]
+    if instructions:
+        messages.append({"role": "system", "content": instructions})
+    messages.append({"role": "user", "content": user_content})
+    return messages
+
+
+def _prepare(
+    transcript: str, notes: Optional[str]
+) -> tuple[str, list[list[dict[str, str]]], Optional[BookingDraft], TemplateMatch, Prompt]:
+    """Cache key and the LLM requests to make, or a finished draft from the template or cache."""
+    prompt = prompts.get(PROMPT_NAME)
+    instructions = ''
+
+    # Known supplier layouts are read directly; the model only fills what the rules missed
+    # (and still writes the notes fields when the consultant added notes)
+    with timed('template'):
+        match = match_template('booking', transcript)
+    if match.complete and not (notes or '').strip():
+        draft = BookingDraft(parsed=match.parsed, raw_response='', transcript=transcript, template=match.summary())
+        return '', [], draft, match, prompt
+    if match.layout:
+        instructions = match.llm_instructions()
+
+    # Identical PDF + notes under the same prompt/model and compaction/chunking: reuse the earlier answer
+    compacted = compact_transcript('booking', transcript)
+    cache_key = extraction_key(
+        'booking', prompt.sha256, compacted, notes, llm_client.resolve_model(), llm_client.resolve_temperature(),
+        instructions=instructions,
+        settings={'chunk_threshold': CHUNK_THRESHOLD, 'chunk_size': CHUNK_SIZE},
+    )
+    cached = ingest_cache.get_extraction(cache_key)
+    if cached is not None:
+        draft = BookingDraft(
+            parsed=cached['parsed'],
+            raw_response=cached['raw_response'],
+            transcript=transcript,
+            template=match.summary(),
+            prompt_version=prompt.version,
+        )
+        return cache_key, [], draft, match, prompt
+
+    if needs_chunking(compacted):
+        # Long itineraries: one header request plus concurrent per-chunk list extraction
+        fields = [*match.missing, *OPTIONAL_FIELDS] if match.layout else None
+        return cache_key, build_requests(prompt.message(), compacted, notes, fields=fields), None, match, prompt
+    return cache_key, [_build_messages(prompt, compacted, notes, instructions)], None, match, prompt
+
+
+def _finish(
+    cache_key: str,
+    transcript: str,
+    responses: list[llm_client.LLMResponse],
+    match: TemplateMatch,
+    prompt: Prompt,
+) -> BookingDraft:
+    with timed('json_parse'):
+        answers = [extract_json_object(response.content, SCHEMA) for response in responses]
+
+    parsed = answers[0] if len(answers) == 1 else merge_chunks(answers[0], answers[1:])
+    parsed = match.merge(parsed)
+
+    content = '\n\n'.join(response.content for response in responses)
+    ingest_cache.put_extraction(cache_key, parsed=parsed, raw_response=content)
+    return BookingDraft(
+        parsed=parsed,
+        raw_response=content,
+        transcript=transcript,
+        tokens=sum(response.total_tokens for response in responses),
+        template=match.summary(),
+        prompt_version=prompt.version,
+    )
+
+
+def _chat_all(requests: list[list[dict[str, str]]]) -> list[llm_client.LLMResponse]:
+    if len(requests) == 1:
+        return [llm_client.chat(requests[0], enforce_json=True)]
+    # The shared scheduler still caps how many of these reach the API at once; each
+    # thread gets a copy of the caller's context so the calls land in its timing trace
+    contexts = [contextvars.copy_context() for _ in requests]
+    with ThreadPoolExecutor(max_workers=len(requests), thread_name_prefix='booking-chunk') as pool:
+        return list(pool.map(
+            lambda context, messages: context.run(llm_client.chat, messages, enforce_json=True), contexts, requests
+        ))
+
+
+def process_booking_submission(
+    pdf_path: Path, *, notes: Optional[str] = None, on_field: Optional[FieldCallback] = None
+) -> BookingDraft:
+    """Convert a submitted PDF into structured JSON via LLM.
+
+    With ``on_field`` a single-request extraction is streamed and each
+    top-level field is passed on as soon as it is complete (template fields
+    first); chunked extractions report the merged fields at the end.
+    """
+
+    with trace() as timings:
+        transcript = extract_booking_transcript(pdf_path)
+        cache_key, requests, cached, match, prompt = _prepare(transcript, notes)
+        if on_field is not None:
+            for key, value in (cached.parsed if cached is not None else match.parsed).items():
+                if value is not None:
+                    on_field(key, value)
+        if cached is not None:
+            draft = cached
+        elif on_field is not None and len(requests) == 1:
+            draft = _finish(cache_key, transcript, [stream_json_fields(requests[0], on_field)], match, prompt)
+        else:
+            draft = _finish(cache_key, transcript, _chat_all(requests), match, prompt)
+            if on_field is not None:
+                for key, value in draft.parsed.items():
+                    on_field(key, value)
+    return replace(draft, timings=timings.as_dict())
+
+
+async def aprocess_booking_submission(pdf_path: Path, *, notes: Optional[str] = None) -> BookingDraft:
+    """Async ``process_booking_submission``: the wait for the PDF workers runs in a thread, the LLM call is awaited."""
+
+    with trace():
+        transcript = await asyncio.to_thread(extract_booking_transcript, pdf_path)
+        return await aprocess_booking_transcript(transcript, notes=notes)
+
+
+def extract_booking_transcript(pdf_path: Path, *, sha256: Optional[str] = None) -> str:
+    """Cached PDF text, extracted by the shared worker pool (``services.pdf_extract``)."""
+    return ingest_cache.transcript(pdf_path, extract_pdf_text, sha256=sha256)
+
+
+async def aprocess_booking_transcript(transcript: str, *, notes: Optional[str] = None) -> BookingDraft:
+    """LLM half of the pipeline for text that has already been extracted."""
+
+    with trace() as timings:
+        cache_key, requests, cached, match, prompt = _prepare(transcript, notes)
+        if cached is not None:
+            draft = cached
+        else:
+            responses = await asyncio.gather(*(llm_client.achat(messages, enforce_json=True) for messages in requests))
+            draft = _finish(cache_key, transcript, list(responses), match, prompt)
+    return replace(draft, timings=timings.as_dict())
 
-    raise ValueError('LLM response was not valid JSON.')
@@ -0,0 +1,212 @@
+"""Map-reduce extraction for transcripts too long for one LLM request.
+
+Multi-week itineraries can approach the model's context window, which makes a
+single extraction slow and liable to truncation. Above ``CHUNK_THRESHOLD``
+characters the transcript is split at section headings. One "head" request
+reads the header fields from the start and end of the document, and every
+chunk is asked only for its flights, stays, services and payments. The
+requests run concurrently, and ``merge_chunks`` dedupes the lists back into
+the single ``parsed`` dict the confirm pages expect.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+CHUNK_THRESHOLD = int(os.getenv('SKYDESK_CHUNK_THRESHOLD', '60000'))
+CHUNK_SIZE = int(os.getenv('SKYDESK_CHUNK_SIZE', '24000'))
+
+LIST_FIELDS = ('flights', 'accommodation', 'services', 'payments')
+
+# Lines a chunk should preferably start on
+SECTION_HEADINGS = {
+    'Trip Summary', 'Trip Details', 'Stays', 'Flights', 'Transfers', 'Rail', 'Cruise', 'Cruises', 'Tours',
+    'Activities', 'Experiences', 'Car Hire', 'Package', 'Total Price', 'Payment Details', 'Payments',
+    'Price Breakdown', 'Grand Total',
+}
+
+
+def needs_chunking(transcript: str) -> bool:
+    return CHUNK_THRESHOLD > 0 and len(transcript) > CHUNK_THRESHOLD
+
+
+def split_transcript(transcript: str, max_chars: int = CHUNK_SIZE) -> list[str]:
+    """Consecutive chunks of at most ~``max_chars``, cut at a section heading where possible."""
+
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    last_heading = 0
+    for line in transcript.splitlines():
+        if size + len(line) + 1 > max_chars and current:
+            # Prefer the latest heading in the second half of the chunk; else cut at this line
+            cut = last_heading if last_heading > len(current) // 2 else len(current)
+            chunks.append('\n'.join(current[:cut]))
+            current = current[cut:]
+            size = sum(len(kept) + 1 for kept in current)
+            last_heading = 0
+        if line.strip() in SECTION_HEADINGS:
+            last_heading = len(current)
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+def build_requests(
+    system: dict[str, str],
+    transcript: str,
+    notes: Optional[str],
+    *,
+    fields: Optional[Iterable[str]] = None,
+) -> list[list[dict[str, str]]]:
+    """Message lists for the head request followed by one list request per chunk.
+
+    Every request starts with the same ``system`` prompt message, followed by
+    its own part instructions, so the provider can cache the shared prefix.
+    ``fields`` limits the extraction to the given top-level keys (for example
+    those the template parser could not resolve); ``None`` means every key.
+    """
+
+    wanted = set(fields) if fields is not None else None
+    list_fields = [name for name in LIST_FIELDS if wanted is None or name in wanted]
+    chunks = split_transcript(transcript)
+    total = len(chunks)
+
+    head_text = chunks[0] if total == 1 else f'{chunks[0]}\n...\n{chunks[-1]}'
+    if notes:
+        head_text = f'{head_text}\n\nCONSULTANT_NOTES:\n{notes.strip()}'
+    if wanted is None:
+        head_scope = 'Fill every template key'
+    else:
+        # payments stays with the head for last_payment_*; only its transactions come from the parts
+        head_keys = sorted(wanted.difference(list_fields) | wanted.intersection({'payments'}))
+        head_scope = 'Return a JSON object with ONLY these top-level keys: ' + ', '.join(head_keys)
+    head_instructions = (
+        f'DOCUMENT_PARTS: this long document was split into {total} parts; you are given the start and end. '
+        f'{head_scope}. Leave flights, accommodation, services and payments.transactions as empty lists; '
+        'they are extracted from each part separately.'
+    )
+    requests = [[
+        system,
+        {'role': 'system', 'content': head_instructions},
+        {'role': 'user', 'content': head_text},
+    ]]
+    if not list_fields:
+        return requests
+
+    keys = ', '.join(list_fields)
+    for index, chunk in enumerate(chunks, start=1):
+        instructions = (
+            f'DOCUMENT_PARTS: this is part {index} of {total} of one document. Return a JSON object with ONLY '
+            f'these keys for items that appear in this part: {keys}. payments holds only "transactions". '
+            'Use empty lists when this part has none. Do not guess items from other parts.'
+        )
+        requests.append([
+            system,
+            {'role': 'system', 'content': instructions},
+            {'role': 'user', 'content': chunk},
+        ])
+    return requests
+
+
+def _norm(value) -> str:
+    return str(value or '').strip().upper().replace(' ', '')
+
+
+def _flight_key(flight: dict) -> Optional[tuple]:
+    segments = [segment for segment in flight.get('segments') or [] if isinstance(segment, dict)]
+    depart = segments[0].get('depart_date') if segments else flight.get('depart_date')
+    route = flight.get('route') or '-'.join(filter(None, (flight.get('origin'), flight.get('destination'))))
+    key = (_norm(flight.get('pnr')), _norm(depart), _norm(route))
+    return key if any(key) else None
+
+
+def _segment_key(segment: dict) -> Optional[tuple]:
+    key = (_norm(segment.get('flight_number')), _norm(segment.get('depart_date')))
+    return key if any(key) else None
+
+
+def _stay_key(stay: dict) -> Optional[tuple]:
+    key = (_norm(stay.get('name')), _norm(stay.get('check_in')))
+    return key if any(key) else None
+
+
+def _service_key(service: dict) -> Optional[tuple]:
+    key = (_norm(service.get('type')), _norm(service.get('depart_date')), _norm(service.get('description')))
+    return key if any(key) else None
+
+
+def _payment_key(payment: dict) -> Optional[tuple]:
+    key = (_norm(payment.get('date')), _norm(payment.get('amount')), _norm(payment.get('reference')))
+    return key if any(key) else None
+
+
+def _fill_missing(target: dict, other: dict) -> None:
+    for name, value in other.items():
+        if target.get(name) in (None, '', [], {}):
+            target[name] = value
+
+
+def dedupe(items: Iterable, key: Callable[[dict], Optional[tuple]]) -> list[dict]:
+    """Keep the first of each identical item, filling its empty fields from later copies."""
+
+    merged: list[dict] = []
+    by_key: dict[tuple, dict] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        identity = key(item)
+        if identity is None:
+            merged.append(dict(item))
+            continue
+        existing = by_key.get(identity)
+        if existing is None:
+            by_key[identity] = existing = dict(item)
+            merged.append(existing)
+            continue
+        if key is _flight_key:
+            existing['segments'] = dedupe(
+                [*(existing.get('segments') or []), *(item.get('segments') or [])], _segment_key
+            )
+        _fill_missing(existing, item)
+    return merged
+
+
+def _payment_date(payment: dict) -> datetime:
+    try:
+        return datetime.strptime(str(payment.get('date') or ''), '%d-%m-%Y')
+    except ValueError:
+        return datetime.min
+
+
+def merge_chunks(head: dict, parts: list[dict]) -> dict:
+    """Combine the head answer with the per-chunk lists into one ``parsed`` dict."""
+
+    merged = dict(head)
+    for name, key in (('flights', _flight_key), ('accommodation', _stay_key), ('services', _service_key)):
+        collected = [*(head.get(name) or []), *(item for part in parts for item in part.get(name) or [])]
+        if collected or name in merged:
+            merged[name] = dedupe(collected, key)
+    for flight in merged.get('flights') or []:
+        if isinstance(flight.get('segments'), list):
+            flight['layover_count'] = max(len(flight['segments']) - 1, 0)
+
+    payments = dict(head.get('payments') or {})
+    transactions = [*(payments.get('transactions') or [])]
+    for part in parts:
+        part_payments = part.get('payments')
+        if isinstance(part_payments, dict):
+            transactions.extend(part_payments.get('transactions') or [])
+    if transactions or 'payments' in merged:
+        payments['transactions'] = dedupe(transactions, _payment_key)
+        if not payments.get('last_payment_date') and payments['transactions']:
+            latest = max(payments['transactions'], key=_payment_date)
+            payments['last_payment_date'] = latest.get('date')
+            if not payments.get('last_payment_method'):
+                payments['last_payment_method'] = latest.get('method')
+        merged['payments'] = payments
+    return merged
@@ -0,0 +1,293 @@
+"""Index and garbage collection for review drafts under ``tmp/<kind>_drafts``.
+
+Only a confirmed draft was ever deleted, so abandoned uploads (PDF, draft
+JSON, side files) piled up for good. ``DraftIndex`` keeps one sqlite row per
+draft (status, file name, size, last activity) so pending drafts can be
+listed without crawling the folders. ``DraftSweeper`` periodically removes
+drafts idle for longer than the TTL, then the least recently touched ones
+until the folders fit the disk quota, and reports what it reclaimed.
+Drafts whose ingestion job is still queued or running are left alone.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .ingest_queue import FAILED, JOB_FILENAME, QUEUED, RUNNING, job_locked
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+READY = 'ready'  # draft.json written, waiting for the consultant to confirm
+DRAFT_FILENAME = 'draft.json'
+
+
+def _directory_bytes(directory: Path) -> int:
+    total = 0
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            total += _directory_bytes(Path(entry.path)) if entry.is_dir() else entry.stat().st_size
+        except OSError:
+            continue
+    return total
+
+
+def _job_status(directory: Path) -> Optional[str]:
+    try:
+        with (directory / JOB_FILENAME).open('r', encoding='utf-8') as handle:
+            return json.load(handle).get('status')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _original_filename(directory: Path) -> Optional[str]:
+    for name, path in ((JOB_FILENAME, ('params', 'original_filename')), (DRAFT_FILENAME, ('original_filename',))):
+        try:
+            with (directory / name).open('r', encoding='utf-8') as handle:
+                value = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value:
+            return str(value)
+    return None
+
+
+def _disk_status(directory: Path) -> str:
+    if (directory / DRAFT_FILENAME).exists():
+        return READY
+    return FAILED if _job_status(directory) == FAILED else QUEUED
+
+
+class DraftIndex:
+    """One row per draft folder, written by the app as drafts are uploaded, saved and confirmed."""
+
+    def __init__(self, db_path: Path, directories: dict[str, Path]) -> None:
+        self.db_path = db_path
+        self.directories = directories
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(
+                '''
+                CREATE TABLE IF NOT EXISTS drafts (
+                    kind TEXT NOT NULL,
+                    draft_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    original_filename TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    bytes INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (kind, draft_id)
+                );
+                CREATE INDEX IF NOT EXISTS drafts_by_activity ON drafts (updated_at);
+                '''
+            )
+            self._schema_ready = True
+        return conn
+
+    def upsert(self, kind: str, draft_id: str, *, status: str, original_filename: Optional[str] = None) -> None:
+        """Record activity on a draft; its size is re-measured from the folder."""
+
+        now = time.time()
+        size = _directory_bytes(self.directories[kind] / draft_id)
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    'INSERT INTO drafts (kind, draft_id, status, original_filename, created_at, updated_at, bytes) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (kind, draft_id) DO UPDATE SET status = excluded.status, '
+                    'original_filename = COALESCE(excluded.original_filename, original_filename), '
+                    'updated_at = excluded.updated_at, bytes = excluded.bytes',
+                    (kind, draft_id, status, original_filename, now, now, size),
+                )
+
+    def touch(self, kind: str, draft_id: str) -> None:
+        """Mark a draft as just opened for review, so its TTL counts from now."""
+
+        with closing(self._connect()) as conn:
+            with conn:
+                updated = conn.execute(
+                    'UPDATE drafts SET updated_at = ? WHERE kind = ? AND draft_id = ?', (time.time(), kind, draft_id)
+                ).rowcount
+        if not updated:
+            self.upsert(kind, draft_id, status=READY)  # made out of band and not reconciled yet
+
+    def remove(self, kind: str, draft_id: str) -> None:
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('DELETE FROM drafts WHERE kind = ? AND draft_id = ?', (kind, draft_id))
+
+    def pending(self, *, kind: Optional[str] = None, limit: Optional[int] = None) -> list[dict]:
+        """Unconfirmed drafts, most recently touched first."""
+
+        query = 'SELECT * FROM drafts'
+        params: list = []
+        if kind:
+            query += ' WHERE kind = ?'
+            params.append(kind)
+        query += ' ORDER BY updated_at DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(query, params)]
+
+    def totals(self) -> tuple[int, int]:
+        """``(draft count, bytes on disk)`` as last measured."""
+
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM drafts').fetchone()
+        return int(row[0]), int(row[1])
+
+    def reconcile(self) -> int:
+        """Match the index to the folders (drafts made or removed out of band); returns rows changed."""
+
+        on_disk: dict[tuple[str, str], Path] = {}
+        for kind, directory in self.directories.items():
+            if not directory.exists():
+                continue
+            for entry in os.scandir(directory):
+                if entry.is_dir():
+                    on_disk[(kind, entry.name)] = Path(entry.path)
+
+        changed = 0
+        with closing(self._connect()) as conn:
+            indexed = {(row['kind'], row['draft_id']): row for row in conn.execute('SELECT * FROM drafts')}
+            with conn:
+                for key in indexed.keys() - on_disk.keys():
+                    conn.execute('DELETE FROM drafts WHERE kind = ? AND draft_id = ?', key)
+                    changed += 1
+                for key, directory in on_disk.items():
+                    row = indexed.get(key)
+                    status = _disk_status(directory)
+                    size = _directory_bytes(directory)
+                    if row is not None and row['status'] == status and row['bytes'] == size:
+                        continue
+                    try:
+                        mtime = directory.stat().st_mtime
+                    except OSError:
+                        continue
+                    conn.execute(
+                        'INSERT INTO drafts (kind, draft_id, status, original_filename, created_at, updated_at, bytes) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT (kind, draft_id) DO UPDATE SET status = excluded.status, bytes = excluded.bytes',
+                        (*key, status, None if row is not None else _original_filename(directory), mtime, mtime, size),
+                    )
+                    changed += 1
+        return changed
+
+
+@dataclass
+class SweepReport:
+    removed: list[tuple[str, str]] = field(default_factory=list)
+    reclaimed_bytes: int = 0
+    expired: int = 0  # of ``removed``, the drafts past the TTL (the rest went to meet the quota)
+    kept: int = 0
+    kept_bytes: int = 0
+
+    def summary(self) -> str:
+        return (
+            f'Removed {len(self.removed)} drafts ({self.expired} expired), reclaimed {self.reclaimed_bytes / 1048576:.1f} MB; '
+            f'{self.kept} drafts ({self.kept_bytes / 1048576:.1f} MB) kept'
+        )
+
+
+class DraftSweeper:
+    """Removes drafts idle longer than ``ttl`` seconds, then oldest-first down to ``quota_bytes``.
+
+    ``start()`` runs ``sweep()`` every ``interval`` seconds on a daemon thread
+    (not at all when ``interval`` is 0). A draft with a queued job is never
+    touched; one with a running job only once it is past the TTL and no live
+    process holds its lock.
+    """
+
+    def __init__(self, index: DraftIndex, *, ttl: float, quota_bytes: int, interval: float) -> None:
+        self.index = index
+        self.ttl = ttl
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+
+    def _busy(self, directory: Path, *, expired: bool) -> bool:
+        status = _job_status(directory)
+        # A queued job waiting for a pool thread holds no lock yet, and IngestQueue.start()
+        # resubmits queued jobs after a restart, so it always runs eventually
+        if status == QUEUED:
+            return True
+        if status != RUNNING:
+            return False
+        return not expired or job_locked(directory)
+
+    def sweep(self, *, dry_run: bool = False, now: Optional[float] = None) -> SweepReport:
+        with self._sweep_lock:
+            self.index.reconcile()
+            now = time.time() if now is None else now
+            drafts = sorted(self.index.pending(), key=lambda row: row['updated_at'])
+            total = sum(row['bytes'] for row in drafts)
+            report = SweepReport()
+            for row in drafts:
+                directory = self.index.directories[row['kind']] / row['draft_id']
+                expired = bool(self.ttl) and now - row['updated_at'] > self.ttl
+                over_quota = bool(self.quota_bytes) and total > self.quota_bytes
+                if not (expired or over_quota) or self._busy(directory, expired=expired):
+                    report.kept += 1
+                    report.kept_bytes += row['bytes']
+                    continue
+                if not dry_run:
+                    shutil.rmtree(directory, ignore_errors=True)
+                    self.index.remove(row['kind'], row['draft_id'])
+                report.removed.append((row['kind'], row['draft_id']))
+                report.reclaimed_bytes += row['bytes']
+                report.expired += int(expired)
+                total -= row['bytes']
+
+        if report.removed and not dry_run:
+            metrics.increment('drafts.swept', len(report.removed))
+            metrics.increment('drafts.reclaimed_bytes', report.reclaimed_bytes)
+            logger.info('Draft sweep: %s', report.summary())
+        return report
+
+    def start(self) -> None:
+        if not self.interval or self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='draft-sweeper', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.sweep()
+            except Exception:  # pragma: no cover - keep the sweeper alive
+                logger.exception('Draft sweep failed')
+            if self._stop.wait(self.interval):
+                return
@@ -0,0 +1,52 @@
+"""Live preview of the fields an ingestion job has extracted so far.
+
+The worker appends one JSON line per top-level field to ``preview.jsonl``
+in the draft directory; the processing page's event stream tails that file.
+Like ``job.json`` it lives on disk, so any web process can serve the
+preview no matter which worker is running the job.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+
+PREVIEW_FILENAME = 'preview.jsonl'
+
+
+class PreviewLog:
+    """Append-only JSONL of ``{"key": ..., "value": ...}`` field events."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Start over, e.g. when a failed attempt is retried."""
+        self.path.unlink(missing_ok=True)
+
+    def append(self, key: str, value: object) -> None:
+        line = json.dumps({'key': key, 'value': value}, ensure_ascii=False)
+        with self._lock, self.path.open('a', encoding='utf-8') as handle:
+            handle.write(line + '\n')
+
+    def read_from(self, offset: int = 0) -> tuple[list[dict], int]:
+        """Complete events written after byte ``offset``, and the offset to resume from."""
+
+        try:
+            with self.path.open('rb') as handle:
+                if offset > handle.seek(0, 2):
+                    offset = 0  # the log was reset
+                handle.seek(offset)
+                data = handle.read()
+        except FileNotFoundError:
+            return [], 0
+        events = []
+        end = data.rfind(b'\n') + 1  # ignore a line still being written
+        for line in data[:end].splitlines():
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events, offset + end
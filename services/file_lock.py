@@ -0,0 +1,107 @@
+"""Exclusive locks on a file that hold across processes, on POSIX and Windows.
+
+A thread lock only serialises one server process; two processes sharing the
+data directory need the OS to arbitrate. POSIX uses ``fcntl.flock`` and
+Windows ``msvcrt.locking`` on the first byte of the lock file. The OS drops
+the lock when the holder exits, however it exits, so a crash never leaves a
+stale lock behind. Lock files are never deleted: removing one while another
+process has it open would let two holders lock different files at one path.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+if os.name == 'nt':  # pragma: no cover - platform dependent
+    import msvcrt
+
+    def _lock(handle: BinaryIO, *, blocking: bool) -> bool:
+        handle.seek(0)
+        while True:
+            try:
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.05)
+
+    def _unlock(handle: BinaryIO) -> None:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock(handle: BinaryIO, *, blocking: bool) -> bool:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+
+    def _unlock(handle: BinaryIO) -> None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class FileLock:
+    """An exclusive lock on ``path``; the file is created on first use, its folder must exist.
+
+    Locks are per open file, so a second ``FileLock`` on the same path is
+    refused even within one process.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._handle: Optional[BinaryIO] = None
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        """Take the lock (waiting for it unless ``blocking`` is False); False if someone else holds it."""
+
+        handle = self.path.open('a+b')
+        if not _lock(handle, blocking=blocking):
+            handle.close()
+            return False
+        self._handle = handle
+        return True
+
+    def release(self) -> None:
+        if self._handle is None:
+            return
+        try:
+            _unlock(self._handle)
+        finally:
+            self._handle.close()
+            self._handle = None
+
+
+def is_locked(path: Path) -> bool:
+    """Whether a live process (this one included) holds the lock on ``path``."""
+
+    if not path.exists():
+        return False
+    probe = FileLock(path)
+    try:
+        if not probe.acquire(blocking=False):
+            return True
+    except FileNotFoundError:
+        return False
+    probe.release()
+    return False
+
+
+@contextmanager
+def exclusive_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on ``path`` (created if missing), waiting for other holders."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock = FileLock(path)
+    lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
@@ -0,0 +1,217 @@
+"""Disk cache for PDF transcripts and LLM extractions, keyed by content hash.
+
+Consultants often re-upload the same supplier PDF; with this cache a repeat
+upload skips both pypdf and the API call. Transcripts are keyed by the
+SHA-256 of the PDF bytes, extractions by a hash of everything that shapes
+the model's answer (pipeline, prompt hash, the compacted transcript actually
+sent, chunking settings, notes, model, temperature).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    from .pdf_extract import PDFText
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / 'tmp' / 'ingest_cache'
+# Writes between full directory scans; a scan also runs as soon as the running total passes max_bytes
+EVICT_EVERY = 64
+# An over-full cache is trimmed to this share of max_bytes, so the next writes do not each trigger a scan
+EVICT_LOW_WATER = 0.9
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extraction_key(
+    pipeline: str,
+    prompt_sha256: str,
+    transcript: str,
+    notes: Optional[str],
+    model: str,
+    temperature: float,
+    *,
+    instructions: str = '',
+    settings: Optional[dict] = None,
+) -> str:
+    """Stable key for one LLM extraction; any input change yields a new key.
+
+    ``prompt_sha256`` is the registry hash of the assistant prompt,
+    ``transcript`` the text as sent (after compaction), ``instructions`` any
+    per-document text sent alongside it and ``settings`` anything else that
+    shapes the requests, such as the chunk sizes.
+    """
+    material = json.dumps(
+        {
+            'pipeline': pipeline,
+            'prompt': prompt_sha256,
+            'instructions': hashlib.sha256(instructions.encode('utf-8')).hexdigest(),
+            'transcript': transcript,
+            'settings': settings or {},
+            'notes': (notes or '').strip(),
+            'model': model,
+            'temperature': temperature,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class IngestCache:
+    """Transcripts (``transcripts/<sha>.txt``) and extractions (``extractions/<key>.json``).
+
+    A hit refreshes the entry's mtime, so eviction is least-recently-used:
+    entries older than ``max_age`` seconds are dropped, then the oldest go
+    until the cache fits in ``max_bytes``. ``max_bytes=0`` disables caching.
+    Writes keep a running byte total, so the directory is only scanned every
+    ``EVICT_EVERY`` writes or when the total goes over ``max_bytes``.
+    """
+
+    def __init__(self, root: Path, *, max_bytes: int, max_age: float) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._bytes: Optional[int] = None  # running total since the last scan; None until the first
+        self._writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, kind: str, key: str, suffix: str) -> Path:
+        return self.root / kind / f'{key}{suffix}'
+
+    def _read(self, path: Path) -> Optional[str]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        if self.max_age and time.time() - stat.st_mtime > self.max_age:
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            text = path.read_text(encoding='utf-8')
+            os.utime(path)
+        except OSError:
+            return None
+        return text
+
+    def _write(self, path: Path, text: str) -> None:
+        data = text.encode('utf-8')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._writes += 1
+            if self._bytes is not None:
+                self._bytes += len(data) - replaced
+            due = self._bytes is None or self._bytes > self.max_bytes or self._writes >= EVICT_EVERY
+        if due:
+            self.evict()
+
+    def transcript(
+        self,
+        pdf_path: Path,
+        extract: Callable[[Path], PDFText],
+        *,
+        sha256: Optional[str] = None,
+    ) -> str:
+        """Cached ``extract(pdf_path).text`` keyed by the PDF's SHA-256; partial text is not cached.
+
+        Callers that already hashed the file pass ``sha256`` so it is not read twice.
+        """
+
+        if not self.enabled:
+            return extract(pdf_path).text
+        path = self._path('transcripts', sha256 or file_sha256(pdf_path), '.txt')
+        cached = self._read(path)
+        if cached is not None:
+            logger.info('Transcript cache hit for %s', pdf_path.name)
+            return cached
+        result = extract(pdf_path)
+        if result.complete:
+            self._write(path, result.text)
+        return result.text
+
+    def get_extraction(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        text = self._read(self._path('extractions', key, '.json'))
+        if text is None:
+            return None
+        try:
+            entry = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(entry, dict) or not isinstance(entry.get('parsed'), dict):
+            return None
+        logger.info('Extraction cache hit %s', key[:12])
+        return entry
+
+    def put_extraction(self, key: str, *, parsed: dict, raw_response: str) -> None:
+        if self.enabled:
+            self._write(
+                self._path('extractions', key, '.json'),
+                json.dumps({'parsed': parsed, 'raw_response': raw_response}),
+            )
+
+    def evict(self) -> int:
+        """Drop expired entries, then, when over ``max_bytes``, the least recently used down to the low-water mark."""
+
+        with self._lock:
+            entries = []
+            for kind in ('transcripts', 'extractions'):
+                directory = self.root / kind
+                if not directory.exists():
+                    continue
+                for path in directory.iterdir():
+                    if path.name.endswith('.tmp'):
+                        continue
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            removed = 0
+            now = time.time()
+            total = sum(size for _, size, _ in entries)
+            limit = self.max_bytes if total <= self.max_bytes else int(self.max_bytes * EVICT_LOW_WATER)
+            for mtime, size, path in sorted(entries, key=lambda entry: entry[0]):
+                expired = self.max_age and now - mtime > self.max_age
+                if not expired and total <= limit:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+            self._bytes = total
+            self._writes = 0
+            return removed
+
+
+ingest_cache = IngestCache(
+    DEFAULT_CACHE_DIR,
+    max_bytes=int(float(os.getenv('SKYDESK_INGEST_CACHE_MB', '256')) * 1024 * 1024),
+    max_age=float(os.getenv('SKYDESK_INGEST_CACHE_DAYS', '30')) * 86400,
+)
@@ -0,0 +1,225 @@
+"""Background worker pool for PDF quote/booking ingestion.
+
+Each job is a ``job.json`` file inside its draft directory
+(``tmp/<kind>_drafts/<draft_id>/job.json``), so queued work survives a
+restart and the status page can read progress without touching the pool.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+from .file_lock import FileLock, is_locked
+
+logger = logging.getLogger(__name__)
+
+JOB_FILENAME = 'job.json'
+LOCK_FILENAME = 'job.lock'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# (kind, draft_dir, job) -> None; raises to fail or retry the attempt
+JobRunner = Callable[[str, Path, dict], None]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+
+def job_locked(draft_dir: Path) -> bool:
+    """Whether a live worker, in any process, is running the job in ``draft_dir``."""
+    return is_locked(draft_dir / LOCK_FILENAME)
+
+
+class IngestQueue:
+    """Bounded thread pool running ingestion jobs with retries and per-job timing.
+
+    ``directories`` maps a job kind (``quote``/``booking``) to its drafts
+    folder. Errors listed in ``permanent_errors`` fail a job straight away;
+    anything else is retried up to ``max_attempts`` times with a linear
+    back-off. An OS lock on ``job.lock``, held while the job runs, stops
+    two workers or processes from running the same job; the OS drops it when
+    its process dies, so a restarted server takes over what a dead one left.
+    A claim that finds the lock taken while the job is still queued is tried
+    again after ``claim_retry_delay`` seconds, since the holder may only be a
+    probe (the draft sweeper's ``job_locked``) rather than a worker.
+    """
+
+    def __init__(
+        self,
+        directories: dict[str, Path],
+        runner: JobRunner,
+        *,
+        max_workers: int = 2,
+        max_attempts: int = 3,
+        retry_delay: float = 5.0,
+        permanent_errors: tuple[type[BaseException], ...] = (),
+        claim_retry_delay: float = 0.5,
+    ) -> None:
+        self.directories = directories
+        self._runner = runner
+        self.max_workers = max(max_workers, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_delay = retry_delay
+        self._permanent_errors = permanent_errors
+        self.claim_retry_delay = claim_retry_delay
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._start_lock = threading.Lock()
+
+    def _job_path(self, kind: str, draft_id: str) -> Path:
+        return self.directories[kind] / draft_id / JOB_FILENAME
+
+    def _write_job(self, kind: str, draft_id: str, job: dict) -> None:
+        path = self._job_path(kind, draft_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with tmp_path.open('w', encoding='utf-8') as handle:
+            json.dump(job, handle, indent=2)
+        os.replace(tmp_path, path)
+
+    def status(self, kind: str, draft_id: str) -> Optional[dict]:
+        path = self._job_path(kind, draft_id)
+        if not path.exists():
+            return None
+        try:
+            with path.open('r', encoding='utf-8') as handle:
+                return json.load(handle)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def start(self) -> None:
+        """Create the pool and pick up jobs left unfinished by an earlier process."""
+
+        if self._executor is not None:
+            return
+        with self._start_lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ingest')
+        resumed = 0
+        for kind, directory in self.directories.items():
+            if not directory.exists():
+                continue
+            for job_path in directory.glob(f'*/{JOB_FILENAME}'):
+                job = self.status(kind, job_path.parent.name)
+                if job and job.get('status') in (QUEUED, RUNNING):
+                    self._executor.submit(self._run, kind, job_path.parent.name)
+                    resumed += 1
+        if resumed:
+            logger.info('Resumed %s unfinished ingestion jobs', resumed)
+
+    def submit(self, kind: str, draft_id: str, **params) -> dict:
+        """Queue ``draft_id``; ``params`` are stored on the job for the runner."""
+
+        job = {
+            'kind': kind,
+            'draft_id': draft_id,
+            'status': QUEUED,
+            'attempts': 0,
+            'error': None,
+            'params': params,
+            'queued_at': _now(),
+            'started_at': None,
+            'finished_at': None,
+            'timings': {},
+        }
+        self._write_job(kind, draft_id, job)
+        self.start()
+        self._executor.submit(self._run, kind, draft_id)
+        return job
+
+    def _claim(self, kind: str, draft_id: str) -> Optional[FileLock]:
+        lock = FileLock(self.directories[kind] / draft_id / LOCK_FILENAME)
+        try:
+            return lock if lock.acquire(blocking=False) else None
+        except FileNotFoundError:
+            return None  # draft deleted before the job ran
+
+    def _retry_claim(self, kind: str, draft_id: str) -> None:
+        """Submit a still-queued job again shortly; one that is running or finished is left to its holder."""
+
+        job = self.status(kind, draft_id)
+        if job is None or job.get('status') != QUEUED or self._executor is None:
+            return
+        timer = threading.Timer(self.claim_retry_delay, self._resubmit, (self._executor, kind, draft_id))
+        timer.daemon = True
+        timer.start()
+
+    def _resubmit(self, executor: ThreadPoolExecutor, kind: str, draft_id: str) -> None:
+        try:
+            executor.submit(self._run, kind, draft_id)
+        except RuntimeError:
+            pass  # pool shut down meanwhile; start() picks the job up on the next run
+
+    def _run(self, kind: str, draft_id: str) -> None:
+        lock = self._claim(kind, draft_id)
+        if lock is None:
+            self._retry_claim(kind, draft_id)
+            return
+        try:
+            self._run_claimed(kind, draft_id)
+        except Exception:  # pragma: no cover - keep the worker thread alive
+            logger.exception('Ingestion job %s/%s crashed', kind, draft_id)
+        finally:
+            lock.release()
+
+    def _run_claimed(self, kind: str, draft_id: str) -> None:
+        job = self.status(kind, draft_id)
+        if job is None or job.get('status') not in (QUEUED, RUNNING):
+            return
+        draft_dir = self.directories[kind] / draft_id
+        queued_at = datetime.fromisoformat(job['queued_at'])
+        job['started_at'] = _now()
+        job['timings']['wait_seconds'] = round(
+            (datetime.fromisoformat(job['started_at']) - queued_at).total_seconds(), 3
+        )
+
+        while True:
+            job['attempts'] += 1
+            job['status'] = RUNNING
+            self._write_job(kind, draft_id, job)
+            started = time.perf_counter()
+            try:
+                self._runner(kind, draft_dir, job)
+            except Exception as exc:
+                elapsed = round(time.perf_counter() - started, 3)
+                job['timings'].setdefault('attempt_seconds', []).append(elapsed)
+                job['error'] = str(exc) or exc.__class__.__name__
+                retryable = not isinstance(exc, self._permanent_errors)
+                if retryable and job['attempts'] < self.max_attempts:
+                    logger.warning(
+                        'Ingestion job %s/%s failed (attempt %s/%s): %s',
+                        kind, draft_id, job['attempts'], self.max_attempts, exc,
+                    )
+                    job['status'] = QUEUED
+                    self._write_job(kind, draft_id, job)
+                    time.sleep(self.retry_delay * job['attempts'])
+                    continue
+                logger.error('Ingestion job %s/%s failed: %s', kind, draft_id, exc)
+                job['status'] = FAILED
+            else:
+                job['timings'].setdefault('attempt_seconds', []).append(round(time.perf_counter() - started, 3))
+                job['status'] = DONE
+                job['error'] = None
+            break
+
+        job['finished_at'] = _now()
+        job['timings']['total_seconds'] = round(
+            (datetime.fromisoformat(job['finished_at']) - queued_at).total_seconds(), 3
+        )
+        self._write_job(kind, draft_id, job)
+        logger.info(
+            'Ingestion job %s/%s %s after %s attempt(s) in %ss',
+            kind, draft_id, job['status'], job['attempts'], job['timings']['total_seconds'],
+        )
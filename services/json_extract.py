@@ -0,0 +1,215 @@
+"""Tolerant parsing of the JSON object in an LLM answer, shared by every ingest pipeline.
+
+A well-formed answer costs one ``json.loads``. Anything else (prose around
+the object, code fences, several objects) goes through a single string- and
+escape-aware scan that lists the balanced top-level ``{...}`` spans, and
+each span is parsed once, largest first. Only when none parses is a light
+repair tried: trailing commas, ``//`` comments, smart quotes and a
+truncated tail are fixed before a last parse. ``/metrics`` counts the path
+taken under ``json_coerce.*``.
+
+``conform`` then checks the object against a per-document schema (top-level
+key -> expected type) and fixes the shape slips that are safe to fix, so a
+stray type does not send the whole document back to the model.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Mapping, Optional, Union
+
+from .metrics import metrics
+
+# Top-level key -> accepted type(s); null is always accepted
+Schema = Mapping[str, Union[type, tuple[type, ...]]]
+
+_SIGNIFICANT = re.compile(r'[{}"\\]')
+_SMART_QUOTES = '“”'
+
+
+def _object_spans(text: str) -> tuple[list[tuple[int, int]], Optional[int]]:
+    """Balanced top-level ``{...}`` spans, and where an unclosed trailing object starts."""
+
+    spans: list[tuple[int, int]] = []
+    depth = 0
+    start = -1
+    in_string = False
+    escaped = -1  # index of the character a backslash escapes
+    for match in _SIGNIFICANT.finditer(text):
+        index = match.start()
+        if index == escaped:
+            continue
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                escaped = index + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = depth > 0  # quotes in the surrounding prose are not JSON strings
+        elif char == '{':
+            if depth == 0:
+                start = index
+            depth += 1
+        elif char == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, index + 1))
+    return spans, (start if depth else None)
+
+
+def _in_code_fence(text: str, index: int) -> bool:
+    return text.count('```', 0, index) % 2 == 1
+
+
+def _close(out: list[str], stack: list[str]) -> str:
+    text = ''.join(out).rstrip()
+    text = text.rstrip(',').rstrip()
+    if text.endswith(':'):
+        text += ' null'
+    return text + ''.join(reversed(stack))
+
+
+def _repair(fragment: str) -> list[str]:
+    """Repaired versions of ``fragment`` to try in order (a cut-back one when it was truncated)."""
+
+    out: list[str] = []
+    stack: list[str] = []
+    safe: Optional[tuple[int, list[str]]] = None  # output length and open brackets at the last comma
+    in_string = ''  # the quote that closes the current string
+    escape = False
+    index = 0
+    length = len(fragment)
+    while index < length:
+        char = fragment[index]
+        index += 1
+        if in_string:
+            if escape:
+                escape = False
+                out.append(char)
+            elif char == '\\':
+                escape = True
+                out.append(char)
+            elif char == in_string or (in_string in _SMART_QUOTES and char in _SMART_QUOTES):
+                in_string = ''
+                out.append('"')
+            elif char == '"':
+                out.append('\\"')  # straight quote inside a smart-quoted string
+            elif char == '\n':
+                out.append('\\n')
+            else:
+                out.append(char)
+        elif char == '"' or char in _SMART_QUOTES:
+            in_string = '"' if char == '"' else '”'
+            out.append('"')
+        elif char == '/' and fragment.startswith('/', index):
+            newline = fragment.find('\n', index)
+            index = length if newline == -1 else newline
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+            out.append(char)
+        elif char in '}]':
+            while out and (out[-1].isspace() or out[-1] == ','):
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                break
+        else:
+            if char == ',':
+                safe = (len(out), list(stack))
+            out.append(char)
+
+    if not in_string and not stack:
+        return [''.join(out)]
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    attempts = [_close(out, stack)]
+    if safe is not None:
+        attempts.append(_close(out[: safe[0]], safe[1]))
+    return attempts
+
+
+def extract_json_object(text: str, schema: Optional[Schema] = None) -> dict:
+    """The JSON object in ``text``, tolerating prose, code fences and light damage.
+
+    Raises ``ValueError`` when no object can be recovered, or when ``schema``
+    is given and the object holds none of its keys.
+    """
+
+    stripped = (text or '').strip()
+    tried: set[str] = set()
+    if stripped.startswith('{'):
+        try:
+            parsed = json.loads(stripped)
+        except ValueError:
+            tried.add(stripped)
+        else:
+            if isinstance(parsed, dict):
+                return conform(parsed, schema) if schema else parsed
+
+    spans, open_start = _object_spans(text)
+    failed: list[str] = []
+    for start, end in sorted(spans, key=lambda span: span[0] - span[1]):
+        candidate = text[start:end]
+        if candidate in tried:
+            failed.append(candidate)
+            continue
+        tried.add(candidate)
+        try:
+            parsed = json.loads(candidate)
+        except ValueError:
+            failed.append(candidate)
+            continue
+        metrics.increment('json_coerce.code_fence' if _in_code_fence(text, start) else 'json_coerce.brace_block')
+        return conform(parsed, schema) if schema else parsed
+
+    if open_start is not None:
+        failed.append(text[open_start:])
+    for candidate in failed:
+        for repaired in _repair(candidate):
+            if repaired in tried:
+                continue
+            tried.add(repaired)
+            try:
+                parsed = json.loads(repaired)
+            except ValueError:
+                continue
+            if isinstance(parsed, dict):
+                metrics.increment('json_coerce.repaired')
+                return conform(parsed, schema) if schema else parsed
+
+    metrics.increment('json_coerce.failed')
+    raise ValueError('LLM response was not valid JSON.')
+
+
+def conform(parsed: dict, schema: Schema) -> dict:
+    """``parsed`` with top-level values fitted to ``schema`` where that is unambiguous.
+
+    A lone object where a list is expected is wrapped, numbers become strings
+    where text is expected, and any other mismatch is set to null. Unknown
+    keys are kept. An object with none of the schema's keys is rejected.
+    """
+
+    if parsed and not any(key in parsed for key in schema):
+        metrics.increment('json_schema.rejected')
+        raise ValueError('LLM response does not match the expected JSON shape.')
+
+    fixed = dict(parsed)
+    for key, expected in schema.items():
+        value = fixed.get(key)
+        if value is None or isinstance(value, expected):
+            continue
+        accepted = expected if isinstance(expected, tuple) else (expected,)
+        if list in accepted and isinstance(value, dict):
+            fixed[key] = [value]
+        elif str in accepted and isinstance(value, (int, float)) and not isinstance(value, bool):
+            fixed[key] = str(value)
+        else:
+            fixed[key] = None
+        metrics.increment('json_schema.coerced')
+    return fixed
@@ -0,0 +1,129 @@
+"""Incremental parsing of a streamed JSON object answer.
+
+Ingestion prompts ask for one JSON object whose top-level keys (``client``,
+``trip``, ``flights``, ...) are independent. ``JSONFieldStream`` is fed the
+completion text as it arrives and hands back each top-level field as soon
+as its value closes, so a preview can fill in long before the model is done.
+"""
+
+from __future__ import annotations
+
+import json
+from contextlib import closing
+from typing import Callable, Optional
+
+from . import llm_client
+
+# Scanner states while inside the top-level object
+_KEY, _COLON, _VALUE, _IN_VALUE, _AFTER_VALUE = range(5)
+
+FieldCallback = Callable[[str, object], None]
+
+
+class JSONFieldStream:
+    """Feed text deltas of one JSON object; get each top-level ``(key, value)`` once it closes.
+
+    Text before the opening brace (prose, a code fence) is skipped. A value
+    that fails to parse is dropped here; the caller still parses the full
+    answer at the end, so the stream only ever drives a preview.
+    """
+
+    def __init__(self) -> None:
+        self.fields: dict[str, object] = {}
+        self.done = False
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._state = _KEY
+        self._in_string = False
+        self._escape = False
+        self._key: Optional[str] = None
+        self._mark = 0  # where the current key or value starts
+
+    def feed(self, text: str) -> list[tuple[str, object]]:
+        self._buffer += text
+        closed: list[tuple[str, object]] = []
+        buffer = self._buffer
+        for index in range(self._pos, len(buffer)):
+            if self.done:
+                break
+            char = buffer[index]
+            if self._depth == 0:
+                if char == '{':
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._string_closed(index, closed)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state == _KEY:
+                    self._mark = index
+                elif self._depth == 1 and self._state == _VALUE:
+                    self._mark, self._state = index, _IN_VALUE
+            elif char in '{[':
+                if self._depth == 1 and self._state == _VALUE:
+                    self._mark, self._state = index, _IN_VALUE
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 1 and self._state == _IN_VALUE:
+                    self._emit(index + 1, closed)
+                elif self._depth == 0:
+                    if self._state == _IN_VALUE:
+                        self._emit(index, closed)
+                    self.done = True
+            elif self._depth != 1:
+                continue
+            elif char == ':' and self._state == _COLON:
+                self._state = _VALUE
+            elif char == ',':
+                if self._state == _IN_VALUE:
+                    self._emit(index, closed)
+                self._state = _KEY
+            elif not char.isspace() and self._state == _VALUE:
+                self._mark, self._state = index, _IN_VALUE
+        self._pos = len(buffer)
+        return closed
+
+    def _string_closed(self, index: int, closed: list) -> None:
+        if self._state == _KEY:
+            try:
+                self._key = json.loads(self._buffer[self._mark : index + 1])
+            except ValueError:
+                self._key = None
+            self._state = _COLON
+        elif self._state == _IN_VALUE and self._buffer[self._mark] == '"':
+            self._emit(index + 1, closed)
+
+    def _emit(self, end: int, closed: list) -> None:
+        self._state = _AFTER_VALUE
+        if self._key is None:
+            return
+        try:
+            value = json.loads(self._buffer[self._mark : end])
+        except ValueError:
+            return
+        self.fields[self._key] = value
+        closed.append((self._key, value))
+
+
+def stream_json_fields(messages: list[dict[str, str]], on_field: FieldCallback) -> llm_client.LLMResponse:
+    """``llm_client.chat`` for JSON answers, calling ``on_field`` for each top-level field as it closes."""
+
+    stream = llm_client.chat_stream(messages, enforce_json=True)
+    fields = JSONFieldStream()
+    # Closed even when on_field raises, so the HTTP stream and scheduler slot are released at once
+    with closing(iter(stream)) as deltas:
+        for delta in deltas:
+            for key, value in fields.feed(delta):
+                on_field(key, value)
+    return stream.response
@@ -0,0 +1,149 @@
+"""Process-wide LRU cache of parsed lead JSON files, validated against the file's stat."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+try:  # pragma: no cover - optional out-of-band change notifications
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover
+    FileSystemEventHandler = object  # type: ignore
+    Observer = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class JsonFileCache:
+    """Parsed ``record.json``/``metadata.json``/``todos.json`` keyed by path.
+
+    An entry is reused only while the file's ``(st_mtime_ns, st_size)`` still
+    matches, so out-of-band edits are picked up on the next read without a
+    watcher. Values are kept as pickled snapshots: each hit returns a fresh
+    object that callers may mutate, and unpickling is still cheaper than
+    re-reading and parsing the JSON. ``max_entries=0`` disables caching.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[tuple[int, int], bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def load(self, path: Path) -> Any:
+        """Parsed JSON at ``path``; raises ``OSError``/``JSONDecodeError`` like ``json.load``."""
+
+        if not self.enabled:
+            with path.open('r', encoding='utf-8') as handle:
+                return json.load(handle)
+
+        key = str(path)
+        stat = os.stat(key)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                snapshot = entry[1]
+            else:
+                self.misses += 1
+                snapshot = None
+        if snapshot is not None:
+            return pickle.loads(snapshot)
+
+        with path.open('r', encoding='utf-8') as handle:
+            data = json.load(handle)
+        with self._lock:
+            self._entries[key] = (signature, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
+
+    def invalidate(self, path: Path) -> None:
+        with self._lock:
+            self._entries.pop(str(path), None)
+
+    def invalidate_tree(self, directory: Path) -> None:
+        """Drop every entry below ``directory`` (a record moved or removed)."""
+        prefix = str(directory) + os.sep
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def resize(self, max_entries: int) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > max(max_entries, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+json_cache = JsonFileCache()
+
+
+class _InvalidateOnChange(FileSystemEventHandler):  # type: ignore[misc]
+    def __init__(self, cache: JsonFileCache) -> None:
+        super().__init__()
+        self._cache = cache
+
+    def on_any_event(self, event) -> None:
+        for attribute in ('src_path', 'dest_path'):
+            path = getattr(event, attribute, None)
+            if not path:
+                continue
+            if getattr(event, 'is_directory', False):
+                self._cache.invalidate_tree(Path(path))
+            else:
+                self._cache.invalidate(Path(path))
+
+
+def start_watcher(directories: Iterable[Path], cache: JsonFileCache = json_cache) -> Optional[Any]:
+    """Evict entries as soon as files change on disk; needs the optional ``watchdog`` package.
+
+    The stat check already catches edits on the next read, the watcher only
+    closes the gap for rewrites that keep both size and mtime. Returns the
+    running observer, or None when watchdog is not installed.
+    """
+
+    if Observer is None:
+        logger.warning('Install the `watchdog` package to watch lead directories for changes.')
+        return None
+    observer = Observer()
+    handler = _InvalidateOnChange(cache)
+    for directory in directories:
+        directory.mkdir(parents=True, exist_ok=True)
+        observer.schedule(handler, str(directory), recursive=True)
+    observer.daemon = True
+    observer.start()
+    return observer
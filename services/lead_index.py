@@ -0,0 +1,582 @@
+"""Persistent summary index so list pages avoid crawling every record on disk."""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+from .lead_cache import json_cache
+from .lead_layout import LAYOUTS, iter_record_directories, iter_shard_directories, shard_parts
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the summary/todo row shape changes so existing indexes rebuild.
+INDEX_VERSION = 3
+
+RECORD_FILENAME = 'record.json'
+
+# Seconds a lead type counts as fresh after a check, so a dashboard's dozen reads cost one probe
+CHECK_INTERVAL = float(os.getenv('SKYDESK_INDEX_CHECK_SECONDS', '2'))
+
+SummaryBuilder = Callable[[str, str, dict], dict]
+SortKeyBuilder = Callable[[dict], str]
+# Returns (due_sort, item) pairs for the lead's active To Dos.
+TodoCollector = Callable[[str, str, dict], list]
+
+# /leads sort keys -> presorted summary columns (shared by both store backends)
+SUMMARY_SORT_COLUMNS = {
+    'submitted_at': 'submitted_sort',
+    'name': 'name_sort',
+    'destination': 'destination_sort',
+    'travel_dates': 'travel_sort',
+}
+
+
+def summary_sort_values(summary: dict) -> tuple[str, str, str]:
+    """``(name_sort, destination_sort, travel_sort)`` for a summary row."""
+    return (
+        (summary.get('name_value') or '').lower(),
+        (summary.get('destination_value') or '').lower(),
+        (summary.get('travel_dates_value') or '').lower(),
+    )
+
+
+def summary_filter(record_type: str, search: Optional[str]) -> tuple[str, list]:
+    """``WHERE`` clause and parameters selecting one type, optionally by name/destination text."""
+    clause = 'record_type = ?'
+    params: list = [record_type]
+    needle = (search or '').strip().lower()
+    if needle:
+        pattern = '%' + needle.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        clause += " AND (name_sort LIKE ? ESCAPE '\\' OR destination_sort LIKE ? ESCAPE '\\')"
+        params.extend([pattern, pattern])
+    return clause, params
+
+
+def summary_columns(sort: str) -> tuple[str, str]:
+    """Order columns for a ``SUMMARY_SORT_COLUMNS`` key, ties broken by record id."""
+    column = SUMMARY_SORT_COLUMNS.get(sort)
+    if column is None:
+        raise ValueError(f'Unknown sort key: {sort!r}')
+    return column, 'record_id'
+
+
+# Full /todos order, so every row has a distinct position to seek past
+TODO_ORDER_COLUMNS = ('due_sort', 'type_sort', 'name_sort', 'record_id', 'todo_id')
+
+
+@dataclass
+class Page:
+    """One page of rows plus opaque cursors for the neighbouring pages (None at either end)."""
+
+    rows: list[dict]
+    next_cursor: Optional[str] = None  # pass as ``after`` for the following page
+    prev_cursor: Optional[str] = None  # pass as ``before`` for the preceding page
+
+
+def encode_cursor(values: Sequence[str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: Optional[str], size: int) -> Optional[list]:
+    """The key in ``token``, or None when it is missing or not a cursor for ``size`` columns."""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(value, str) for value in values):
+        return None
+    return values
+
+
+def seek_page(
+    conn: sqlite3.Connection,
+    *,
+    table: str,
+    payload: str,
+    where: str,
+    params: Sequence,
+    columns: Sequence[str],
+    descending: bool,
+    limit: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+) -> Page:
+    """Keyset pagination: seek past the cursor's key on ``columns`` instead of skipping rows.
+
+    ``columns`` must end in a unique column and be covered, after the
+    equality filters in ``where``, by an index, so every page costs one
+    index seek plus ``limit`` rows however deep it is. ``before`` walks
+    back from a page's first row; when that reaches the start the first
+    page is returned as it would be from a fresh load.
+    """
+
+    backwards = before is not None
+    cursor = decode_cursor(before if backwards else after, len(columns))
+    if cursor is None:
+        backwards = False
+    scan_descending = descending != backwards
+    clause = where
+    values = list(params)
+    if cursor is not None:
+        key = ', '.join(columns)
+        marks = ', '.join('?' for _ in columns)
+        clause += f' AND ({key}) {"<" if scan_descending else ">"} ({marks})'
+        values.extend(cursor)
+    order = ', '.join(f'{column} {"DESC" if scan_descending else "ASC"}' for column in columns)
+    rows = conn.execute(
+        f'SELECT {payload} AS payload, {", ".join(columns)} FROM {table} WHERE {clause} ORDER BY {order} LIMIT ?',
+        (*values, limit + 1),
+    ).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        if not more:
+            return seek_page(
+                conn, table=table, payload=payload, where=where, params=params,
+                columns=columns, descending=descending, limit=limit,
+            )
+        rows.reverse()
+    has_next = True if backwards else more
+    has_previous = backwards or cursor is not None
+    keys = [[row[column] for column in columns] for row in rows]
+    return Page(
+        rows=[json.loads(row['payload']) for row in rows],
+        next_cursor=encode_cursor(keys[-1]) if has_next and keys else None,
+        prev_cursor=encode_cursor(keys[0]) if has_previous and keys else None,
+    )
+
+
+def _record_shards(record_id: str) -> list[str]:
+    """Shard folders (relative paths) that hold ``record_id`` in any layout, outermost first."""
+    shards: list[str] = []
+    for layout in LAYOUTS:
+        parts = shard_parts(record_id, layout)[:-1]
+        for depth in range(1, len(parts) + 1):
+            shard = '/'.join(parts[:depth])
+            if shard not in shards:
+                shards.append(shard)
+    return shards
+
+
+class LeadIndex:
+    """Summary rows and active To Dos per lead, updated in place on each write.
+
+    Each lead type is rebuilt from disk only when it has never been indexed,
+    when ``INDEX_VERSION`` changes, or when the mtime of its directory or of
+    one of its shard folders no longer matches the value stamped at the last
+    indexed write (a record created, moved or removed out of band). Shard
+    mtimes live in ``index_shards``: a rebuild records them all, a write
+    re-stamps only the folders on its record's path, and a freshness check
+    stats the known folders without listing any directory. ``ensure_fresh``
+    runs that check at most once per ``check_interval`` seconds per type, so
+    an out-of-band change shows up within that interval.
+    Edits to an existing ``record.json``/``todos.json`` made outside the app
+    need an explicit ``rebuild()``; ``verify_todos`` reports leads whose
+    stored To Dos have drifted from disk.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        directories: dict[str, Path],
+        *,
+        summarise: SummaryBuilder,
+        sort_key: SortKeyBuilder,
+        collect_todos: TodoCollector,
+        check_interval: float = CHECK_INTERVAL,
+    ) -> None:
+        self.db_path = db_path
+        self.directories = directories
+        self.check_interval = check_interval
+        self._summarise = summarise
+        self._sort_key = sort_key
+        self._collect_todos = collect_todos
+        self._schema_ready = False
+        self._checked: dict[str, float] = {}  # record type -> monotonic time it was last found fresh
+        self._check_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            self._create_schema(conn)
+            self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute('PRAGMA journal_mode=WAL')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(lead_summaries)')}
+        if columns and 'travel_sort' not in columns:
+            # Derived data: drop the old shape and let the version bump rebuild it
+            conn.execute('DROP TABLE lead_summaries')
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS index_meta (
+                record_type TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                dir_mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS index_shards (
+                record_type TEXT NOT NULL,
+                shard TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                PRIMARY KEY (record_type, shard)
+            );
+            CREATE TABLE IF NOT EXISTS lead_summaries (
+                record_type TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                submitted_sort TEXT NOT NULL,
+                name_sort TEXT NOT NULL,
+                destination_sort TEXT NOT NULL,
+                travel_sort TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                PRIMARY KEY (record_type, record_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_lead_summaries_submitted
+                ON lead_summaries (submitted_sort);
+            CREATE INDEX IF NOT EXISTS idx_lead_summaries_type_submitted
+                ON lead_summaries (record_type, submitted_sort, record_id);
+            CREATE INDEX IF NOT EXISTS idx_lead_summaries_type_name
+                ON lead_summaries (record_type, name_sort, record_id);
+            CREATE INDEX IF NOT EXISTS idx_lead_summaries_type_destination
+                ON lead_summaries (record_type, destination_sort, record_id);
+            CREATE INDEX IF NOT EXISTS idx_lead_summaries_type_travel
+                ON lead_summaries (record_type, travel_sort, record_id);
+            CREATE TABLE IF NOT EXISTS active_todos (
+                record_type TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                todo_id TEXT NOT NULL,
+                due_sort TEXT NOT NULL,
+                type_sort TEXT NOT NULL,
+                name_sort TEXT NOT NULL,
+                item TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_active_todos_lead
+                ON active_todos (record_type, record_id);
+            DROP INDEX IF EXISTS idx_active_todos_due;
+            CREATE INDEX IF NOT EXISTS idx_active_todos_order
+                ON active_todos (due_sort, type_sort, name_sort, record_id, todo_id);
+            """
+        )
+        conn.commit()
+
+    def _dir_mtime_ns(self, record_type: str) -> Optional[int]:
+        directory = self.directories.get(record_type)
+        if directory is None:
+            return None
+        try:
+            return directory.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def _shard_mtimes(directory: Path, shards: Iterable[str]) -> dict[str, Optional[int]]:
+        """mtime of each ``shard`` (a path relative to ``directory``), None when it is gone."""
+        mtimes: dict[str, Optional[int]] = {}
+        for shard in shards:
+            try:
+                mtimes[shard] = (directory / shard).stat().st_mtime_ns
+            except OSError:
+                mtimes[shard] = None
+        return mtimes
+
+    def _stamp(self, conn: sqlite3.Connection, record_type: str, *, record_id: Optional[str] = None) -> None:
+        """Record the directory mtimes the index now matches.
+
+        Without ``record_id`` (a rebuild) every shard folder is walked and
+        stored; with it only the folders that can hold that record are.
+        """
+
+        conn.execute(
+            'INSERT OR REPLACE INTO index_meta (record_type, version, dir_mtime_ns) VALUES (?, ?, ?)',
+            (record_type, INDEX_VERSION, self._dir_mtime_ns(record_type) or 0),
+        )
+        directory = self.directories.get(record_type)
+        if directory is None:
+            return
+        if record_id is None:
+            conn.execute('DELETE FROM index_shards WHERE record_type = ?', (record_type,))
+            shards = (shard.relative_to(directory).as_posix() for shard in iter_shard_directories(directory))
+        else:
+            shards = _record_shards(record_id)
+        for shard, mtime in self._shard_mtimes(directory, shards).items():
+            if mtime is None:
+                conn.execute('DELETE FROM index_shards WHERE record_type = ? AND shard = ?', (record_type, shard))
+            else:
+                conn.execute(
+                    'INSERT OR REPLACE INTO index_shards (record_type, shard, mtime_ns) VALUES (?, ?, ?)',
+                    (record_type, shard, mtime),
+                )
+
+    def _summary_values(self, record_type: str, record_id: str, payload: dict) -> tuple:
+        summary = self._summarise(record_type, record_id, payload)
+        return (record_type, record_id, self._sort_key(summary), *summary_sort_values(summary), json.dumps(summary))
+
+    def _todo_values(self, record_type: str, record_id: str, payload: dict) -> list[tuple]:
+        values = []
+        for due_sort, item in self._collect_todos(record_type, record_id, payload):
+            values.append(
+                (
+                    record_type,
+                    record_id,
+                    str(item.get('todo_id') or ''),
+                    due_sort,
+                    record_type.title(),
+                    (item.get('name_display') or '').lower(),
+                    json.dumps(item, sort_keys=True),
+                )
+            )
+        return values
+
+    def iter_payloads(self, record_type: str) -> Iterator[tuple[str, dict]]:
+        directory = self.directories.get(record_type)
+        if directory is None or not directory.exists():
+            return
+        for record_dir in iter_record_directories(directory):
+            payload_path = record_dir / RECORD_FILENAME
+            if not payload_path.exists():
+                continue
+            try:
+                payload = json_cache.load(payload_path)
+            except (OSError, json.JSONDecodeError):
+                continue
+            yield record_dir.name, payload
+
+    @staticmethod
+    def _replace_todos(conn: sqlite3.Connection, record_type: str, record_id: str, values: list[tuple]) -> None:
+        conn.execute(
+            'DELETE FROM active_todos WHERE record_type = ? AND record_id = ?',
+            (record_type, record_id),
+        )
+        conn.executemany(
+            'INSERT INTO active_todos (record_type, record_id, todo_id, due_sort, type_sort, name_sort, item) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            values,
+        )
+
+    def is_stale(self, record_type: str) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT version, dir_mtime_ns FROM index_meta WHERE record_type = ?',
+                (record_type,),
+            ).fetchone()
+            shards = {
+                shard['shard']: shard['mtime_ns']
+                for shard in conn.execute('SELECT shard, mtime_ns FROM index_shards WHERE record_type = ?', (record_type,))
+            }
+        if row is None or row['version'] != INDEX_VERSION:
+            return True
+        if row['dir_mtime_ns'] != (self._dir_mtime_ns(record_type) or 0):
+            return True
+        # A new shard folder changes its parent's mtime, so only the known ones need a stat
+        directory = self.directories.get(record_type)
+        return directory is not None and self._shard_mtimes(directory, shards) != shards
+
+    def ensure_fresh(self, record_type: str) -> None:
+        """Rebuild ``record_type`` from disk when the index is missing or stale.
+
+        A type checked within the last ``check_interval`` seconds is trusted.
+        """
+
+        checked = self._checked.get(record_type)
+        if checked is not None and time.monotonic() - checked < self.check_interval:
+            return
+        with self._check_lock:
+            checked = self._checked.get(record_type)
+            if checked is not None and time.monotonic() - checked < self.check_interval:
+                return
+            if self.is_stale(record_type):
+                self.rebuild(record_type)
+            self._checked[record_type] = time.monotonic()
+
+    def rebuild(self, record_type: Optional[str] = None) -> int:
+        """Re-scan lead directories and replace their summary and To Do rows.
+
+        Returns the number of leads indexed.
+        """
+
+        targets = [record_type] if record_type else list(self.directories)
+        written = 0
+        for target in targets:
+            summary_rows = []
+            todo_rows = []
+            for record_id, payload in self.iter_payloads(target):
+                summary_rows.append(self._summary_values(target, record_id, payload))
+                todo_rows.extend(self._todo_values(target, record_id, payload))
+
+            with closing(self._connect()) as conn:
+                with conn:
+                    conn.execute('DELETE FROM lead_summaries WHERE record_type = ?', (target,))
+                    conn.execute('DELETE FROM active_todos WHERE record_type = ?', (target,))
+                    conn.executemany(
+                        'INSERT INTO lead_summaries (record_type, record_id, submitted_sort, name_sort, destination_sort, travel_sort, summary) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        summary_rows,
+                    )
+                    conn.executemany(
+                        'INSERT INTO active_todos (record_type, record_id, todo_id, due_sort, type_sort, name_sort, item) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        todo_rows,
+                    )
+                    self._stamp(conn, target)
+            logger.info('Rebuilt %s index: %s leads, %s active To Dos', target, len(summary_rows), len(todo_rows))
+            written += len(summary_rows)
+        return written
+
+    def upsert(self, record_type: str, record_id: str, payload: dict) -> None:
+        """Replace the summary row and active To Dos for a single lead.
+
+        Callers create the record directory first; the type directory mtime is
+        re-stamped so the new entry is not mistaken for an out-of-band change.
+        Call ``ensure_fresh`` before the write to pick up earlier changes.
+        """
+
+        summary = self._summary_values(record_type, record_id, payload)
+        todos = self._todo_values(record_type, record_id, payload)
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO lead_summaries (record_type, record_id, submitted_sort, name_sort, destination_sort, travel_sort, summary) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    summary,
+                )
+                self._replace_todos(conn, record_type, record_id, todos)
+                self._stamp(conn, record_type, record_id=record_id)
+
+    def refresh_todos(self, record_type: str, record_id: str, payload: dict) -> None:
+        """Replace only the active To Do rows of one lead, after its ``todos.json`` changed."""
+
+        todos = self._todo_values(record_type, record_id, payload)
+        with closing(self._connect()) as conn:
+            with conn:
+                self._replace_todos(conn, record_type, record_id, todos)
+
+    def remove(self, record_type: str, record_id: str) -> None:
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    'DELETE FROM lead_summaries WHERE record_type = ? AND record_id = ?',
+                    (record_type, record_id),
+                )
+                self._replace_todos(conn, record_type, record_id, [])
+                self._stamp(conn, record_type, record_id=record_id)
+
+    def summaries(self, record_type: str) -> list[dict]:
+        """Summary rows for ``record_type``, newest record id first."""
+
+        self.ensure_fresh(record_type)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT summary FROM lead_summaries WHERE record_type = ? ORDER BY record_id DESC',
+                (record_type,),
+            ).fetchall()
+        return [json.loads(row['summary']) for row in rows]
+
+    def summary_page(
+        self,
+        record_type: str,
+        *,
+        sort: str = 'submitted_at',
+        descending: bool = True,
+        search: Optional[str] = None,
+        limit: int,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> Page:
+        """One page of summary rows for ``/leads``, seeked on a presorted index."""
+
+        self.ensure_fresh(record_type)
+        where, params = summary_filter(record_type, search)
+        with closing(self._connect()) as conn:
+            return seek_page(
+                conn, table='lead_summaries', payload='summary', where=where, params=params,
+                columns=summary_columns(sort), descending=descending, limit=limit, after=after, before=before,
+            )
+
+    def count(self, record_type: str, *, search: Optional[str] = None) -> int:
+        self.ensure_fresh(record_type)
+        where, params = summary_filter(record_type, search)
+        with closing(self._connect()) as conn:
+            row = conn.execute(f'SELECT COUNT(*) AS total FROM lead_summaries WHERE {where}', params).fetchone()
+        return int(row['total'])
+
+    def recent(self, limit: int) -> list[dict]:
+        """Most recently submitted/issued leads across every type."""
+
+        for record_type in self.directories:
+            self.ensure_fresh(record_type)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT summary FROM lead_summaries ORDER BY submitted_sort DESC LIMIT ?',
+                (limit,),
+            ).fetchall()
+        return [json.loads(row['summary']) for row in rows]
+
+    def active_todo_page(self, *, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> Page:
+        """Active To Dos across every lead ordered by due date (undated last)."""
+
+        for record_type in self.directories:
+            self.ensure_fresh(record_type)
+        with closing(self._connect()) as conn:
+            return seek_page(
+                conn, table='active_todos', payload='item', where='1', params=(),
+                columns=TODO_ORDER_COLUMNS, descending=False, limit=limit, after=after, before=before,
+            )
+
+    def count_active_todos(self) -> int:
+        for record_type in self.directories:
+            self.ensure_fresh(record_type)
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT COUNT(*) AS total FROM active_todos').fetchone()
+        return int(row['total'])
+
+    def verify_todos(self, record_type: Optional[str] = None, *, repair: bool = False) -> list[tuple[str, str]]:
+        """Compare stored active To Dos with the per-lead files on disk.
+
+        Returns ``(record_type, record_id)`` for every lead that differs. With
+        ``repair=True`` those leads are re-synced from disk.
+        """
+
+        targets = [record_type] if record_type else list(self.directories)
+        mismatched: list[tuple[str, str]] = []
+        for target in targets:
+            stored: dict[str, set] = {}
+            with closing(self._connect()) as conn:
+                for row in conn.execute(
+                    'SELECT record_id, todo_id, due_sort, item FROM active_todos WHERE record_type = ?',
+                    (target,),
+                ):
+                    stored.setdefault(row['record_id'], set()).add((row['todo_id'], row['due_sort'], row['item']))
+
+            expected: dict[str, list[tuple]] = {}
+            for record_id, payload in self.iter_payloads(target):
+                values = self._todo_values(target, record_id, payload)
+                if values:
+                    expected[record_id] = values
+
+            drifted = []
+            for record_id in sorted(set(stored) | set(expected)):
+                values = expected.get(record_id, [])
+                if stored.get(record_id, set()) != {(value[2], value[3], value[6]) for value in values}:
+                    drifted.append((record_id, values))
+            mismatched.extend((target, record_id) for record_id, _ in drifted)
+
+            if repair and drifted:
+                with closing(self._connect()) as conn:
+                    with conn:
+                        for record_id, values in drifted:
+                            self._replace_todos(conn, target, record_id, values)
+        return mismatched
@@ -0,0 +1,98 @@
+"""Directory layouts for ``leads/<type>/``: flat, or fanned out into shard folders."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Iterator
+
+RECORD_FILENAME = 'record.json'
+
+# flat: leads/<type>/<id>/
+# date: leads/<type>/<YYYY>/<MM>/<id>/ for timestamped enquiry IDs, hash shard otherwise
+# hash: leads/<type>/<2 hex chars>/<id>/
+LAYOUTS = ('flat', 'date', 'hash')
+
+_TIMESTAMP_ID = re.compile(r'^(\d{4})(\d{2})\d{2}T')
+_SHARD_NAME = re.compile(r'^(\d{4}|\d{2}|[0-9a-f]{2})$')
+
+
+def shard_parts(record_id: str, layout: str) -> tuple[str, ...]:
+    """Path components below the type directory for ``record_id``."""
+    if layout == 'flat':
+        return (record_id,)
+    if layout == 'date':
+        match = _TIMESTAMP_ID.match(record_id)
+        if match:
+            return (match.group(1), match.group(2), record_id)
+    digest = hashlib.sha1(record_id.encode('utf-8')).hexdigest()
+    return (digest[:2], record_id)
+
+
+def resolve_record_directory(directory: Path, record_id: str, layout: str) -> Path:
+    """Existing directory for ``record_id`` in any layout, else where ``layout`` puts it.
+
+    Checking every layout keeps records readable while a migration is moving
+    them between layouts.
+    """
+    preferred = directory.joinpath(*shard_parts(record_id, layout))
+    if preferred.exists():
+        return preferred
+    for candidate_layout in LAYOUTS:
+        if candidate_layout == layout:
+            continue
+        candidate = directory.joinpath(*shard_parts(record_id, candidate_layout))
+        if candidate.exists():
+            return candidate
+    return preferred
+
+
+def _is_shard(path: Path) -> bool:
+    return bool(_SHARD_NAME.match(path.name)) and path.is_dir() and not (path / RECORD_FILENAME).exists()
+
+
+def iter_shard_directories(directory: Path) -> Iterator[Path]:
+    """Every fan-out folder (year, month or hash prefix) below ``directory``."""
+    if not directory.exists():
+        return
+    for child in directory.iterdir():
+        if _is_shard(child):
+            yield child
+            yield from iter_shard_directories(child)
+
+
+def iter_record_directories(directory: Path) -> Iterator[Path]:
+    """Every record directory below ``directory``, whichever layout holds it."""
+    if not directory.exists():
+        return
+    for child in directory.iterdir():
+        if not child.is_dir():
+            continue
+        if _is_shard(child):
+            yield from iter_record_directories(child)
+        else:
+            yield child
+
+
+def relocate_record(directory: Path, record_dir: Path, layout: str) -> bool:
+    """Move one record directory to its ``layout`` location; False if already there.
+
+    ``os.replace`` of a directory is atomic on one filesystem, so readers see
+    the record either at its old path or its new one.
+    """
+    target = directory.joinpath(*shard_parts(record_dir.name, layout))
+    if target == record_dir:
+        return False
+    if target.exists():
+        raise FileExistsError(f'{target} already exists; resolve the duplicate before migrating {record_dir}.')
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(record_dir, target)
+
+    # Drop shard folders the move left empty
+    parent = record_dir.parent
+    while parent != directory and parent.is_dir() and not any(parent.iterdir()):
+        parent.rmdir()
+        parent = parent.parent
+    return True
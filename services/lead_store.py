@@ -0,0 +1,730 @@
+"""Lead repository: one interface over the JSON-directory and SQLite backends."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from .file_lock import exclusive_lock
+from .lead_cache import json_cache
+from .lead_index import (
+    TODO_ORDER_COLUMNS,
+    LeadIndex,
+    Page,
+    SortKeyBuilder,
+    SummaryBuilder,
+    seek_page,
+    summary_columns,
+    summary_filter,
+    summary_sort_values,
+)
+from .lead_layout import resolve_record_directory
+
+logger = logging.getLogger(__name__)
+
+RECORD_FILENAME = 'record.json'
+METADATA_FILENAME = 'metadata.json'
+COMMUNICATIONS_FILENAME = 'communications.json'
+# Append-only touchpoint log: one {"seq": n, ...entry} object per line
+COMMUNICATIONS_LOG_FILENAME = 'communications.jsonl'
+TODOS_FILENAME = 'todos.json'
+
+# (record_type, record_id, payload, todos_index) -> [(due_sort, item), ...]
+TodoBuilder = Callable[[str, str, dict, dict], list]
+
+
+def load_json_object(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        data = json_cache.load(path)
+        return data if isinstance(data, dict) else {}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_json_object(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w', encoding='utf-8') as h:
+        json.dump(data, h, indent=2)
+    json_cache.invalidate(path)
+
+
+def iter_jsonl_reverse(path: Path, *, block_size: int = 8192) -> Iterator[dict]:
+    """Yield JSON objects from a JSONL file last line first, reading from the end.
+
+    Blank, truncated or otherwise malformed lines are skipped.
+    """
+    try:
+        handle = path.open('rb')
+    except OSError:
+        return
+    with handle:
+        handle.seek(0, os.SEEK_END)
+        position = handle.tell()
+        remainder = b''
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            handle.seek(position)
+            chunk = handle.read(step) + remainder
+            lines = chunk.split(b'\n')
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                item = _parse_jsonl_line(line)
+                if item is not None:
+                    yield item
+        item = _parse_jsonl_line(remainder)
+        if item is not None:
+            yield item
+
+
+def _parse_jsonl_line(line: bytes) -> Optional[dict]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        item = json.loads(line.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    return item if isinstance(item, dict) else None
+
+
+def legacy_communications(path: Path) -> dict:
+    """Read a pre-JSONL ``communications.json`` (dict index or list) as ``{seq: entry}``."""
+    if not path.exists():
+        return {}
+    try:
+        with path.open('r', encoding='utf-8') as handle:
+            data = json.load(handle)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if isinstance(data, list):
+        return {str(seq): entry for seq, entry in enumerate(data, start=1) if isinstance(entry, dict)}
+    if isinstance(data, dict):
+        return {str(key): entry for key, entry in data.items() if str(key).isdigit() and isinstance(entry, dict)}
+    return {}
+
+
+def next_index_key(index: dict) -> str:
+    """Next numeric key for the dict-indexed todos/communications files."""
+    try:
+        return str(max(int(k) for k in index.keys() if str(k).isdigit()) + 1)
+    except ValueError:
+        return '1'
+
+
+class LeadStore(ABC):
+    """Persistence for lead records, metadata, To Dos and communications.
+
+    Uploaded documents always live on disk under ``record_directory()``; only
+    the structured JSON moves between backends.
+    """
+
+    def __init__(self, directories: dict[str, Path], *, layout: str = 'flat') -> None:
+        self.directories = directories
+        self.layout = layout
+
+    def record_directory(self, record_type: str, record_id: str) -> Path:
+        """Where the lead lives on disk, in whichever layout currently holds it."""
+        return resolve_record_directory(self.directories[record_type], record_id, self.layout)
+
+    @abstractmethod
+    def exists(self, record_type: str, record_id: str) -> bool: ...
+
+    @abstractmethod
+    def load_record(self, record_type: str, record_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    def create_record(self, record_type: str, record_id: str, payload: dict, *, metadata: Optional[dict] = None) -> None:
+        """Store a new lead; raises ``ValueError`` when the ID is taken."""
+
+    @abstractmethod
+    def save_record(self, record_type: str, record_id: str, payload: dict) -> None: ...
+
+    @abstractmethod
+    def load_metadata(self, record_type: str, record_id: str) -> dict: ...
+
+    @abstractmethod
+    def load_todos(self, record_type: str, record_id: str) -> dict: ...
+
+    @abstractmethod
+    def save_todos(self, record_type: str, record_id: str, todos: dict) -> None: ...
+
+    @abstractmethod
+    def load_communications(self, record_type: str, record_id: str, *, limit: Optional[int] = None) -> dict:
+        """Touchpoints as ``{seq: entry}``; with ``limit`` only the newest ones."""
+
+    @abstractmethod
+    def append_communication(self, record_type: str, record_id: str, entry: dict) -> None: ...
+
+    @abstractmethod
+    def summaries(self, record_type: str) -> list[dict]: ...
+
+    @abstractmethod
+    def summary_page(
+        self,
+        record_type: str,
+        *,
+        sort: str = 'submitted_at',
+        descending: bool = True,
+        search: Optional[str] = None,
+        limit: int,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> Page:
+        """A page of summary rows ordered by a ``SUMMARY_SORT_COLUMNS`` key, optionally filtered by name/destination.
+
+        ``after``/``before`` are the cursors of a previous ``Page``; pages are
+        seeked on an index, so a deep page costs the same as the first.
+        """
+
+    @abstractmethod
+    def count(self, record_type: str, *, search: Optional[str] = None) -> int: ...
+
+    @abstractmethod
+    def recent(self, limit: int) -> list[dict]: ...
+
+    @abstractmethod
+    def active_todo_page(self, *, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> Page: ...
+
+    @abstractmethod
+    def count_active_todos(self) -> int: ...
+
+
+class JsonLeadStore(LeadStore):
+    """The original ``leads/<type>/<id>/*.json`` layout, queried via ``LeadIndex``."""
+
+    def __init__(
+        self,
+        directories: dict[str, Path],
+        *,
+        index_path: Path,
+        summarise: SummaryBuilder,
+        sort_key: SortKeyBuilder,
+        collect_todos: TodoBuilder,
+        layout: str = 'flat',
+    ) -> None:
+        super().__init__(directories, layout=layout)
+        self._communications_lock = threading.Lock()
+        # Next-seq allocation must also exclude other processes sharing the data directory
+        self._communications_file_lock = index_path.with_name('communications.lock')
+        self.index = LeadIndex(
+            index_path,
+            directories,
+            summarise=summarise,
+            sort_key=sort_key,
+            collect_todos=lambda record_type, record_id, payload: collect_todos(
+                record_type, record_id, payload, self.load_todos(record_type, record_id)
+            ),
+        )
+
+    def _path(self, record_type: str, record_id: str, filename: str) -> Path:
+        return self.record_directory(record_type, record_id) / filename
+
+    def exists(self, record_type: str, record_id: str) -> bool:
+        return self.record_directory(record_type, record_id).exists()
+
+    def load_record(self, record_type: str, record_id: str) -> Optional[dict]:
+        payload_path = self._path(record_type, record_id, RECORD_FILENAME)
+        if not payload_path.exists():
+            return None
+        try:
+            return json_cache.load(payload_path)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def create_record(self, record_type: str, record_id: str, payload: dict, *, metadata: Optional[dict] = None) -> None:
+        record_dir = self.record_directory(record_type, record_id)
+        if record_dir.exists():
+            raise ValueError(f'A {record_type} with this ID already exists.')
+
+        self.directories[record_type].mkdir(parents=True, exist_ok=True)
+        self.index.ensure_fresh(record_type)
+        record_dir.mkdir(parents=True, exist_ok=True)
+        save_json_object(record_dir / RECORD_FILENAME, payload)
+        if metadata is not None:
+            save_json_object(record_dir / METADATA_FILENAME, metadata)
+        self.index.upsert(record_type, record_id, payload)
+
+    def save_record(self, record_type: str, record_id: str, payload: dict) -> None:
+        save_json_object(self._path(record_type, record_id, RECORD_FILENAME), payload)
+        self.index.upsert(record_type, record_id, payload)
+
+    def load_metadata(self, record_type: str, record_id: str) -> dict:
+        return load_json_object(self._path(record_type, record_id, METADATA_FILENAME))
+
+    def load_todos(self, record_type: str, record_id: str) -> dict:
+        return load_json_object(self._path(record_type, record_id, TODOS_FILENAME))
+
+    def save_todos(self, record_type: str, record_id: str, todos: dict) -> None:
+        save_json_object(self._path(record_type, record_id, TODOS_FILENAME), todos)
+        payload = self.load_record(record_type, record_id)
+        if payload is not None:
+            self.index.refresh_todos(record_type, record_id, payload)
+
+    def load_communications(self, record_type: str, record_id: str, *, limit: Optional[int] = None) -> dict:
+        log_path = self._path(record_type, record_id, COMMUNICATIONS_LOG_FILENAME)
+        if not log_path.exists():
+            index = legacy_communications(self._path(record_type, record_id, COMMUNICATIONS_FILENAME))
+            if limit is not None:
+                keys = sorted(index, key=int)[-limit:] if limit > 0 else []
+                index = {key: index[key] for key in keys}
+            return index
+
+        newest_first: list[tuple[str, dict]] = []
+        for item in iter_jsonl_reverse(log_path):
+            if limit is not None and len(newest_first) >= limit:
+                break
+            seq = item.pop('seq', None)
+            if isinstance(seq, int):
+                newest_first.append((str(seq), item))
+        return dict(reversed(newest_first))
+
+    def append_communication(self, record_type: str, record_id: str, entry: dict) -> None:
+        log_path = self._path(record_type, record_id, COMMUNICATIONS_LOG_FILENAME)
+        with self._communications_lock, exclusive_lock(self._communications_file_lock):
+            if not log_path.exists():
+                self._compact_communications(record_type, record_id)
+            last = next(iter_jsonl_reverse(log_path), None)
+            seq = int(last.get('seq') or 0) + 1 if last else 1
+            line = json.dumps({'seq': seq, **entry}) + '\n'
+            # Terminate a line torn by an earlier crash before appending
+            if log_path.exists() and log_path.stat().st_size > 0:
+                with log_path.open('rb') as reader:
+                    reader.seek(-1, os.SEEK_END)
+                    if reader.read(1) != b'\n':
+                        line = '\n' + line
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            with log_path.open('ab') as handle:
+                handle.write(line.encode('utf-8'))
+
+    def compact_communications(self, record_type: str, record_id: str) -> int:
+        """Rewrite a lead's log as clean JSONL, migrating any legacy JSON file.
+
+        Malformed lines are dropped and duplicate sequence numbers keep their
+        last entry. Returns the number of entries written.
+        """
+
+        with self._communications_lock, exclusive_lock(self._communications_file_lock):
+            return self._compact_communications(record_type, record_id)
+
+    def _compact_communications(self, record_type: str, record_id: str) -> int:
+        record_dir = self.record_directory(record_type, record_id)
+        log_path = record_dir / COMMUNICATIONS_LOG_FILENAME
+        legacy_path = record_dir / COMMUNICATIONS_FILENAME
+        entries = {int(key): entry for key, entry in legacy_communications(legacy_path).items()}
+        for item in reversed(list(iter_jsonl_reverse(log_path))):
+            seq = item.pop('seq', None)
+            if isinstance(seq, int):
+                entries[seq] = item
+        if not entries and not log_path.exists() and not legacy_path.exists():
+            return 0
+
+        record_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = log_path.with_name(log_path.name + '.tmp')
+        with tmp_path.open('w', encoding='utf-8') as handle:
+            for seq in sorted(entries):
+                handle.write(json.dumps({'seq': seq, **entries[seq]}) + '\n')
+        os.replace(tmp_path, log_path)
+        if legacy_path.exists():
+            legacy_path.unlink()
+        return len(entries)
+
+    def summaries(self, record_type: str) -> list[dict]:
+        return self.index.summaries(record_type)
+
+    def summary_page(
+        self,
+        record_type: str,
+        *,
+        sort: str = 'submitted_at',
+        descending: bool = True,
+        search: Optional[str] = None,
+        limit: int,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> Page:
+        return self.index.summary_page(
+            record_type, sort=sort, descending=descending, search=search, limit=limit, after=after, before=before
+        )
+
+    def count(self, record_type: str, *, search: Optional[str] = None) -> int:
+        return self.index.count(record_type, search=search)
+
+    def recent(self, limit: int) -> list[dict]:
+        return self.index.recent(limit)
+
+    def active_todo_page(self, *, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> Page:
+        return self.index.active_todo_page(limit=limit, after=after, before=before)
+
+    def count_active_todos(self) -> int:
+        return self.index.count_active_todos()
+
+
+class SqliteLeadStore(LeadStore):
+    """Single-file SQLite backend (WAL) with indexed list, todo and detail queries.
+
+    Records, metadata, To Dos and communications are stored as JSON text next
+    to the columns the list pages sort and filter on.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        directories: dict[str, Path],
+        *,
+        summarise: SummaryBuilder,
+        sort_key: SortKeyBuilder,
+        collect_todos: TodoBuilder,
+        layout: str = 'flat',
+    ) -> None:
+        super().__init__(directories, layout=layout)
+        self.db_path = db_path
+        self._summarise = summarise
+        self._sort_key = sort_key
+        self._collect_todos = collect_todos
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            self._create_schema(conn)
+            self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute('PRAGMA journal_mode=WAL')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(records)')}
+        if columns and 'travel_sort' not in columns:
+            SqliteLeadStore._add_sort_columns(conn)
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                record_type TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                lead_id TEXT,
+                submitted_sort TEXT NOT NULL,
+                name_sort TEXT NOT NULL DEFAULT '',
+                destination_sort TEXT NOT NULL DEFAULT '',
+                travel_sort TEXT NOT NULL DEFAULT '',
+                travel_start TEXT,
+                travel_end TEXT,
+                payload TEXT NOT NULL,
+                metadata TEXT,
+                summary TEXT NOT NULL,
+                PRIMARY KEY (record_type, record_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_records_lead_id ON records (lead_id);
+            CREATE INDEX IF NOT EXISTS idx_records_submitted ON records (submitted_sort);
+            CREATE INDEX IF NOT EXISTS idx_records_type_submitted ON records (record_type, submitted_sort);
+            CREATE INDEX IF NOT EXISTS idx_records_type_travel ON records (record_type, travel_start, travel_end);
+            CREATE INDEX IF NOT EXISTS idx_records_type_submitted_id ON records (record_type, submitted_sort, record_id);
+            CREATE INDEX IF NOT EXISTS idx_records_type_name ON records (record_type, name_sort, record_id);
+            CREATE INDEX IF NOT EXISTS idx_records_type_destination ON records (record_type, destination_sort, record_id);
+            CREATE INDEX IF NOT EXISTS idx_records_type_travel_sort ON records (record_type, travel_sort, record_id);
+            CREATE TABLE IF NOT EXISTS todos (
+                record_type TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                todo_key TEXT NOT NULL,
+                item TEXT NOT NULL,
+                PRIMARY KEY (record_type, record_id, todo_key)
+            );
+            CREATE TABLE IF NOT EXISTS active_todos (
+                record_type TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                todo_id TEXT NOT NULL,
+                due_sort TEXT NOT NULL,
+                type_sort TEXT NOT NULL,
+                name_sort TEXT NOT NULL,
+                item TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_active_todos_lead ON active_todos (record_type, record_id);
+            DROP INDEX IF EXISTS idx_active_todos_due;
+            CREATE INDEX IF NOT EXISTS idx_active_todos_order ON active_todos (due_sort, type_sort, name_sort, record_id, todo_id);
+            CREATE TABLE IF NOT EXISTS communications (
+                record_type TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                entry TEXT NOT NULL,
+                PRIMARY KEY (record_type, record_id, seq)
+            );
+            """
+        )
+        conn.commit()
+
+    @staticmethod
+    def _add_sort_columns(conn: sqlite3.Connection) -> None:
+        """Add the ``/leads`` sort columns to a database created before they existed."""
+        with conn:
+            for column in ('name_sort', 'destination_sort', 'travel_sort'):
+                conn.execute(f"ALTER TABLE records ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+            rows = conn.execute('SELECT record_type, record_id, summary FROM records').fetchall()
+            conn.executemany(
+                'UPDATE records SET name_sort = ?, destination_sort = ?, travel_sort = ? WHERE record_type = ? AND record_id = ?',
+                [
+                    (*summary_sort_values(json.loads(row['summary'])), row['record_type'], row['record_id'])
+                    for row in rows
+                ],
+            )
+
+    def _record_values(self, record_type: str, record_id: str, payload: dict) -> dict:
+        summary = self._summarise(record_type, record_id, payload)
+        travel = (summary.get('travel_dates_value') or '').split('|')
+        name_sort, destination_sort, travel_sort = summary_sort_values(summary)
+        return {
+            'record_type': record_type,
+            'record_id': record_id,
+            'lead_id': str(payload.get('lead_id') or record_id),
+            'submitted_sort': self._sort_key(summary),
+            'name_sort': name_sort,
+            'destination_sort': destination_sort,
+            'travel_sort': travel_sort,
+            'travel_start': travel[0] if len(travel) == 2 else None,
+            'travel_end': travel[1] if len(travel) == 2 else None,
+            'payload': json.dumps(payload),
+            'summary': json.dumps(summary),
+        }
+
+    def _refresh_active_todos(self, conn: sqlite3.Connection, record_type: str, record_id: str, payload: dict, todos: dict) -> None:
+        conn.execute(
+            'DELETE FROM active_todos WHERE record_type = ? AND record_id = ?',
+            (record_type, record_id),
+        )
+        conn.executemany(
+            'INSERT INTO active_todos (record_type, record_id, todo_id, due_sort, type_sort, name_sort, item) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [
+                (
+                    record_type,
+                    record_id,
+                    str(item.get('todo_id') or ''),
+                    due_sort,
+                    record_type.title(),
+                    (item.get('name_display') or '').lower(),
+                    json.dumps(item, sort_keys=True),
+                )
+                for due_sort, item in self._collect_todos(record_type, record_id, payload, todos)
+            ],
+        )
+
+    @staticmethod
+    def _load_todos(conn: sqlite3.Connection, record_type: str, record_id: str) -> dict:
+        rows = conn.execute(
+            'SELECT todo_key, item FROM todos WHERE record_type = ? AND record_id = ?',
+            (record_type, record_id),
+        ).fetchall()
+        return {row['todo_key']: json.loads(row['item']) for row in rows}
+
+    def exists(self, record_type: str, record_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT 1 FROM records WHERE record_type = ? AND record_id = ?',
+                (record_type, record_id),
+            ).fetchone()
+        return row is not None
+
+    def load_record(self, record_type: str, record_id: str) -> Optional[dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT payload FROM records WHERE record_type = ? AND record_id = ?',
+                (record_type, record_id),
+            ).fetchone()
+        return json.loads(row['payload']) if row else None
+
+    def create_record(self, record_type: str, record_id: str, payload: dict, *, metadata: Optional[dict] = None) -> None:
+        values = self._record_values(record_type, record_id, payload)
+        values['metadata'] = json.dumps(metadata) if metadata is not None else None
+        with closing(self._connect()) as conn:
+            try:
+                with conn:
+                    conn.execute(
+                        'INSERT INTO records (record_type, record_id, lead_id, submitted_sort, name_sort, destination_sort, travel_sort, '
+                        'travel_start, travel_end, payload, metadata, summary) '
+                        'VALUES (:record_type, :record_id, :lead_id, :submitted_sort, :name_sort, :destination_sort, :travel_sort, '
+                        ':travel_start, :travel_end, :payload, :metadata, :summary)',
+                        values,
+                    )
+                    self._refresh_active_todos(conn, record_type, record_id, payload, {})
+            except sqlite3.IntegrityError as exc:
+                raise ValueError(f'A {record_type} with this ID already exists.') from exc
+
+    def save_record(self, record_type: str, record_id: str, payload: dict) -> None:
+        values = self._record_values(record_type, record_id, payload)
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    'UPDATE records SET lead_id = :lead_id, submitted_sort = :submitted_sort, name_sort = :name_sort, '
+                    'destination_sort = :destination_sort, travel_sort = :travel_sort, travel_start = :travel_start, '
+                    'travel_end = :travel_end, payload = :payload, summary = :summary '
+                    'WHERE record_type = :record_type AND record_id = :record_id',
+                    values,
+                )
+                todos = self._load_todos(conn, record_type, record_id)
+                self._refresh_active_todos(conn, record_type, record_id, payload, todos)
+
+    def load_metadata(self, record_type: str, record_id: str) -> dict:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT metadata FROM records WHERE record_type = ? AND record_id = ?',
+                (record_type, record_id),
+            ).fetchone()
+        if not row or not row['metadata']:
+            return {}
+        return json.loads(row['metadata'])
+
+    def load_todos(self, record_type: str, record_id: str) -> dict:
+        with closing(self._connect()) as conn:
+            return self._load_todos(conn, record_type, record_id)
+
+    def save_todos(self, record_type: str, record_id: str, todos: dict) -> None:
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    'DELETE FROM todos WHERE record_type = ? AND record_id = ?',
+                    (record_type, record_id),
+                )
+                conn.executemany(
+                    'INSERT INTO todos (record_type, record_id, todo_key, item) VALUES (?, ?, ?, ?)',
+                    [(record_type, record_id, str(key), json.dumps(item)) for key, item in todos.items()],
+                )
+                row = conn.execute(
+                    'SELECT payload FROM records WHERE record_type = ? AND record_id = ?',
+                    (record_type, record_id),
+                ).fetchone()
+                if row:
+                    self._refresh_active_todos(conn, record_type, record_id, json.loads(row['payload']), todos)
+
+    def load_communications(self, record_type: str, record_id: str, *, limit: Optional[int] = None) -> dict:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT seq, entry FROM communications WHERE record_type = ? AND record_id = ? ORDER BY seq DESC LIMIT ?',
+                (record_type, record_id, -1 if limit is None else limit),
+            ).fetchall()
+        return {str(row['seq']): json.loads(row['entry']) for row in reversed(rows)}
+
+    def append_communication(self, record_type: str, record_id: str, entry: dict) -> None:
+        with closing(self._connect()) as conn:
+            with conn:
+                # Take the write lock before reading MAX(seq), so no other process can allocate in between
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(
+                    'INSERT INTO communications (record_type, record_id, seq, entry) '
+                    'SELECT ?, ?, COALESCE(MAX(seq), 0) + 1, ? FROM communications WHERE record_type = ? AND record_id = ?',
+                    (record_type, record_id, json.dumps(entry), record_type, record_id),
+                )
+
+    def summaries(self, record_type: str) -> list[dict]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT summary FROM records WHERE record_type = ? ORDER BY record_id DESC',
+                (record_type,),
+            ).fetchall()
+        return [json.loads(row['summary']) for row in rows]
+
+    def summary_page(
+        self,
+        record_type: str,
+        *,
+        sort: str = 'submitted_at',
+        descending: bool = True,
+        search: Optional[str] = None,
+        limit: int,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> Page:
+        where, params = summary_filter(record_type, search)
+        with closing(self._connect()) as conn:
+            return seek_page(
+                conn, table='records', payload='summary', where=where, params=params,
+                columns=summary_columns(sort), descending=descending, limit=limit, after=after, before=before,
+            )
+
+    def count(self, record_type: str, *, search: Optional[str] = None) -> int:
+        where, params = summary_filter(record_type, search)
+        with closing(self._connect()) as conn:
+            row = conn.execute(f'SELECT COUNT(*) AS total FROM records WHERE {where}', params).fetchone()
+        return int(row['total'])
+
+    def recent(self, limit: int) -> list[dict]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT summary FROM records ORDER BY submitted_sort DESC LIMIT ?',
+                (limit,),
+            ).fetchall()
+        return [json.loads(row['summary']) for row in rows]
+
+    def active_todo_page(self, *, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> Page:
+        with closing(self._connect()) as conn:
+            return seek_page(
+                conn, table='active_todos', payload='item', where='1', params=(),
+                columns=TODO_ORDER_COLUMNS, descending=False, limit=limit, after=after, before=before,
+            )
+
+    def count_active_todos(self) -> int:
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT COUNT(*) AS total FROM active_todos').fetchone()
+        return int(row['total'])
+
+    def bulk_load(self, source: JsonLeadStore, *, record_type: Optional[str] = None, batch_size: int = 500) -> int:
+        """Copy every lead from a JSON store, replacing rows that already exist.
+
+        Returns the number of records loaded. Documents are left in place.
+        """
+
+        targets = [record_type] if record_type else list(self.directories)
+        loaded = 0
+        for target in targets:
+            batch: list[tuple[str, dict]] = []
+            for record_id, payload in source.index.iter_payloads(target):
+                batch.append((record_id, payload))
+                if len(batch) >= batch_size:
+                    loaded += self._load_batch(source, target, batch)
+                    batch = []
+            if batch:
+                loaded += self._load_batch(source, target, batch)
+            logger.info('Loaded %s records into %s', target, self.db_path)
+        return loaded
+
+    def _load_batch(self, source: JsonLeadStore, record_type: str, batch: Iterable[tuple[str, dict]]) -> int:
+        loaded = 0
+        with closing(self._connect()) as conn:
+            with conn:
+                for record_id, payload in batch:
+                    values = self._record_values(record_type, record_id, payload)
+                    metadata_path = source._path(record_type, record_id, METADATA_FILENAME)
+                    values['metadata'] = json.dumps(load_json_object(metadata_path)) if metadata_path.exists() else None
+                    conn.execute(
+                        'INSERT OR REPLACE INTO records (record_type, record_id, lead_id, submitted_sort, name_sort, destination_sort, travel_sort, '
+                        'travel_start, travel_end, payload, metadata, summary) '
+                        'VALUES (:record_type, :record_id, :lead_id, :submitted_sort, :name_sort, :destination_sort, :travel_sort, '
+                        ':travel_start, :travel_end, :payload, :metadata, :summary)',
+                        values,
+                    )
+
+                    todos = source.load_todos(record_type, record_id)
+                    conn.execute('DELETE FROM todos WHERE record_type = ? AND record_id = ?', (record_type, record_id))
+                    conn.executemany(
+                        'INSERT INTO todos (record_type, record_id, todo_key, item) VALUES (?, ?, ?, ?)',
+                        [(record_type, record_id, str(key), json.dumps(item)) for key, item in todos.items()],
+                    )
+                    self._refresh_active_todos(conn, record_type, record_id, payload, todos)
+
+                    communications = source.load_communications(record_type, record_id)
+                    conn.execute('DELETE FROM communications WHERE record_type = ? AND record_id = ?', (record_type, record_id))
+                    conn.executemany(
+                        'INSERT INTO communications (record_type, record_id, seq, entry) VALUES (?, ?, ?, ?)',
+                        [(record_type, record_id, int(seq), json.dumps(entry)) for seq, entry in communications.items()],
+                    )
+                    loaded += 1
+        return loaded
+
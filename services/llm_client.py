@@ -2,11 +2,16 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+import threading
+import time
+import weakref
+from contextlib import closing
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 try:  # pragma: no cover - optional quality of life helper
     from dotenv import load_dotenv
@@ -36,13 +41,34 @@ def _bootstrap_env() -> None:
 _bootstrap_env()
 
 try:
-    from openai import OpenAI
+    from openai import APIConnectionError, AsyncOpenAI, BadRequestError, OpenAI
 except ImportError:  # pragma: no cover
-    OpenAI = None  # type: ignore
+    OpenAI = AsyncOpenAI = None  # type: ignore
+    APIConnectionError = BadRequestError = None  # type: ignore
+
+from .llm_scheduler import LLMScheduler, backoff_delay, estimate_tokens, parse_reset
+from .metrics import record_llm_call
 
 
 logger = logging.getLogger(__name__)
 
+# Seconds per HTTP attempt, and how many times 429/5xx/timeouts are retried with back-off
+LLM_TIMEOUT = float(os.getenv('SKYDESK_LLM_TIMEOUT', '60'))
+LLM_MAX_RETRIES = int(os.getenv('SKYDESK_LLM_MAX_RETRIES', '4'))
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# OpenAI-compatible endpoint to call instead of api.openai.com (e.g. scripts/llm_stub_server.py);
+# read on each call so tests and benchmarks can point at a stub after import
+BASE_URL_ENV = ('SKYDESK_LLM_BASE_URL', 'OPENAI_BASE_URL')
+
+# Shared by ingestion and the To-Do assistant so bursts queue instead of failing
+scheduler = LLMScheduler(max_concurrency=int(os.getenv('SKYDESK_LLM_CONCURRENCY', '4')))
+
+_client_lock = threading.Lock()
+_shared_client: Optional['OpenAI'] = None
+_shared_client_key: Optional[tuple[str, Optional[str]]] = None
+# AsyncOpenAI's connection pool is bound to the loop that first used it, so keep one per loop
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple[tuple, AsyncOpenAI]]' = weakref.WeakKeyDictionary()
+
 
 class LLMNotConfigured(RuntimeError):
     """Raised when the LLM SDK or credentials are unavailable."""
@@ -53,32 +79,203 @@ class LLMResponse:
     """Minimal response container used across the app."""
 
     content: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    seconds: float = 0.0  # wall time including queueing, retries and back-off
+    ttfb_seconds: Optional[float] = None  # request sent -> response headers (first delta when streaming)
+    retries: int = 0
+    json_fallback: bool = False  # response_format was rejected and the call re-issued without it
+    cost_usd: Optional[float] = None  # None when the model has no entry in metrics.PRICES
 
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+def base_url() -> Optional[str]:
+    for name in BASE_URL_ENV:
+        value = (os.getenv(name) or '').strip()
+        if value:
+            return value.rstrip('/')
+    return None
+
+
+def _settings() -> tuple[str, Optional[str]]:
+    """``(api_key, base_url)`` for the next client."""
 
-def _client() -> OpenAI:
     if OpenAI is None:
         raise LLMNotConfigured('Install the `openai` package to use LLM features.')
 
+    url = base_url()
     api_key = os.getenv('OPENAI_API_KEY')
     if not api_key:
-        raise LLMNotConfigured('OPENAI_API_KEY missing; add it to your environment/.env.')
+        if not url:
+            raise LLMNotConfigured('OPENAI_API_KEY missing; add it to your environment/.env.')
+        api_key = 'sk-local'  # local OpenAI-compatible servers usually ignore the key
+    return api_key, url
 
-    return OpenAI(api_key=api_key)
 
+def _client() -> OpenAI:
+    settings = _settings()
 
-def chat(
-    messages: list[dict[str, str]],
-    *,
-    model: Optional[str] = None,
-    temperature: Optional[float] = None,
-    enforce_json: bool = True,
-) -> LLMResponse:
-    """Call the chat completion endpoint and return the text body."""
+    # One long-lived client per process keeps its HTTP connections alive between calls;
+    # retries are handled by _create so they pass through the scheduler.
+    global _shared_client, _shared_client_key
+    with _client_lock:
+        if _shared_client is None or _shared_client_key != settings:
+            api_key, url = settings
+            _shared_client = OpenAI(api_key=api_key, base_url=url, timeout=LLM_TIMEOUT, max_retries=0)
+            _shared_client_key = settings
+        return _shared_client
 
-    client = _client()
+
+def _async_client() -> AsyncOpenAI:
+    settings = _settings()
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None or entry[0] != settings:
+        api_key, url = settings
+        entry = (settings, AsyncOpenAI(api_key=api_key, base_url=url, timeout=LLM_TIMEOUT, max_retries=0))
+        _async_clients[loop] = entry
+    return entry[1]
+
+
+def _response_headers(exc: BaseException):
+    return getattr(getattr(exc, 'response', None), 'headers', None)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = _response_headers(exc)
+    if not headers:
+        return None
+    if headers.get('retry-after-ms'):
+        return parse_reset(f"{headers['retry-after-ms']}ms")
+    return parse_reset(headers.get('retry-after'))
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if APIConnectionError is not None and isinstance(exc, APIConnectionError):
+        return True  # includes APITimeoutError
+    return getattr(exc, 'status_code', None) in RETRYABLE_STATUS
+
+
+def _create(client: OpenAI, kwargs: dict, stats: dict):
+    """Issue one completion through the shared scheduler, retrying transient failures.
+
+    ``stats`` receives the retry count and the time to response headers of the successful attempt.
+    """
+
+    estimated = estimate_tokens(kwargs['messages'])
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        with scheduler.slot(estimated_tokens=estimated):
+            sent = time.perf_counter()
+            try:
+                # The streaming wrapper returns at the headers, so TTFB and body time can be told apart
+                with client.chat.completions.with_streaming_response.create(**kwargs, timeout=LLM_TIMEOUT) as raw:
+                    stats['ttfb'] = time.perf_counter() - sent
+                    scheduler.observe(raw.headers)
+                    return raw.parse()
+            except Exception as exc:
+                scheduler.observe(_response_headers(exc))
+                if attempt >= LLM_MAX_RETRIES or not _is_retryable(exc):
+                    raise
+                error = exc
+        # Sleep outside the slot so other callers can use it meanwhile
+        delay = backoff_delay(attempt, retry_after=_retry_after(error))
+        stats['retries'] = stats.get('retries', 0) + 1
+        logger.warning('OpenAI call failed (%s); retry %s/%s in %.1fs', error, attempt + 1, LLM_MAX_RETRIES, delay)
+        time.sleep(delay)
+    raise AssertionError('unreachable')  # pragma: no cover
+
+
+async def _acreate(client: AsyncOpenAI, kwargs: dict, stats: dict):
+    """Async ``_create``: same scheduler budget, waits without blocking the loop."""
+
+    estimated = estimate_tokens(kwargs['messages'])
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        async with scheduler.aslot(estimated_tokens=estimated):
+            sent = time.perf_counter()
+            try:
+                async with client.chat.completions.with_streaming_response.create(
+                    **kwargs, timeout=LLM_TIMEOUT
+                ) as raw:
+                    stats['ttfb'] = time.perf_counter() - sent
+                    scheduler.observe(raw.headers)
+                    return await raw.parse()
+            except Exception as exc:
+                scheduler.observe(_response_headers(exc))
+                if attempt >= LLM_MAX_RETRIES or not _is_retryable(exc):
+                    raise
+                error = exc
+        delay = backoff_delay(attempt, retry_after=_retry_after(error))
+        stats['retries'] = stats.get('retries', 0) + 1
+        logger.warning('OpenAI call failed (%s); retry %s/%s in %.1fs', error, attempt + 1, LLM_MAX_RETRIES, delay)
+        await asyncio.sleep(delay)
+    raise AssertionError('unreachable')  # pragma: no cover
+
+
+def _stream(client: OpenAI, kwargs: dict, stats: dict) -> Iterator[str]:
+    """Streaming ``_create``: yields content deltas while holding one scheduler slot.
+
+    Failures are only retried before the first delta arrives; after that the
+    caller has already seen part of the answer, so the error is raised.
+    ``stats`` receives token usage, retries and the time to the first delta.
+    Closing the generator early closes the HTTP stream and frees the slot.
+    """
+
+    estimated = estimate_tokens(kwargs['messages'])
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        emitted = False
+        with scheduler.slot(estimated_tokens=estimated):
+            sent = time.perf_counter()
+            try:
+                raw = client.chat.completions.with_raw_response.create(
+                    **kwargs, stream=True, stream_options={'include_usage': True}, timeout=LLM_TIMEOUT
+                )
+                scheduler.observe(raw.headers)
+                stream = raw.parse()
+                try:
+                    for chunk in stream:
+                        if getattr(chunk, 'usage', None) is not None:
+                            stats['prompt_tokens'] = chunk.usage.prompt_tokens or 0
+                            stats['completion_tokens'] = chunk.usage.completion_tokens or 0
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            if not emitted:
+                                stats['ttfb'] = time.perf_counter() - sent
+                            emitted = True
+                            yield delta
+                finally:
+                    stream.close()
+                return
+            except Exception as exc:
+                scheduler.observe(_response_headers(exc))
+                if emitted or attempt >= LLM_MAX_RETRIES or not _is_retryable(exc):
+                    raise
+                error = exc
+        delay = backoff_delay(attempt, retry_after=_retry_after(error))
+        stats['retries'] = stats.get('retries', 0) + 1
+        logger.warning('OpenAI stream failed (%s); retry %s/%s in %.1fs', error, attempt + 1, LLM_MAX_RETRIES, delay)
+        time.sleep(delay)
+
+
+def resolve_model(model: Optional[str] = None) -> str:
     # Default to 4.1 nano unless overridden via OPENAI_MODEL or function arg
-    model_name = model or os.getenv('OPENAI_MODEL', 'gpt-4.1-nano')
-    temp = temperature if temperature is not None else float(os.getenv('OPENAI_TEMPERATURE', '0'))
+    return model or os.getenv('OPENAI_MODEL', 'gpt-4.1-nano')
+
+
+def resolve_temperature(temperature: Optional[float] = None) -> float:
+    return temperature if temperature is not None else float(os.getenv('OPENAI_TEMPERATURE', '0'))
+
+
+def _chat_kwargs(
+    messages: list[dict[str, str]],
+    model: Optional[str],
+    temperature: Optional[float],
+    enforce_json: bool,
+) -> dict:
+    model_name = resolve_model(model)
+    temp = resolve_temperature(temperature)
 
     logger.debug('Calling OpenAI chat: model=%s temperature=%s enforce_json=%s', model_name, temp, enforce_json)
 
@@ -90,18 +287,151 @@ def chat(
     if enforce_json:
         # Use JSON response format when supported by the model; otherwise fallback below.
         kwargs['response_format'] = {"type": "json_object"}
+    return kwargs
+
 
+def _rejects_response_format(exc: BaseException, kwargs: dict) -> bool:
+    # Only a model rejecting response_format is worth re-issuing without it
+    if 'response_format' not in kwargs or BadRequestError is None or not isinstance(exc, BadRequestError):
+        return False
+    if 'response_format' not in str(exc):
+        return False
+    logger.warning('JSON response_format not supported, retrying without it: %s', exc)
+    kwargs.pop('response_format', None)
+    return True
+
+
+def _to_response(content: str, prompt_tokens: int, completion_tokens: int, kwargs: dict, stats: dict) -> LLMResponse:
+    """Build the response and record the call's timings, usage and cost."""
+
+    seconds = time.perf_counter() - stats['started']
+    json_fallback = stats.get('json_fallback', False)
+    logger.debug('OpenAI response chars=%s', len(content))
+    cost = record_llm_call(
+        model=kwargs['model'],
+        seconds=seconds,
+        ttfb_seconds=stats.get('ttfb'),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        retries=stats.get('retries', 0),
+        json_fallback=json_fallback,
+    )
+    return LLMResponse(
+        content=content.strip(),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        seconds=round(seconds, 3),
+        ttfb_seconds=round(stats['ttfb'], 3) if stats.get('ttfb') is not None else None,
+        retries=stats.get('retries', 0),
+        json_fallback=json_fallback,
+        cost_usd=cost,
+    )
+
+
+def _from_completion(response, kwargs: dict, stats: dict) -> LLMResponse:
+    usage = getattr(response, 'usage', None)
+    return _to_response(
+        response.choices[0].message.content or '',
+        getattr(usage, 'prompt_tokens', 0) or 0,
+        getattr(usage, 'completion_tokens', 0) or 0,
+        kwargs,
+        stats,
+    )
+
+
+def chat(
+    messages: list[dict[str, str]],
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    enforce_json: bool = True,
+) -> LLMResponse:
+    """Call the chat completion endpoint and return the text body."""
+
+    stats = {'started': time.perf_counter()}
+    client = _client()
+    kwargs = _chat_kwargs(messages, model, temperature, enforce_json)
     try:
-        response = client.chat.completions.create(**kwargs)
+        response = _create(client, kwargs, stats)
     except Exception as exc:  # pragma: no cover - SDK/model dependent
-        if enforce_json:
-            logger.warning('JSON response_format not supported, retrying without it: %s', exc)
-            response = client.chat.completions.create(
-                model=model_name, temperature=temp, messages=messages
-            )
-        else:
+        if not _rejects_response_format(exc, kwargs):
             raise
+        stats['json_fallback'] = True
+        response = _create(client, kwargs, stats)
+    return _from_completion(response, kwargs, stats)
 
-    content = response.choices[0].message.content or ''
-    logger.debug('OpenAI response chars=%s', len(content))
-    return LLMResponse(content=content.strip())
+
+async def achat(
+    messages: list[dict[str, str]],
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    enforce_json: bool = True,
+) -> LLMResponse:
+    """Asyncio counterpart of :func:`chat` sharing its scheduler and retry policy."""
+
+    stats = {'started': time.perf_counter()}
+    client = _async_client()
+    kwargs = _chat_kwargs(messages, model, temperature, enforce_json)
+    try:
+        response = await _acreate(client, kwargs, stats)
+    except Exception as exc:  # pragma: no cover - SDK/model dependent
+        if not _rejects_response_format(exc, kwargs):
+            raise
+        stats['json_fallback'] = True
+        response = await _acreate(client, kwargs, stats)
+    return _from_completion(response, kwargs, stats)
+
+
+class ChatStream:
+    """Content deltas of one streamed completion; ``response`` is the full answer once consumed."""
+
+    def __init__(self, client: OpenAI, kwargs: dict) -> None:
+        self._client = client
+        self._kwargs = kwargs
+        self._parts: list[str] = []
+        self._stats = {'prompt_tokens': 0, 'completion_tokens': 0}
+        self._response: Optional[LLMResponse] = None
+
+    def __iter__(self) -> Iterator[str]:
+        if self._response is not None:
+            raise RuntimeError('ChatStream can only be iterated once.')
+        self._stats['started'] = time.perf_counter()
+        try:
+            yield from self._deltas()
+        except Exception as exc:  # pragma: no cover - SDK/model dependent
+            if self._parts or not _rejects_response_format(exc, self._kwargs):
+                raise
+            self._stats['json_fallback'] = True
+            yield from self._deltas()
+        self._response = _to_response(
+            ''.join(self._parts),
+            self._stats['prompt_tokens'],
+            self._stats['completion_tokens'],
+            self._kwargs,
+            self._stats,
+        )
+
+    def _deltas(self) -> Iterator[str]:
+        with closing(_stream(self._client, self._kwargs, self._stats)) as deltas:
+            for delta in deltas:
+                self._parts.append(delta)
+                yield delta
+
+    @property
+    def response(self) -> LLMResponse:
+        if self._response is None:
+            raise RuntimeError('Consume the stream before reading its response.')
+        return self._response
+
+
+def chat_stream(
+    messages: list[dict[str, str]],
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    enforce_json: bool = True,
+) -> ChatStream:
+    """Streaming :func:`chat`: iterate the result for text deltas, then read ``.response``."""
+
+    return ChatStream(_client(), _chat_kwargs(messages, model, temperature, enforce_json))
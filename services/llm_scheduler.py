@@ -0,0 +1,187 @@
+"""Process-wide admission control for LLM calls: concurrency, rate limits and back-off.
+
+Every caller (quote/booking ingestion, the To-Do assistant) goes through the
+same scheduler, so a burst of uploads queues behind the concurrency limit
+and the provider's advertised budget instead of failing with 429s.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Mapping, Optional
+
+from .metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds from an ``x-ratelimit-reset-*`` value such as ``1s``, ``6m0s`` or ``20ms``."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(float(headers.get(name, '')))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Refilling budget whose size and level follow the provider's rate-limit headers.
+
+    Until the first response arrives the bucket is unlimited.
+    """
+
+    def __init__(self) -> None:
+        self.capacity: Optional[float] = None
+        self.tokens = 0.0
+        self.rate = 0.0  # refill per second
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def update(self, limit: Optional[int], remaining: Optional[int], reset_seconds: Optional[float]) -> None:
+        if limit is None or remaining is None or limit <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.capacity = float(limit)
+            self.tokens = float(min(remaining, limit))
+            if reset_seconds and reset_seconds > 0 and remaining < limit:
+                # The reset header is the time until the bucket is full again
+                self.rate = (limit - remaining) / reset_seconds
+            else:
+                self.rate = limit / 60.0  # OpenAI budgets are per minute
+            self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Take ``amount`` if available (returning 0), else the seconds to wait before retrying."""
+        with self._lock:
+            if self.capacity is None:
+                return 0.0
+            self._refill(time.monotonic())
+            amount = min(amount, self.capacity)
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            if self.rate <= 0:
+                return 1.0
+            return (amount - self.tokens) / self.rate
+
+    def acquire(self, amount: float, *, deadline: Optional[float] = None) -> None:
+        while True:
+            delay = self.wait_time(amount)
+            if delay <= 0:
+                return
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise TimeoutError('Timed out waiting for LLM rate-limit budget.')
+            time.sleep(min(delay, 5.0))
+
+    async def aacquire(self, amount: float, *, deadline: Optional[float] = None) -> None:
+        while True:
+            delay = self.wait_time(amount)
+            if delay <= 0:
+                return
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise TimeoutError('Timed out waiting for LLM rate-limit budget.')
+            await asyncio.sleep(min(delay, 5.0))
+
+
+class LLMScheduler:
+    """Bounded concurrency plus request/token buckets shared by every LLM call."""
+
+    def __init__(self, *, max_concurrency: int = 4, queue_timeout: Optional[float] = 300.0) -> None:
+        self.max_concurrency = max(max_concurrency, 1)
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.requests = TokenBucket()
+        self.tokens = TokenBucket()
+
+    @contextmanager
+    def slot(self, *, estimated_tokens: int = 0) -> Iterator[None]:
+        """Hold one concurrency slot after the rate-limit budget allows the call."""
+
+        queued = time.monotonic()
+        deadline = queued + self.queue_timeout if self.queue_timeout else None
+        if not self._slots.acquire(timeout=self.queue_timeout or None):
+            raise TimeoutError('Timed out waiting for a free LLM slot.')
+        try:
+            self.requests.acquire(1, deadline=deadline)
+            if estimated_tokens:
+                self.tokens.acquire(estimated_tokens, deadline=deadline)
+            record_stage('llm_queue', time.monotonic() - queued)
+            yield
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def aslot(self, *, estimated_tokens: int = 0) -> AsyncIterator[None]:
+        """Async ``slot`` drawing on the same limits, polling so the event loop never blocks."""
+
+        queued = time.monotonic()
+        deadline = queued + self.queue_timeout if self.queue_timeout else None
+        while not self._slots.acquire(blocking=False):
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError('Timed out waiting for a free LLM slot.')
+            await asyncio.sleep(0.05)
+        try:
+            await self.requests.aacquire(1, deadline=deadline)
+            if estimated_tokens:
+                await self.tokens.aacquire(estimated_tokens, deadline=deadline)
+            record_stage('llm_queue', time.monotonic() - queued)
+            yield
+        finally:
+            self._slots.release()
+
+    def observe(self, headers: Optional[Mapping[str, str]]) -> None:
+        """Feed ``x-ratelimit-*`` response headers back into the buckets."""
+
+        if not headers:
+            return
+        self.requests.update(
+            _header_int(headers, 'x-ratelimit-limit-requests'),
+            _header_int(headers, 'x-ratelimit-remaining-requests'),
+            parse_reset(headers.get('x-ratelimit-reset-requests')),
+        )
+        self.tokens.update(
+            _header_int(headers, 'x-ratelimit-limit-tokens'),
+            _header_int(headers, 'x-ratelimit-remaining-tokens'),
+            parse_reset(headers.get('x-ratelimit-reset-tokens')),
+        )
+
+
+def backoff_delay(attempt: int, *, base: float = 1.0, cap: float = 30.0, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential back-off; a server ``retry-after`` sets the floor."""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+def estimate_tokens(messages: list[dict[str, str]]) -> int:
+    """Rough prompt size (~4 characters per token) for the token bucket."""
+    return sum(len(message.get('content') or '') for message in messages) // 4 + 1
@@ -0,0 +1,224 @@
+"""In-process timings for the ingestion pipeline and LLM calls.
+
+``timed(stage)`` feeds a rolling histogram and, while a ``trace()`` is
+open, the per-draft breakdown saved next to each draft. ``record_llm_call``
+does the same for one OpenAI request and prices it. ``snapshot()`` backs
+the ``/metrics`` endpoint; numbers are per process and reset on restart.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Samples kept per histogram; percentiles describe the most recent window
+WINDOW = int(os.getenv('SKYDESK_METRICS_WINDOW', '1000'))
+
+# USD per million (prompt, completion) tokens; extend with SKYDESK_LLM_PRICES='{"model": [in, out]}'
+PRICES: dict[str, tuple[float, float]] = {
+    'gpt-4.1-nano': (0.10, 0.40),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1': (2.00, 8.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+}
+try:
+    PRICES.update({model: tuple(price) for model, price in json.loads(os.getenv('SKYDESK_LLM_PRICES') or '{}').items()})
+except (ValueError, TypeError, AttributeError):
+    logger.warning('Ignoring malformed SKYDESK_LLM_PRICES')
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """USD for one call, or ``None`` for a model without a known price."""
+    # Dated snapshots (gpt-4.1-nano-2025-04-14) are priced like their alias
+    name = max((known for known in PRICES if model == known or model.startswith(f'{known}-')), key=len, default=None)
+    if name is None:
+        return None
+    prompt_price, completion_price = PRICES[name]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class Histogram:
+    def __init__(self, window: int) -> None:
+        self.samples: deque[float] = deque(maxlen=max(window, 1))
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {'count': self.count}
+
+        def percentile(share: float) -> float:
+            return round(ordered[min(int(share * len(ordered)), len(ordered) - 1)], 4)
+
+        return {
+            'count': self.count,
+            'sum': round(self.total, 4),
+            'window': len(ordered),
+            'mean': round(sum(ordered) / len(ordered), 4),
+            'p50': percentile(0.5),
+            'p90': percentile(0.9),
+            'p99': percentile(0.99),
+            'max': round(ordered[-1], 4),
+        }
+
+
+class Trace:
+    """Per-draft totals: seconds per stage plus LLM call counters, and any extraction warnings."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.counters: dict[str, float] = {}
+        self.warnings: list[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def warn(self, message: str) -> None:
+        with self._lock:
+            self.warnings.append(message)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            data = {f'{stage}_seconds': round(seconds, 3) for stage, seconds in self.stages.items()}
+            data.update({name: round(value, 6) if isinstance(value, float) else value for name, value in self.counters.items()})
+            if self.warnings:
+                data['warnings'] = list(self.warnings)
+        data['total_seconds'] = round(time.perf_counter() - self.started, 3)
+        return data
+
+
+class Metrics:
+    def __init__(self, window: int = WINDOW) -> None:
+        self.window = window
+        self._lock = threading.Lock()
+        self._histograms: dict[str, Histogram] = {}
+        self._counters: dict[str, float] = {}
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.window)
+            histogram.observe(value)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'histograms': {name: histogram.summary() for name, histogram in sorted(self._histograms.items())},
+                'counters': {
+                    name: round(value, 6) if isinstance(value, float) else value
+                    for name, value in sorted(self._counters.items())
+                },
+            }
+
+
+metrics = Metrics()
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar('skydesk_trace', default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """Collect stage timings for one draft; nested calls share the outer trace."""
+
+    active = _current_trace.get()
+    if active is not None:
+        yield active
+        return
+    token = _current_trace.set(Trace())
+    try:
+        yield _current_trace.get()
+    finally:
+        _current_trace.reset(token)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    metrics.observe(f'{stage}_seconds', seconds)
+    active = _current_trace.get()
+    if active is not None:
+        active.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def record_llm_call(
+    *,
+    model: str,
+    seconds: float,
+    ttfb_seconds: Optional[float],
+    prompt_tokens: int,
+    completion_tokens: int,
+    retries: int,
+    json_fallback: bool,
+) -> Optional[float]:
+    """Record one finished chat completion; returns its estimated cost in USD."""
+
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    metrics.observe('llm_seconds', seconds)
+    if ttfb_seconds is not None:
+        metrics.observe('llm_ttfb_seconds', ttfb_seconds)
+    metrics.observe('llm_prompt_tokens', prompt_tokens)
+    metrics.observe('llm_completion_tokens', completion_tokens)
+    metrics.increment('llm_calls')
+    metrics.increment(f'llm_calls.{model}')
+    metrics.increment('llm_retries', retries)
+    metrics.increment('llm_json_fallbacks', int(json_fallback))
+    if cost is not None:
+        metrics.increment('llm_cost_usd', cost)
+    logger.info(
+        'LLM call model=%s %.2fs ttfb=%s tokens=%s+%s retries=%s json_fallback=%s cost=%s',
+        model, seconds, f'{ttfb_seconds:.2f}s' if ttfb_seconds is not None else '-',
+        prompt_tokens, completion_tokens, retries, json_fallback, f'${cost:.5f}' if cost is not None else '-',
+    )
+
+    active = _current_trace.get()
+    if active is not None:
+        active.add('llm', seconds)
+        if ttfb_seconds is not None:
+            active.add('llm_ttfb', ttfb_seconds)
+        active.count('llm_calls')
+        active.count('prompt_tokens', prompt_tokens)
+        active.count('completion_tokens', completion_tokens)
+        active.count('llm_retries', retries)
+        if json_fallback:
+            active.count('llm_json_fallbacks')
+        if cost is not None:
+            active.count('cost_usd', float(cost))
+    return cost
@@ -0,0 +1,428 @@
+"""PDF text extraction in a warm pool of sandboxed worker processes.
+
+pypdf used to run inside the request or queue thread, where one pathological
+PDF could pin a CPU and balloon the web process. Now each job goes to a
+``pdf_worker.py`` child that has already imported pypdf, runs at a lower
+priority and is watched from here. A job over its wall-clock budget, or a
+worker over its RSS limit, is killed and replaced. Only the first
+``max_pages`` pages are read. A long document is split into page ranges
+over the idle workers. When a limit stops extraction early, the text read
+so far is returned with a warning. The warning is also recorded on the
+draft's trace and under ``pdf_extract.*`` at ``/metrics``.
+
+Replies are read by one thread per worker, so the pool runs the same on
+POSIX and Windows. RSS comes from ``/proc`` on Linux and from psutil, when it
+is installed, elsewhere; without either the memory limit is not enforced and
+a warning is logged. ``SKYDESK_PDF_WORKERS=0`` extracts in-process with only
+the page cap and a between-pages time check, as before.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import math
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .metrics import current_trace, metrics, timed
+
+try:  # pragma: no cover - optional worker RSS where there is no /proc (Windows, macOS)
+    import psutil
+except ImportError:  # pragma: no cover
+    psutil = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = Path(__file__).resolve().with_name('pdf_worker.py')
+WORKER_NICE = 5
+POLL_SECONDS = 0.1  # how often running workers are checked against the limits
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_PROC_RSS = Path('/proc/self/statm').exists()
+
+TIMEOUT = 'timeout'
+MEMORY = 'memory'
+CRASHED = 'crashed'
+
+
+@dataclass
+class PDFText:
+    """Extracted text; ``complete`` is False when a limit or an unreadable page cut it short."""
+
+    text: str
+    pages: int = 0  # pages in the document
+    pages_read: int = 0
+    warnings: list[str] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        return not self.warnings
+
+
+class _Stopped(Exception):
+    """A worker hit the wall-clock or memory limit, or died; ``args[0]`` is the reason."""
+
+
+class _Worker:
+    """One ``pdf_worker.py`` child; a reader thread puts ``(worker, message)`` on ``replies``.
+
+    The pool points ``replies`` at one queue per job, so a job over several
+    workers waits on all of them at once; ``None`` marks the end of stdout.
+    """
+
+    def __init__(self) -> None:
+        self.proc = subprocess.Popen(
+            [sys.executable, str(WORKER_SCRIPT), str(WORKER_NICE)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            creationflags=getattr(subprocess, 'BELOW_NORMAL_PRIORITY_CLASS', 0),  # Windows has no nice()
+        )
+        self.replies: queue.Queue = queue.Queue()
+        self.setup_error: Optional[str] = None
+        self._reader = threading.Thread(target=self._read, name=f'pdf-worker-{self.proc.pid}', daemon=True)
+        self._reader.start()
+
+    def _read(self) -> None:
+        try:
+            for line in self.proc.stdout:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if 'ready' in message:
+                    self.setup_error = None if message['ready'] else message.get('error')
+                    continue
+                self.replies.put((self, message))
+        except (OSError, ValueError):
+            pass
+        self.replies.put((self, None))
+
+    def send(self, *messages: dict) -> None:
+        try:
+            self.proc.stdin.write(b''.join(json.dumps(message).encode('utf-8') + b'\n' for message in messages))
+            self.proc.stdin.flush()
+        except OSError:
+            self.exited()
+
+    def exited(self) -> None:
+        """Raise for a worker whose process is gone."""
+
+        self._reader.join(timeout=1)  # let it record a "ready: false" sent just before the exit
+        if self.setup_error:
+            raise RuntimeError(self.setup_error)  # pypdf missing is a setup error, not a limit
+        raise _Stopped(CRASHED)
+
+    def receive(self, deadline: float, max_rss: int) -> dict:
+        while True:
+            try:
+                _, message = self.replies.get(timeout=min(POLL_SECONDS, max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                self.check(deadline, max_rss)
+                continue
+            if message is None:
+                self.exited()
+            return message
+
+    def check(self, deadline: float, max_rss: int) -> None:
+        if self.proc.poll() is not None:
+            self.exited()
+        if time.monotonic() >= deadline:
+            raise _Stopped(TIMEOUT)
+        if max_rss and (self.rss() or 0) > max_rss:
+            raise _Stopped(MEMORY)
+
+    def rss(self) -> Optional[int]:
+        if _PROC_RSS:
+            try:
+                with open(f'/proc/{self.proc.pid}/statm', 'rb') as handle:
+                    return int(handle.read().split()[1]) * _PAGE_SIZE
+            except (OSError, ValueError, IndexError):
+                return None
+        if psutil is not None:
+            try:
+                return psutil.Process(self.proc.pid).memory_info().rss
+            except psutil.Error:
+                return None
+        return None
+
+    def kill(self) -> None:
+        try:
+            self.proc.kill()
+        except OSError:
+            pass
+        self.proc.wait()
+        self._reader.join(timeout=1)  # stdout is at EOF once the process is gone
+        for pipe in (self.proc.stdin, self.proc.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+
+def _split(count: int, shards: int) -> list[tuple[int, int]]:
+    size = math.ceil(count / shards)
+    return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+class PDFWorkerPool:
+    """Up to ``workers`` extraction processes, started on first use (or by ``start()``) and kept warm.
+
+    ``timeout`` bounds one document in seconds, ``max_rss_mb`` each worker's
+    resident memory. Documents with more than ``parallel_pages`` pages are
+    split over the idle workers (0 disables the split), and ``max_pages``
+    caps how many are read at all (0: no cap). A worker left above half the
+    memory limit after a job is replaced, so one heavy PDF does not shrink
+    the budget of the next.
+    """
+
+    def __init__(self, *, workers: int, timeout: float, max_rss_mb: float, max_pages: int, parallel_pages: int) -> None:
+        self.workers = workers
+        self.timeout = timeout
+        self.max_rss_mb = max_rss_mb
+        self.max_pages = max_pages
+        self.parallel_pages = parallel_pages
+        self._idle: list[_Worker] = []
+        self._spawned = 0
+        self._closed = False
+        self._rss_warned = False
+        self._condition = threading.Condition()
+
+    @property
+    def max_rss(self) -> int:
+        return int(self.max_rss_mb * 1024 * 1024)
+
+    def start(self) -> None:
+        """Boot every worker now, so the first upload does not wait for the pypdf import."""
+
+        if self.workers > 0 and self.max_rss and not _PROC_RSS and psutil is None and not self._rss_warned:
+            self._rss_warned = True
+            logger.warning('SKYDESK_PDF_MAX_RSS_MB is not enforced here: install psutil to measure PDF worker memory')
+        while True:
+            with self._condition:
+                if self._closed or self._spawned >= self.workers:
+                    return
+                self._spawned += 1
+            worker = self._spawn()
+            with self._condition:
+                self._idle.append(worker)
+                self._condition.notify()
+
+    def _spawn(self) -> _Worker:
+        try:
+            return _Worker()
+        except OSError:
+            with self._condition:
+                self._spawned -= 1
+                self._condition.notify()
+            raise
+
+    def _acquire(self, *, block: bool = True) -> Optional[_Worker]:
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                if self._idle:
+                    return self._idle.pop()
+                if self._spawned < self.workers:
+                    self._spawned += 1
+                    break
+                if not block:
+                    return None
+                self._condition.wait()
+        return self._spawn()
+
+    def _release(self, worker: _Worker, *, healthy: bool) -> None:
+        if healthy and self.max_rss and (worker.rss() or 0) > self.max_rss // 2:
+            metrics.increment('pdf_extract.recycled')
+            healthy = False
+        with self._condition:
+            keep = healthy and not self._closed
+            if keep:
+                self._idle.append(worker)
+            else:
+                self._spawned -= 1
+            self._condition.notify()
+        if not keep:
+            worker.kill()
+            self.start()  # replace it now rather than on the next request
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._spawned -= len(idle)
+            self._condition.notify_all()
+        for worker in idle:
+            worker.kill()
+
+    def extract(self, pdf_path: Path) -> PDFText:
+        if self.workers <= 0:
+            return self._extract_here(pdf_path)
+        lead = self._acquire()
+        if lead is None:
+            raise RuntimeError('PDF extraction is shutting down')
+        held = [lead]
+        healthy: dict[_Worker, bool] = {}
+        texts: dict[int, str] = {}
+        bad_pages = 0
+        stopped: list[str] = []
+        try:
+            deadline = time.monotonic() + self.timeout if self.timeout else math.inf
+            replies: queue.Queue = queue.Queue()
+            lead.replies = replies
+            try:
+                lead.send({'open': str(pdf_path)})
+                reply = lead.receive(deadline, self.max_rss)
+            except _Stopped as exc:
+                metrics.increment(f'pdf_extract.{exc.args[0]}')
+                raise RuntimeError(f'Could not open {pdf_path.name}: {_reason_text(exc.args[0], self)}') from None
+            healthy[lead] = True
+            if 'error' in reply:
+                raise ValueError(f'Could not read {pdf_path.name}: {reply["error"]}')
+
+            total = int(reply['pages'])
+            wanted = min(total, self.max_pages) if self.max_pages else total
+            if self.parallel_pages and wanted > self.parallel_pages:
+                for _ in range(math.ceil(wanted / self.parallel_pages) - 1):
+                    extra = self._acquire(block=False)
+                    if extra is None:
+                        break
+                    held.append(extra)
+                    healthy[extra] = True
+            ranges = _split(wanted, len(held)) if wanted else [(0, 0)]
+            for extra in held[len(ranges):]:
+                self._release(extra, healthy=True)
+            del held[len(ranges):]
+            if len(held) > 1:
+                metrics.increment('pdf_extract.parallel')
+
+            lead.send({'range': list(ranges[0])})
+            for worker, page_range in zip(held[1:], ranges[1:]):
+                worker.replies = replies
+                worker.send({'open': str(pdf_path)}, {'range': list(page_range)})
+
+            active = set(held)
+            checked = time.monotonic()
+            while active:
+                try:
+                    worker, message = replies.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    worker, message = None, None
+                if worker in active:
+                    try:
+                        if message is None:
+                            worker.exited()
+                        elif 'page' in message:
+                            texts[message['page']] = message['text']
+                            bad_pages += 'error' in message
+                        elif 'done' in message or 'error' in message:
+                            active.discard(worker)
+                    except _Stopped as exc:
+                        healthy[worker] = False
+                        stopped.append(exc.args[0])
+                        active.discard(worker)
+                if time.monotonic() - checked < POLL_SECONDS:
+                    continue
+                checked = time.monotonic()
+                for worker in list(active):
+                    try:
+                        worker.check(deadline, self.max_rss)
+                    except _Stopped as exc:
+                        healthy[worker] = False
+                        stopped.append(exc.args[0])
+                        active.discard(worker)
+        finally:
+            for worker in held:
+                self._release(worker, healthy=healthy.get(worker, False))
+
+        stopped = sorted(set(stopped))
+        for reason in stopped:
+            metrics.increment(f'pdf_extract.{reason}')
+        if not stopped:
+            bad_pages += wanted - len(texts)  # a shard whose worker could not open the file
+        result = PDFText('\n'.join(texts[index] for index in sorted(texts)), pages=total, pages_read=len(texts))
+        result.warnings = _warnings(self, result, wanted, stopped, bad_pages)
+        if wanted and not texts and stopped:
+            raise RuntimeError(f'{pdf_path.name}: {result.warnings[-1]}')
+        return result
+
+    def _extract_here(self, pdf_path: Path) -> PDFText:
+        try:
+            from pypdf import PdfReader  # lazy import to avoid boot-time crash
+        except ImportError as exc:  # pragma: no cover - environment dependent
+            raise RuntimeError(
+                'PDF ingestion requires the pypdf package. Install with: pip install pypdf'
+            ) from exc
+
+        deadline = time.monotonic() + self.timeout if self.timeout else math.inf
+        reader = PdfReader(str(pdf_path))
+        total = len(reader.pages)
+        wanted = min(total, self.max_pages) if self.max_pages else total
+        texts: list[str] = []
+        stopped: list[str] = []
+        for index in range(wanted):
+            if time.monotonic() >= deadline:
+                stopped.append(TIMEOUT)
+                metrics.increment(f'pdf_extract.{TIMEOUT}')
+                break
+            texts.append(reader.pages[index].extract_text() or '')
+        result = PDFText('\n'.join(texts), pages=total, pages_read=len(texts))
+        result.warnings = _warnings(self, result, wanted, stopped, 0)
+        return result
+
+
+def _reason_text(reason: str, pool: PDFWorkerPool) -> str:
+    if reason == TIMEOUT:
+        return f'text extraction stopped after {pool.timeout:g}s'
+    if reason == MEMORY:
+        return f'text extraction stopped at the {pool.max_rss_mb:g} MB memory limit'
+    return 'the PDF worker exited unexpectedly'
+
+
+def _warnings(pool: PDFWorkerPool, result: PDFText, wanted: int, stopped: list[str], bad_pages: int) -> list[str]:
+    warnings = []
+    if wanted < result.pages:
+        metrics.increment('pdf_extract.page_cap')
+        warnings.append(f'Only the first {wanted} of {result.pages} pages were read (SKYDESK_PDF_MAX_PAGES).')
+    for reason in stopped:
+        reason_text = _reason_text(reason, pool)
+        warnings.append(f'{reason_text[0].upper()}{reason_text[1:]}; {result.pages_read} of {wanted} pages were read.')
+    if bad_pages:
+        metrics.increment('pdf_extract.bad_pages', bad_pages)
+        warnings.append(f'{bad_pages} page{"s" if bad_pages != 1 else ""} could not be read.')
+    return warnings
+
+
+def extract_pdf_text(pdf_path: Path) -> PDFText:
+    """Text of ``pdf_path`` via the shared pool; limit warnings go to the log and the current trace."""
+
+    with timed('pdf_extract'):
+        result = pdf_pool.extract(pdf_path)
+    if not result.complete:
+        metrics.increment('pdf_extract.partial')
+        active = current_trace()
+        for warning in result.warnings:
+            logger.warning('%s: %s', pdf_path.name, warning)
+            if active is not None:
+                active.warn(warning)
+    return result
+
+
+pdf_pool = PDFWorkerPool(
+    workers=int(os.getenv('SKYDESK_PDF_WORKERS', '2')),
+    timeout=float(os.getenv('SKYDESK_PDF_TIMEOUT_SECONDS', '60')),
+    max_rss_mb=float(os.getenv('SKYDESK_PDF_MAX_RSS_MB', '512')),
+    max_pages=int(os.getenv('SKYDESK_PDF_MAX_PAGES', '300')),
+    parallel_pages=int(os.getenv('SKYDESK_PDF_PARALLEL_PAGES', '40')),
+)
+atexit.register(pdf_pool.close)
@@ -0,0 +1,62 @@
+"""Child process behind ``services.pdf_extract``: pypdf text extraction over stdin/stdout.
+
+Started as a plain script so it imports nothing from the app, only pypdf
+(once, when the worker boots). The protocol is one JSON object per line:
+
+    -> {"open": "/path/file.pdf"}      <- {"pages": 12}
+    -> {"range": [0, 12]}              <- {"page": 0, "text": "..."} ... {"done": true}
+
+Any failure to open a PDF is answered with ``{"error": "..."}``; a page that
+fails is sent with empty text and its error. The worker exits when stdin
+closes, so it never outlives the app.
+"""
+
+import json
+import os
+import sys
+
+
+def send(message: dict) -> None:
+    sys.stdout.write(json.dumps(message) + '\n')
+    sys.stdout.flush()
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and hasattr(os, 'nice'):
+        try:
+            os.nice(int(sys.argv[1]))  # keep request threads ahead of a CPU-bound PDF
+        except (OSError, ValueError):
+            pass
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        send({'ready': False, 'error': 'PDF ingestion requires the pypdf package. Install with: pip install pypdf'})
+        return
+    send({'ready': True})
+
+    reader = None
+    for line in sys.stdin:
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if 'open' in message:
+            try:
+                reader = PdfReader(message['open'])
+                send({'pages': len(reader.pages)})
+            except Exception as exc:  # reported to the app, which decides
+                reader = None
+                send({'error': f'{exc.__class__.__name__}: {exc}'})
+        elif 'range' in message and reader is not None:
+            start, stop = message['range']
+            for index in range(start, stop):
+                try:
+                    send({'page': index, 'text': reader.pages[index].extract_text() or ''})
+                except Exception as exc:
+                    send({'page': index, 'text': '', 'error': f'{exc.__class__.__name__}: {exc}'})
+            send({'done': True})
+            reader = None
+
+
+if __name__ == '__main__':
+    main()
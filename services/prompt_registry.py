@@ -0,0 +1,62 @@
+"""Assistant prompts from ``ops/assistants``, loaded once and reloaded when edited.
+
+Each prompt carries a content hash. Drafts and saved metadata record the
+short ``version`` so a parse can be traced to the exact wording that
+produced it, and the extraction cache is keyed by the full ``sha256``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PROMPT_DIR = Path(__file__).resolve().parents[1] / 'ops' / 'assistants'
+
+
+@dataclass(frozen=True)
+class Prompt:
+    name: str
+    text: str
+    sha256: str
+
+    @property
+    def version(self) -> str:
+        return self.sha256[:12]
+
+    def message(self) -> dict[str, str]:
+        """The system message; keep it first and unchanged so provider prompt caching can reuse it."""
+        return {'role': 'system', 'content': self.text}
+
+
+class PromptRegistry:
+    """``get(name)`` returns ``<directory>/<name>.md``, re-read only when its mtime or size changes."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._loaded: dict[str, tuple[tuple[int, int], Prompt]] = {}
+
+    def get(self, name: str) -> Prompt:
+        path = self.directory / f'{name}.md'
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+            text = path.read_text(encoding='utf-8').strip()
+            prompt = Prompt(name=name, text=text, sha256=hashlib.sha256(text.encode('utf-8')).hexdigest())
+            previous: Optional[Prompt] = entry[1] if entry else None
+            if previous is not None and previous.sha256 != prompt.sha256:
+                logger.info('Reloaded prompt %s (%s -> %s)', name, previous.version, prompt.version)
+            self._loaded[name] = (signature, prompt)
+            return prompt
+
+
+prompts = PromptRegistry(PROMPT_DIR)
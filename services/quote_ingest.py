@@ -2,15 +2,38 @@
 
 from __future__ import annotations
 
-import json
-from dataclasses import dataclass
-import re
+import asyncio
+from dataclasses import dataclass, replace
 from pathlib import Path
 from typing import Optional
 
 from . import llm_client
-
-PROMPT_PATH = Path('ops/assistants/quote_parser.md')
+from .ingest_cache import extraction_key, ingest_cache
+from .json_extract import extract_json_object
+from .json_stream import FieldCallback, stream_json_fields
+from .metrics import timed, trace
+from .pdf_extract import extract_pdf_text
+from .prompt_registry import Prompt, prompts
+from .template_parser import TemplateMatch, match_template
+from .transcript_compactor import compact_transcript
+
+PROMPT_NAME = 'quote_parser'
+
+# Top-level shape of the quote_parser output format
+SCHEMA = {
+    'record_type': str,
+    'lead_id': (str, int),
+    'issued_at': str,
+    'client': dict,
+    'other_pax': list,
+    'trip': dict,
+    'accommodation': list,
+    'flights': list,
+    'services': list,
+    'totals': dict,
+    'notes': str,
+    'assistant_notes': str,
+}
 
 
 @dataclass(frozen=True)
@@ -20,77 +43,132 @@ class QuoteDraft:
     parsed: dict
     raw_response: str
     transcript: str
+    tokens: int = 0  # LLM tokens spent producing this draft (0 when served from cache)
+    template: Optional[dict] = None  # layout match summary when the template parser ran
+    prompt_version: Optional[str] = None  # hash of the prompt the LLM answered (None when it was not asked)
+    timings: Optional[dict] = None  # per-stage seconds, LLM calls, tokens and cost for this draft
 
 
-def _read_prompt() -> str:
-    return PROMPT_PATH.read_text(encoding='utf-8').strip()
-
-
-def _extract_pdf_text(pdf_path: Path) -> str:
-    try:
-        from pypdf import PdfReader  # lazy import to avoid boot-time crash
-    except ImportError as exc:  # pragma: no cover - environment dependent
-        raise RuntimeError(
-            'PDF ingestion requires the pypdf package. Install with: pip install pypdf'
-        ) from exc
-
-    reader = PdfReader(str(pdf_path))
-    return '\n'.join(page.extract_text() or '' for page in reader.pages)
-
-
-def _build_messages(prompt: str, transcript: str, notes: Optional[str]) -> list[dict[str, str]]:
+def _build_messages(
+    prompt: Prompt, transcript: str, notes: Optional[str], instructions: str = ''
+) -> list[dict[str, str]]:
     user_content = transcript
     if notes:
         user_content = f"{user_content}\n\nCONSULTANT_NOTES:\n{notes.strip()}"
-    return [
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": user_content},
-    ]
-
-
-def process_quote_submission(pdf_path: Path, *, notes: Optional[str] = None) -> QuoteDraft:
-    """Convert a submitted PDF into structured JSON via LLM."""
-
-    transcript = _extract_pdf_text(pdf_path)
-    prompt = _read_prompt()
-    messages = _build_messages(prompt, transcript, notes)
-    response = llm_client.chat(messages, enforce_json=True)
-
-    # Be resilient if the model adds pre/post text or code fences
-    parsed = _coerce_json_object(response.content)
-
-    if not isinstance(parsed, dict):
-        raise ValueError('LLM response must be a JSON object for quote ingestion.')
-
-    return QuoteDraft(parsed=parsed, raw_response=response.content, transcript=transcript)
-
-
-def _coerce_json_object(text: str) -> dict:
-    """Attempt to parse JSON, tolerating code fences or surrounding prose."""
-    # 1) Direct parse
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
-
-    # 2) Code fences (```json ... ``` or ``` ... ```)
-    for pattern in (r"```json\s*(.*?)```", r"```\s*(.*?)```"):
-        matches = re.findall(pattern, text, flags=re.IGNORECASE | re.DOTALL)
-        for block in matches:
-            try:
-                return json.loads(block.strip())
-            except Exception:
-                continue
-
-    # 3) Largest brace-delimited block
-    start = text.find('{')
-    end = text.rfind('}')
-    if start != -1 and end != -1 and end > start:
-        candidate = text[start : end + 1]
-        try:
-            return json.loads(candidate)
-        except Exception:
-            pass
-
-    # If all attempts fail, raise a clear error
-    raise ValueError('LLM response was not valid JSON.')
+    # Per-document instructions follow the static prompt so the prefix stays cacheable
+    messages = [prompt.message()]
+    if instructions:
+        messages.append({"role": "system", "content": instructions})
+    messages.append({"role": "user", "content": user_content})
+    return messages
+
+
+def _prepare(
+    transcript: str, notes: Optional[str]
+) -> tuple[str, list[dict[str, str]], Optional[QuoteDraft], TemplateMatch, Prompt]:
+    """Cache key and messages for the LLM call, or a finished draft from the template or cache."""
+    prompt = prompts.get(PROMPT_NAME)
+    instructions = ''
+
+    # Known supplier layouts are read directly; the model only fills what the rules missed
+    # (and still writes the notes fields when the consultant added notes)
+    with timed('template'):
+        match = match_template('quote', transcript)
+    if match.complete and not (notes or '').strip():
+        draft = QuoteDraft(parsed=match.parsed, raw_response='', transcript=transcript, template=match.summary())
+        return '', [], draft, match, prompt
+    if match.layout:
+        instructions = match.llm_instructions()
+
+    # Identical PDF + notes under the same prompt/model and compaction: reuse the earlier answer
+    compacted = compact_transcript('quote', transcript)
+    cache_key = extraction_key(
+        'quote', prompt.sha256, compacted, notes, llm_client.resolve_model(), llm_client.resolve_temperature(),
+        instructions=instructions,
+    )
+    cached = ingest_cache.get_extraction(cache_key)
+    if cached is not None:
+        draft = QuoteDraft(
+            parsed=cached['parsed'],
+            raw_response=cached['raw_response'],
+            transcript=transcript,
+            template=match.summary(),
+            prompt_version=prompt.version,
+        )
+        return cache_key, [], draft, match, prompt
+    messages = _build_messages(prompt, compacted, notes, instructions)
+    return cache_key, messages, None, match, prompt
+
+
+def _finish(
+    cache_key: str, transcript: str, response: llm_client.LLMResponse, match: TemplateMatch, prompt: Prompt
+) -> QuoteDraft:
+    content = response.content
+    # Be resilient if the model adds pre/post text, code fences or small syntax slips
+    with timed('json_parse'):
+        parsed = extract_json_object(content, SCHEMA)
+    parsed = match.merge(parsed)
+
+    ingest_cache.put_extraction(cache_key, parsed=parsed, raw_response=content)
+    return QuoteDraft(
+        parsed=parsed,
+        raw_response=content,
+        transcript=transcript,
+        tokens=response.total_tokens,
+        template=match.summary(),
+        prompt_version=prompt.version,
+    )
+
+
+def process_quote_submission(
+    pdf_path: Path, *, notes: Optional[str] = None, on_field: Optional[FieldCallback] = None
+) -> QuoteDraft:
+    """Convert a submitted PDF into structured JSON via LLM.
+
+    With ``on_field`` the completion is streamed and each top-level field is
+    passed on as soon as it is complete (template fields first), for a live preview.
+    """
+
+    with trace() as timings:
+        transcript = extract_quote_transcript(pdf_path)
+        cache_key, messages, cached, match, prompt = _prepare(transcript, notes)
+        if on_field is not None:
+            for key, value in (cached.parsed if cached is not None else match.parsed).items():
+                if value is not None:
+                    on_field(key, value)
+        if cached is not None:
+            draft = cached
+        else:
+            if on_field is not None:
+                response = stream_json_fields(messages, on_field)
+            else:
+                response = llm_client.chat(messages, enforce_json=True)
+            draft = _finish(cache_key, transcript, response, match, prompt)
+    return replace(draft, timings=timings.as_dict())
+
+
+async def aprocess_quote_submission(pdf_path: Path, *, notes: Optional[str] = None) -> QuoteDraft:
+    """Async ``process_quote_submission``: the wait for the PDF workers runs in a thread, the LLM call is awaited."""
+
+    with trace():
+        transcript = await asyncio.to_thread(extract_quote_transcript, pdf_path)
+        return await aprocess_quote_transcript(transcript, notes=notes)
+
+
+def extract_quote_transcript(pdf_path: Path, *, sha256: Optional[str] = None) -> str:
+    """Cached PDF text, extracted by the shared worker pool (``services.pdf_extract``)."""
+    return ingest_cache.transcript(pdf_path, extract_pdf_text, sha256=sha256)
+
+
+async def aprocess_quote_transcript(transcript: str, *, notes: Optional[str] = None) -> QuoteDraft:
+    """LLM half of the pipeline for text that has already been extracted."""
+
+    with trace() as timings:
+        cache_key, messages, cached, match, prompt = _prepare(transcript, notes)
+        if cached is not None:
+            draft = cached
+        else:
+            response = await llm_client.achat(messages, enforce_json=True)
+            draft = _finish(cache_key, transcript, response, match, prompt)
+    return replace(draft, timings=timings.as_dict())
+
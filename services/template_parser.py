@@ -0,0 +1,449 @@
+"""Rule-based extraction for supplier PDF layouts we already know.
+
+Quotes and bookings from our main supplier share one layout with stable
+labels ("Quote number", "Issued on", "Travel dates", "Trip Summary",
+"Grand Total", ...). When a transcript matches that layout the fields are
+read straight from the text into the same JSON shape the LLM returns. Only
+fields that could not be resolved are left for the model; when nothing is
+missing the LLM call is skipped entirely.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv('SKYDESK_TEMPLATE_PARSER', '1').strip().lower() not in {'0', 'false', 'no', 'off'}
+
+LAYOUT = 'flight_centre'
+
+# Labels that must appear as whole lines for the layout to be recognised
+LAYOUT_MARKERS = {
+    'quote': (('Quote number',), 'Issued on', 'Travel dates', 'Trip Summary', 'Travellers'),
+    'booking': (('Booking ID', 'Booking number'), 'Issued on', 'Travel dates', 'Trip Summary', 'Travellers'),
+}
+
+# Keys the template must resolve before the LLM can be skipped, in output order. Quote totals are
+# kept when the layout shows them but are not required: the quote_parser prompt never returns them
+REQUIRED_FIELDS = {
+    'quote': ('lead_id', 'issued_at', 'client', 'other_pax', 'trip', 'accommodation', 'flights', 'services'),
+    'booking': (
+        'lead_id', 'issued_at', 'client', 'other_pax', 'trip', 'accommodation', 'flights', 'services', 'totals',
+        'payments', 'status',
+    ),
+}
+# Free-text fields: null is a valid answer, but the model fills them whenever it is called anyway
+OPTIONAL_FIELDS = ('notes', 'assistant_notes')
+
+PAX_TYPES = {'Adult': 'ADT', 'Child': 'CNN', 'Infant': 'INF'}
+SERVICE_TYPES = {'Transfer', 'Rail', 'Cruise'}
+BOARD_TYPES = ('All Inclusive', 'Full Board', 'Half Board', 'Bed and Breakfast', 'Breakfast', 'Room Only')
+
+_PAGE_MARKER = re.compile(r'^\d+ / \d+$')
+_SUMMARY_ITEM = re.compile(
+    r'^(Flight|Stay|Transfer|Rail|Cruise|Tour|Experience|Activity|Insurance|Car|Package)\s+'
+    r'\w{3},\s+(\d{1,2} \w{3} \d{4})\s+(.*)$'
+)
+_SUMMARY_END = ('Your Peace of Mind', 'Trip Details', 'Payment Details', 'Terms and Conditions')
+_TRAVELLER_ROLE = re.compile(r'^(Adult|Child|Infant)(?: \(Trip Contact\))?$')
+_TRAVELLER_COUNT = re.compile(r'^(\d+) (adult|child|children|infant)s?\b', re.IGNORECASE)
+_TRAVEL_DATES = re.compile(r'^(\d{1,2} \w{3} \d{4}) - (\d{1,2} \w{3} \d{4})(?: • (\d+) nights?)?')
+_FLIGHT_LEG = re.compile(
+    r'^\w{3} (\d{1,2} \w{3}) • (\d{1,2}:\d{2}\s?[ap]m) - (\d{1,2}:\d{2}\s?[ap]m)[^•]* • [^•]+ • (Non-stop|\d+ stops?)'
+)
+_FLIGHT_CARRIER = re.compile(r'^• (.+?) • ([A-Z0-9]{2})\s?(\d{1,4}) • (.+?) • (.+)$')
+_AIRPORT_CODE = re.compile(r'^(Depart|Arrive) .*\(([A-Z]{3})\)$')
+_STAY_RANGE = re.compile(r'^\w{3} (\d{1,2} \w{3}) - \w{3} (\d{1,2} \w{3}) • (.*)$')
+_AMOUNT = re.compile(r'([\d,]+\.\d{2})\s*([A-Z]{3})\b')
+_DESTINATION = re.compile(r'travell?ing to (.+?) for \w+ purposes', re.IGNORECASE)
+
+
+@dataclass
+class TemplateMatch:
+    """Outcome of matching one transcript against the known layouts."""
+
+    record_type: str
+    layout: Optional[str] = None
+    parsed: dict = field(default_factory=dict)
+    missing: list[str] = field(default_factory=list)
+    confidence: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return self.layout is not None and not self.missing
+
+    def summary(self) -> dict:
+        """Small record of what the template resolved, stored alongside the draft."""
+        return {
+            'layout': self.layout,
+            'confidence': self.confidence,
+            'llm_fields': list(self.missing) if self.layout else None,
+        }
+
+    def llm_instructions(self) -> str:
+        """Prompt suffix asking the model for the unresolved keys only."""
+
+        keys = [*self.missing, *OPTIONAL_FIELDS]
+        known = {key: value for key, value in self.parsed.items() if key not in keys}
+        return (
+            'PRE_EXTRACTED: the fields below were read directly from the document and are correct. '
+            f'Do not repeat them. Return a JSON object containing ONLY these top-level keys from the '
+            f'template: {", ".join(keys)}.\n'
+            f'{json.dumps(known, ensure_ascii=False)}'
+        )
+
+    def merge(self, llm_parsed: dict) -> dict:
+        """Fill the unresolved keys from the model's answer; resolved values always win."""
+
+        if self.layout is None:
+            return llm_parsed
+        merged = copy.deepcopy(self.parsed)
+        for key in [*self.missing, *OPTIONAL_FIELDS]:
+            if key not in llm_parsed:
+                continue
+            ours, theirs = merged.get(key), llm_parsed[key]
+            if isinstance(ours, dict) and isinstance(theirs, dict):
+                merged[key] = {**theirs, **{k: v for k, v in ours.items() if v not in (None, [], {})}}
+            else:
+                merged[key] = theirs
+        return merged
+
+
+def _clean_lines(transcript: str) -> list[str]:
+    lines = (line.strip() for line in transcript.splitlines())
+    return [line for line in lines if line and not _PAGE_MARKER.match(line)]
+
+
+def _find_after(lines: list[str], *labels: str) -> Optional[str]:
+    wanted = {label.lower() for label in labels}
+    for index, line in enumerate(lines[:-1]):
+        if line.lower() in wanted:
+            return lines[index + 1]
+    return None
+
+
+def _parse_date(value: str, fmt: str = '%d %b %Y') -> Optional[date]:
+    try:
+        return datetime.strptime(value.strip(), fmt).date()
+    except ValueError:
+        return None
+
+
+def _day_month(value: str, *, on_or_after: date) -> Optional[date]:
+    """``1 Aug`` → the first such date on or after ``on_or_after`` (section headers omit the year)."""
+    for year in (on_or_after.year, on_or_after.year + 1):
+        parsed = _parse_date(f'{value} {year}')
+        if parsed and parsed >= on_or_after - timedelta(days=1):
+            return parsed
+    return None
+
+
+def _day_label(value: date) -> str:
+    return f'{value.day} {value:%b}'
+
+
+def _dmy(value: Optional[date]) -> Optional[str]:
+    return value.strftime('%d-%m-%Y') if value else None
+
+
+def _clock(value: str) -> Optional[str]:
+    try:
+        return datetime.strptime(value.replace(' ', '').upper(), '%I:%M%p').strftime('%H:%M')
+    except ValueError:
+        return None
+
+
+def _amount(match: Optional[re.Match]) -> Optional[dict]:
+    if not match:
+        return None
+    return {'amount': float(match.group(1).replace(',', '')), 'currency': match.group(2)}
+
+
+def _summary_items(lines: list[str]) -> Optional[list[tuple[str, date, str]]]:
+    """``(kind, date, description)`` for each line of the Trip Summary block."""
+
+    try:
+        start = lines.index('Trip Summary') + 1
+    except ValueError:
+        return None
+    items = []
+    for line in lines[start:]:
+        if line in _SUMMARY_END:
+            break
+        match = _SUMMARY_ITEM.match(line)
+        if match:
+            when = _parse_date(match.group(2))
+            if when is None:
+                return None
+            items.append((match.group(1), when, match.group(3).strip()))
+    return items
+
+
+def _travellers(lines: list[str]) -> Optional[tuple[dict, list[dict]]]:
+    """Trip contact plus the other passengers listed under Travellers in the summary."""
+
+    try:
+        start = lines.index('Travellers', lines.index('Trip Summary'))
+    except ValueError:
+        return None
+    expected = 0
+    for part in lines[start + 1].split(','):
+        count = _TRAVELLER_COUNT.match(part.strip())
+        if count:
+            expected += int(count.group(1))
+    if not expected:
+        return None
+
+    travellers, name_parts = [], []
+    for line in lines[start + 2:]:
+        if len(travellers) == expected or line in _SUMMARY_END or _SUMMARY_ITEM.match(line):
+            break
+        role = _TRAVELLER_ROLE.match(line)
+        if role is None:
+            name_parts.append(line)  # long names wrap onto a second line
+            continue
+        if not name_parts:
+            return None
+        travellers.append({
+            'name': ' '.join(name_parts),
+            'pax_type': PAX_TYPES[role.group(1)],
+            'contact': 'Trip Contact' in line,
+        })
+        name_parts = []
+    if len(travellers) != expected:
+        return None
+
+    contact = next((pax for pax in travellers if pax['contact']), travellers[0])
+    others = [{'name': pax['name'], 'pax_type': pax['pax_type']} for pax in travellers if pax is not contact]
+    return {'name': contact['name']}, others
+
+
+def _flights(lines: list[str], summary: list[tuple[str, date, str]], trip_start: date) -> Optional[list[dict]]:
+    """Non-stop legs from the Flights section; anything with stops is left to the model."""
+
+    summary_dates = [when for kind, when, _ in summary if kind == 'Flight']
+    flights = []
+    for index, line in enumerate(lines):
+        leg = _FLIGHT_LEG.match(line)
+        if leg is None:
+            continue
+        if leg.group(4) != 'Non-stop':
+            return None
+        carrier = _FLIGHT_CARRIER.match(lines[index + 1]) if index + 1 < len(lines) else None
+        codes = {}
+        for nearby in lines[index + 2:index + 12]:
+            airport = _AIRPORT_CODE.match(nearby)
+            if airport:
+                codes.setdefault(airport.group(1), airport.group(2))
+            if len(codes) == 2:
+                break
+        if carrier is None or len(codes) != 2:
+            return None
+
+        position = len(flights)
+        depart = summary_dates[position] if position < len(summary_dates) else None
+        if depart is None or _day_label(depart) != leg.group(1):
+            depart = _day_month(leg.group(1), on_or_after=trip_start)
+        segment = {
+            'carrier': carrier.group(2),
+            'flight_number': f'{carrier.group(2)}{carrier.group(3)}',
+            'origin': codes['Depart'],
+            'destination': codes['Arrive'],
+            'depart_date': _dmy(depart),
+            'depart_time_local': _clock(leg.group(2)),
+            'arrive_time_local': _clock(leg.group(3)),
+            'equipment': carrier.group(4),
+            'booking_class': None,
+            'fare_basis': None,
+            'ticket_number': None,
+        }
+        flights.append({
+            'carrier': segment['carrier'],
+            'route': f"{segment['origin']}-{segment['destination']}",
+            'origin': segment['origin'],
+            'destination': segment['destination'],
+            'pnr': None,
+            'segments': [segment],
+            'layover_count': 0,
+            'layovers': [],
+            'supplier_ref': None,
+        })
+    if len(flights) != len(summary_dates):
+        return None
+    return flights
+
+
+def _services(lines: list[str], summary: list[tuple[str, date, str]]) -> list[dict]:
+    """Transfers (with pick-up/drop-off when listed), rail and cruise items from the summary."""
+
+    pickups = [line[len('Pick-up '):] for line in lines if line.startswith('Pick-up ')]
+    dropoffs = [line[len('Drop-off '):] for line in lines if line.startswith('Drop-off ')]
+    transfers = [item for item in summary if item[0] == 'Transfer']
+    with_places = len(pickups) == len(dropoffs) == len(transfers)
+
+    services = []
+    transfer_index = 0
+    for kind, when, description in summary:
+        if kind not in SERVICE_TYPES:
+            continue
+        if kind == 'Transfer' and with_places:
+            description = f'{description} from {pickups[transfer_index]} to {dropoffs[transfer_index]}'
+        if kind == 'Transfer':
+            transfer_index += 1
+        services.append({
+            'type': kind,
+            'description': description,
+            'depart_date': _dmy(when),
+            'return_date': None,
+            'supplier_ref': None,
+        })
+    return services
+
+
+def _stays(lines: list[str], summary: list[tuple[str, date, str]]) -> Optional[tuple[list[dict], list[str], list[str]]]:
+    """Accommodation entries plus any ``location, country`` pairs printed with them."""
+
+    stays = [item for item in summary if item[0] == 'Stay']
+    try:
+        details_start = lines.index('Trip Details')
+    except ValueError:
+        details_start = len(lines)
+    ranges = [index for index in range(details_start, len(lines)) if _STAY_RANGE.match(lines[index])]
+    if len(ranges) != len(stays):
+        return None
+
+    accommodation, locations, countries = [], [], []
+    for (_, check_in, description), index in zip(stays, ranges):
+        stay_range = _STAY_RANGE.match(lines[index])
+        nights_prefix = re.match(r'^(\d+) nights? (.*)$', description)
+        name = nights_prefix.group(2) if nights_prefix else description
+        check_out = _day_month(stay_range.group(2), on_or_after=check_in)
+        if check_out is None or stay_range.group(1) != _day_label(check_in):
+            return None
+
+        heading = lines[index - 1]
+        reference = re.search(r'Booking Reference:\s*(\S+)', heading)
+        supplier_ref = reference.group(1) if reference and reference.group(1).upper() != 'TBA' else None
+
+        room_type = board = None
+        for part in stay_range.group(3).split(' • '):
+            place = re.match(r'^([^,\d]+), ([^,\d]+)$', part.strip())
+            if place:
+                locations.append(place.group(1).strip())
+                countries.append(place.group(2).strip())
+        for detail in lines[index + 1:index + 5]:
+            if detail.startswith(('Invoice Note', 'Booking Note', 'Address:', 'Fees Payable', 'Cancellation Policy')):
+                break
+            board = board or next((kind for kind in BOARD_TYPES if kind.lower() in detail.lower()), None)
+            if not detail.startswith('•') and '•' not in detail and room_type is None:
+                room_type = re.sub(r'\s*\(\d+(?:,\d+)*\)$', '', detail)
+        if board is None:
+            board = next((kind for kind in BOARD_TYPES if kind.lower() in name.lower()), None)
+
+        accommodation.append({
+            'name': name,
+            'check_in': _dmy(check_in),
+            'check_out': _dmy(check_out),
+            'nights': (check_out - check_in).days,
+            'room_type': room_type,
+            'board': board,
+            'supplier_ref': supplier_ref,
+        })
+    return accommodation, locations, countries
+
+
+def _unique(values: list[str]) -> list[str]:
+    return list(dict.fromkeys(value for value in values if value))
+
+
+def _match_layout(record_type: str, lines: list[str]) -> bool:
+    present = set(lines)
+    for marker in LAYOUT_MARKERS.get(record_type, ()):
+        options = marker if isinstance(marker, tuple) else (marker,)
+        if not present.intersection(options):
+            return False
+    return True
+
+
+def match_template(record_type: str, transcript: str) -> TemplateMatch:
+    """Resolve what we can from ``transcript``; ``missing`` lists what still needs the LLM."""
+
+    result = TemplateMatch(record_type=record_type)
+    lines = _clean_lines(transcript)
+    if not ENABLED or not _match_layout(record_type, lines):
+        return result
+
+    text = '\n'.join(lines)
+    resolved: dict = {key: None for key in ('record_type', *REQUIRED_FIELDS[record_type], 'totals', *OPTIONAL_FIELDS)}
+    resolved['record_type'] = record_type
+
+    lead_id = _find_after(lines, 'Quote number', 'Booking ID', 'Booking number')
+    if lead_id and re.fullmatch(r'\d{7}', lead_id):
+        resolved['lead_id'] = lead_id
+    issued = _parse_date(_find_after(lines, 'Issued on') or '')
+    resolved['issued_at'] = _dmy(issued)
+
+    travel_dates = _TRAVEL_DATES.match(_find_after(lines, 'Travel dates') or '')
+    trip_start = _parse_date(travel_dates.group(1)) if travel_dates else None
+    trip_end = _parse_date(travel_dates.group(2)) if travel_dates else None
+
+    travellers = _travellers(lines)
+    if travellers:
+        resolved['client'], resolved['other_pax'] = travellers
+
+    summary = _summary_items(lines)
+    locations: list[str] = []
+    countries: list[str] = []
+    if summary is not None and trip_start is not None:
+        resolved['flights'] = _flights(lines, summary, trip_start)
+        resolved['services'] = _services(lines, summary)
+        stays = _stays(lines, summary)
+        if stays is not None:
+            resolved['accommodation'], locations, countries = stays
+
+    grand_total = None
+    if 'Grand Total' in lines:
+        start = lines.index('Grand Total')
+        grand_total = _amount(_AMOUNT.search('\n'.join(lines[start + 1:start + 12])))
+    totals: Optional[dict] = {'grand_total': grand_total} if grand_total else None
+    if totals and record_type == 'booking':
+        balance = _amount(re.search(r'Total Remaining Balance Owing\s*' + _AMOUNT.pattern, text))
+        totals['balance_remaining'] = balance
+    resolved['totals'] = totals
+
+    destinations = _unique(_DESTINATION.findall(text)) or _unique(countries)
+    if not locations:
+        title = re.match(r'^Trip to (.+)$', _find_after(lines, 'Review your holiday') or '')
+        locations = [title.group(1)] if title else []
+    if trip_start and trip_end:
+        nights = (trip_end - trip_start).days
+        stated = int(travel_dates.group(3)) if travel_dates.group(3) else nights
+        resolved['trip'] = {
+            'destinations': destinations or None,
+            'locations': _unique(locations) or None,
+            'dates': {'start': trip_start.isoformat(), 'end': trip_end.isoformat(), 'nights': stated},
+        }
+        trip_ok = bool(destinations and locations) and stated == nights
+    else:
+        trip_ok = False
+
+    required = REQUIRED_FIELDS[record_type]
+    partial = {'trip': not trip_ok, 'totals': bool(totals) and None in totals.values()}
+    missing = [key for key in required if resolved.get(key) is None or partial.get(key)]
+    result.layout = LAYOUT
+    result.parsed = resolved
+    result.missing = missing
+    result.confidence = round(1 - len(missing) / len(required), 2)
+    logger.info(
+        'Template %s matched %s transcript (confidence %.2f, LLM fields: %s)',
+        LAYOUT, record_type, result.confidence, ', '.join(missing) or 'none',
+    )
+    return result
@@ -0,0 +1,71 @@
+"""Gzip side files for the bulky text kept with drafts and saved leads.
+
+The PDF transcript and the raw LLM answer are only read when someone opens
+the source panel, so ``draft.json`` and ``metadata.json`` keep a small
+``blobs`` header (file name and size per field) and the text itself lives
+next to them as ``<field>.txt.gz``. Older files with the text inline are
+still read.
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+BLOB_FIELDS = ('transcript', 'raw_response')
+COMPRESS_LEVEL = 6
+
+
+def blob_path(directory: Path, field: str) -> Path:
+    return directory / f'{field}.txt.gz'
+
+
+def write_blobs(directory: Path, values: dict[str, Optional[str]]) -> dict[str, dict]:
+    """Write each non-empty text to its side file; returns the header to store instead."""
+
+    header: dict[str, dict] = {}
+    for field in BLOB_FIELDS:
+        text = values.get(field)
+        if not text:
+            continue
+        path = blob_path(directory, field)
+        partial = path.with_name(path.name + '.tmp')
+        data = gzip.compress(text.encode('utf-8'), compresslevel=COMPRESS_LEVEL, mtime=0)
+        partial.write_bytes(data)
+        os.replace(partial, path)
+        header[field] = {'filename': path.name, 'chars': len(text), 'bytes': len(data)}
+    return header
+
+
+def move_blobs(source: Path, target: Path, header: Optional[dict]) -> None:
+    """Move the side files named in ``header`` from a draft directory into the lead's."""
+
+    target.mkdir(parents=True, exist_ok=True)
+    for field in header or {}:
+        path = blob_path(source, field)
+        if path.exists():
+            shutil.move(str(path), blob_path(target, field))
+
+
+def read_blob(directory: Path, field: str, data: Optional[dict] = None) -> Optional[str]:
+    """The text for ``field``: its side file, else the value inline in an older ``data`` dict."""
+
+    if field not in BLOB_FIELDS:
+        raise KeyError(field)
+    path = blob_path(directory, field)
+    try:
+        return gzip.decompress(path.read_bytes()).decode('utf-8')
+    except FileNotFoundError:
+        return (data or {}).get(field)
+
+
+def blob_bytes(directory: Path, field: str) -> Optional[bytes]:
+    """The compressed side file as stored, to send with ``Content-Encoding: gzip``."""
+
+    try:
+        return blob_path(directory, field).read_bytes()
+    except FileNotFoundError:
+        return None
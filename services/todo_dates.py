@@ -0,0 +1,256 @@
+"""Read the due date of a To-Do straight from its text.
+
+Most tasks carry an explicit or everyday date ("Chase deposit 12-03-2026",
+"call back tomorrow", "final docs end of May"), and those don't need an LLM
+round-trip. ``find_due_date`` resolves them against the lead's ``TODAY`` and returns
+``None`` when the wording is ambiguous (two different dates, "next Friday" said
+early in the week, or date-like words it cannot pin down) so the caller can ask
+the assistant instead.
+"""
+
+from __future__ import annotations
+
+import calendar
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Optional
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+WEEKDAYS = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+NUMBERS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'twelve': 12,
+}
+
+_MONTH = (
+    r'(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?'
+    r'|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?'
+)
+_WEEKDAY = r'(mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)(?:day|nesday|sday|urday)?'
+_ORDINAL = r'(?:st|nd|rd|th)?'
+_COUNT = r'(\d{1,3}|' + '|'.join(NUMBERS) + r')'
+
+# Words that usually mean the text holds a date this module could not resolve on its own.
+# "may", "day" and "hours" are everyday words too, so they only count next to a number or after
+# a date connector ("in May", "3 May", "a day", "a few days", "72 hours"); plain "days" always counts
+_DATE_WORDS = re.compile(
+    r'\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|june?|july?|aug(?:ust)?'
+    r'|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b'
+    r'|\b(?:in|by|of|mid|early|late|until|till|before|after)\s+may\b|\bmay\s+\d|\d(?:st|nd|rd|th)?\s+may\b'
+    r'|\bdays\b|(?:\d|\b(?:a|an|half|few|couple of|several|' + '|'.join(NUMBERS) + r'))\s*(?:days?|hours?|hrs?)\b'
+    r'|\b(?:mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)(?:day|nesday|sday|urday)?s?\b'
+    r'|\b(?:today|tonight|tomorrow|yesterday|week|weeks|weekend|fortnight|month|months|year|years|quarter)\b'
+    r'|\b(?:next|asap|soon|mid|early|late|before|after|until|till|christmas|easter|eod|eow|eom|q[1-4])\b'
+    r'|\b\d{1,2}[/.-]\d{1,2}\b|\b(?:19|20)\d{2}\b|\b\d{1,2}(?:st|nd|rd|th)\b',
+    re.IGNORECASE,
+)
+# Connectors that introduce a date phrase; they go with it when it is cut out of the task text
+_CONNECTOR = re.compile(r'\s*\b(?:due\s+(?:on|by)?|by|on|for|from)\s*$', re.IGNORECASE)
+_LEADING_CONNECTOR = re.compile(r'(?:on|by)\s', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class DueDate:
+    """A resolved due date and the task text (with the date phrase removed where that reads cleanly)."""
+
+    due: date
+    task: str
+
+    @property
+    def formatted(self) -> str:
+        return self.due.strftime('%d-%m-%Y')
+
+
+def _month(token: str) -> int:
+    return MONTHS[token.lower()[:3]]
+
+
+def _year(token: Optional[str]) -> Optional[int]:
+    if not token:
+        return None
+    value = int(token)
+    return value + 2000 if value < 100 else value
+
+
+def _build(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _upcoming(today: date, month: int, day: int, year: Optional[int]) -> Optional[date]:
+    """``day``/``month`` in ``year``, or its next occurrence from ``today`` when no year is given."""
+
+    if year is not None:
+        return _build(year, month, day)
+    candidate = _build(today.year, month, day)
+    if candidate is not None and candidate >= today:
+        return candidate
+    return _build(today.year + 1, month, day)
+
+
+def _month_end(year: int, month: int) -> date:
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _add_months(value: date, months: int) -> date:
+    index = value.month - 1 + months
+    year, month = value.year + index // 12, index % 12 + 1
+    return date(year, month, min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def _next_weekday(today: date, weekday: int) -> date:
+    """The coming ``weekday``, never today."""
+    return today + timedelta(days=(weekday - today.weekday() - 1) % 7 + 1)
+
+
+def _weekday(today: date, match: re.Match) -> Optional[date]:
+    """The coming weekday; ``None`` for "next Friday" when that Friday is still this week.
+
+    Said on a Thursday, "next Friday" means tomorrow to some people and Friday
+    week to others, so that reading is left to the assistant.
+    """
+
+    resolved = _next_weekday(today, WEEKDAYS[match.group(1).lower()[:3]])
+    same_week = resolved.isocalendar()[:2] == today.isocalendar()[:2]
+    if same_week and match.group(0).lower().startswith('next'):
+        return None
+    return resolved
+
+
+def _month_in_range(today: date, month: int, year: Optional[int]) -> tuple[int, int]:
+    """Year/month of the named month, rolling to next year once it has passed."""
+
+    if year is not None:
+        return year, month
+    return (today.year if month >= today.month else today.year + 1), month
+
+
+def _qualified_month(today: date, match: re.Match) -> Optional[date]:
+    qualifier = match.group(1).lower()
+    year, month = _month_in_range(today, _month(match.group(2)), _year(match.group(3)))
+    if qualifier == 'end':
+        return _month_end(year, month)
+    if qualifier in {'mid', 'middle'}:
+        return date(year, month, 15)
+    return date(year, month, 1)
+
+
+def _in_count(today: date, match: re.Match) -> Optional[date]:
+    raw = match.group(1).lower()
+    count = NUMBERS[raw] if raw in NUMBERS else int(raw)
+    unit = match.group(2).lower()
+    if unit.startswith('day'):
+        return today + timedelta(days=count)
+    if unit.startswith('week'):
+        return today + timedelta(weeks=count)
+    if unit.startswith('fortnight'):
+        return today + timedelta(weeks=2 * count)
+    return _add_months(today, count)
+
+
+def _relative_period(today: date, match: re.Match) -> Optional[date]:
+    phrase = re.sub(r'\s+', ' ', match.group(0).lower())
+    friday = today + timedelta(days=(4 - today.weekday()) % 7)
+    if phrase in {'eod', 'end of day', 'end of the day', 'today', 'tonight'}:
+        return today
+    if phrase == 'day after tomorrow':
+        return today + timedelta(days=2)
+    if phrase == 'tomorrow':
+        return today + timedelta(days=1)
+    if phrase in {'eow', 'end of week', 'end of the week', 'end of this week'}:
+        return friday
+    if phrase == 'end of next week':
+        return friday + timedelta(days=7)
+    if phrase == 'next week':
+        return today + timedelta(days=7 - today.weekday())
+    if phrase in {'eom', 'end of month', 'end of the month', 'end of this month'}:
+        return _month_end(today.year, today.month)
+    if phrase == 'end of next month':
+        following = _add_months(today.replace(day=1), 1)
+        return _month_end(following.year, following.month)
+    if phrase == 'next month':
+        return _add_months(today.replace(day=1), 1)
+    return None
+
+
+# (pattern, resolver) pairs, most specific first; overlapping later matches are ignored
+_RULES: list[tuple[re.Pattern, Callable[[date, re.Match], Optional[date]]]] = [
+    (re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b'),
+     lambda today, m: _build(int(m.group(1)), int(m.group(2)), int(m.group(3)))),
+    (re.compile(r'\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4}|\d{2})\b'),
+     lambda today, m: _build(_year(m.group(3)), int(m.group(2)), int(m.group(1)))),
+    (re.compile(rf'\b(end|start|beginning|mid|middle)(?:\s+of)?(?:\s+the)?[\s-]+{_MONTH}(?:\s+(\d{{4}}))?\b', re.IGNORECASE),
+     _qualified_month),
+    (re.compile(rf'\b(\d{{1,2}}){_ORDINAL}(?:\s+of)?\s+{_MONTH}(?:,?\s+(\d{{4}}))?\b', re.IGNORECASE),
+     lambda today, m: _upcoming(today, _month(m.group(2)), int(m.group(1)), _year(m.group(3)))),
+    (re.compile(rf'\b{_MONTH}\s+(\d{{1,2}}){_ORDINAL}(?!\d)(?:,?\s+(\d{{4}}))?\b', re.IGNORECASE),
+     lambda today, m: _upcoming(today, _month(m.group(1)), int(m.group(2)), _year(m.group(3)))),
+    # "June 2027" means the start of the month, as in the assistant prompt
+    (re.compile(rf'\b{_MONTH}\s+(\d{{4}})\b', re.IGNORECASE),
+     lambda today, m: _build(int(m.group(2)), _month(m.group(1)), 1)),
+    (re.compile(r'\b(\d{1,2})/(\d{1,2})\b(?![/.-]\d)'),
+     lambda today, m: _upcoming(today, int(m.group(2)), int(m.group(1)), None)),
+    (re.compile(rf'\bin\s+{_COUNT}\s+(days?|weeks?|fortnights?|months?)\b', re.IGNORECASE), _in_count),
+    (re.compile(
+        r'\b(?:day after tomorrow|tomorrow|today|tonight|eod|end of (?:the )?day|eow|end of (?:the |this |next )?week'
+        r'|next week|eom|end of (?:the |this |next )?month|next month)\b',
+        re.IGNORECASE,
+    ), _relative_period),
+    (re.compile(rf'\b(?:(?:this|next|on|by)\s+)?{_WEEKDAY}\b', re.IGNORECASE), _weekday),
+]
+
+
+def _strip_phrase(text: str, start: int, end: int) -> Optional[str]:
+    """``text`` without the date phrase, or ``None`` when cutting it would change the task's wording.
+
+    Only a phrase introduced by a connector ("on Friday", "due by 3 May") or one
+    that closes the text is cut; "call back tomorrow morning" stays as written.
+    """
+
+    before, after = text[:start].rstrip(), text[end:].lstrip(' ,.;:-')
+    led = _CONNECTOR.search(before) is not None or _LEADING_CONNECTOR.match(text[start:end]) is not None
+    if not led and after:
+        return None
+    task = f'{_CONNECTOR.sub("", before)} {after}'.strip(' ,.;:-')
+    return re.sub(r'\s{2,}', ' ', task)
+
+
+def find_due_date(text: str, today: date) -> Optional[DueDate]:
+    """The due date stated in ``text``, or ``None`` when there is none or it is ambiguous."""
+
+    found: list[tuple[int, int, date]] = []
+    for pattern, resolve in _RULES:
+        for match in pattern.finditer(text):
+            start, end = match.span()
+            if any(start < other_end and other_start < end for other_start, other_end, _ in found):
+                continue
+            resolved = resolve(today, match)
+            if resolved is None:
+                return None  # looks like a date but isn't one (31-02-2026): let the assistant judge
+            found.append((start, end, resolved))
+
+    if not found or len({resolved for _, _, resolved in found}) > 1:
+        return None
+    remainder = text
+    for start, end, _ in sorted(found, reverse=True):
+        remainder = remainder[:start] + ' ' + remainder[end:]
+    if _DATE_WORDS.search(remainder):
+        return None  # e.g. "before the Easter break": more date wording than we resolved
+
+    task: Optional[str] = text
+    for start, end, _ in sorted(found, reverse=True):
+        task = _strip_phrase(task, start, end)
+        if task is None:
+            break
+    return DueDate(due=found[0][2], task=task or text.strip())
+
+
+def has_date_words(text: str) -> bool:
+    """Whether ``text`` mentions anything that might be a date."""
+    return bool(_DATE_WORDS.search(text))
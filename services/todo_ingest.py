@@ -1,17 +1,37 @@
-"""Pipeline to create a structured To Do via LLM from free text."""
+"""Pipeline to create structured To Dos from free text (local date parser first, LLM otherwise)."""
 
 from __future__ import annotations
 
-import json
+import os
 from dataclasses import dataclass
 import re
 from datetime import datetime
-from pathlib import Path
 from typing import Optional
 
 from . import llm_client
+from .json_extract import extract_json_object
+from .metrics import metrics
+from .prompt_registry import Prompt, prompts
+from .todo_dates import find_due_date, has_date_words
 
-PROMPT_PATH = Path('ops/assistants/todo_parser.md')
+PROMPT_NAME = 'todo_parser'
+
+# Several tasks in one paste: one per line or separated by semicolons, optionally bulleted/numbered
+_TASK_SEPARATOR = re.compile(r'\s*(?:;|\n)\s*')
+_BULLET = re.compile(r'^(?:[-*\u2022]|\d{1,2}[.)])\s+')
+
+# Appended after the static todo prompt (keeps its prefix cacheable) when several tasks share a call
+BATCH_INSTRUCTIONS = (
+    'The user message lists several numbered tasks for the same lead. Handle each one as described above '
+    'and respond with a JSON object {"todos": [...]} holding one object in the output format per task, '
+    'in the same order as the numbered tasks.'
+)
+
+TODO_SCHEMA = {'lead_id': (str, int), 'task': str, 'date_to_be_done': str}
+BATCH_SCHEMA = {'todos': list}
+
+# Resolve explicit and everyday dates without the assistant; 0 sends every task to the LLM
+LOCAL_DATES = os.getenv('SKYDESK_TODO_LOCAL_DATES', '1').strip().lower() not in {'0', 'false', 'no', 'off'}
 
 
 @dataclass(frozen=True)
@@ -21,55 +41,127 @@ class TodoItem:
     date_to_be_done: str
 
 
-def _load_prompt() -> str:
-    return PROMPT_PATH.read_text(encoding='utf-8').strip()
+def _build_messages(prompt: Prompt, *, lead_id: str, today: str, text: str) -> list[dict[str, str]]:
+    user_content = (
+        f"LEAD_ID: {lead_id}\n"
+        f"TODAY: {today}\n"
+        f"TASK: {text.strip()}\n"
+    )
+    return [
+        prompt.message(),
+        {"role": "user", "content": user_content},
+    ]
 
 
-def _build_messages(prompt: str, *, lead_id: str, today: str, text: str) -> list[dict[str, str]]:
+def _build_batch_messages(prompt: Prompt, *, lead_id: str, today: str, tasks: list[str]) -> list[dict[str, str]]:
+    numbered = '\n'.join(f"{position}. {task}" for position, task in enumerate(tasks, start=1))
     user_content = (
         f"LEAD_ID: {lead_id}\n"
         f"TODAY: {today}\n"
-        f"TASK: {text.strip()}\n"
+        f"TASKS:\n{numbered}\n"
     )
     return [
-        {"role": "system", "content": prompt},
+        prompt.message(),
+        {"role": "system", "content": BATCH_INSTRUCTIONS},
         {"role": "user", "content": user_content},
     ]
 
 
-def _coerce_json_object(text: str) -> dict:
+def split_tasks(text: str) -> list[str]:
+    """Individual tasks from a pasted list ("call hotel by Fri; chase deposit 1 Nov")."""
+    tasks = (_BULLET.sub('', part.strip()).strip() for part in _TASK_SEPARATOR.split(text or ''))
+    return [task for task in tasks if task]
+
+
+def _local_todo(*, lead_id: str, today: str, text: str) -> Optional[TodoItem]:
+    """The To-Do read straight from ``text``, or ``None`` when the date needs the assistant."""
     try:
-        return json.loads(text)
-    except Exception:
-        pass
-    # Code fences fallback
-    import re
-    for pattern in (r"```json\s*(.*?)```", r"```\s*(.*?)```"):
-        matches = re.findall(pattern, text, flags=re.IGNORECASE | re.DOTALL)
-        for block in matches:
-            try:
-                return json.loads(block.strip())
-            except Exception:
-                continue
-    # Largest brace object
-    start = text.find('{')
-    end = text.rfind('}')
-    if start != -1 and end != -1 and end > start:
-        candidate = text[start : end + 1]
-        try:
-            return json.loads(candidate)
-        except Exception:
-            pass
-    raise ValueError('LLM response was not valid JSON.')
+        reference = datetime.strptime(today, '%d-%m-%Y').date()
+    except ValueError:
+        return None
+    found = find_due_date(text, reference)
+    if found is not None:
+        return TodoItem(lead_id=lead_id, task=found.task, date_to_be_done=found.formatted)
+    if not has_date_words(text):
+        return TodoItem(lead_id=lead_id, task=text.strip(), date_to_be_done='')
+    return None
+
+
+class TodoBatchIncomplete(llm_client.LLMNotConfigured):
+    """The assistant is not configured, but some tasks of a batch were read locally.
+
+    ``items`` are the To-Dos resolved without it and ``unresolved`` the task texts
+    that still need it; callers that only catch ``LLMNotConfigured`` keep working.
+    """
+
+    def __init__(self, message: str, *, items: list[TodoItem], unresolved: list[str]) -> None:
+        super().__init__(message)
+        self.items = items
+        self.unresolved = unresolved
 
 
 def process_todo_submission(*, lead_id: str, today: str, text: str) -> TodoItem:
-    prompt = _load_prompt()
+    if LOCAL_DATES:
+        todo = _local_todo(lead_id=lead_id, today=today, text=text)
+        if todo is not None:
+            metrics.increment('todo.local')
+            return todo
+    metrics.increment('todo.llm')
+    prompt = prompts.get(PROMPT_NAME)
     messages = _build_messages(prompt, lead_id=lead_id, today=today, text=text)
     response = llm_client.chat(messages, enforce_json=True)
-    parsed = _coerce_json_object(response.content)
-    if not isinstance(parsed, dict):
-        raise ValueError('LLM response must be a JSON object for todo generation.')
+    parsed = extract_json_object(response.content, TODO_SCHEMA)
+    return _todo_from_answer(parsed, lead_id=lead_id, text=text)
+
+
+def process_todo_batch(*, lead_id: str, today: str, text: str) -> list[TodoItem]:
+    """Every task in ``text`` as a ``TodoItem``, in order.
+
+    Tasks the local date parser can settle never reach the LLM; the rest share
+    a single assistant call, so a pasted list costs at most one round-trip.
+    Raises ``TodoBatchIncomplete`` when some tasks were read locally but the
+    assistant is needed for the rest and not configured.
+    """
+
+    tasks = split_tasks(text)
+    if len(tasks) <= 1:
+        return [process_todo_submission(lead_id=lead_id, today=today, text=tasks[0] if tasks else text)]
+
+    items: list[Optional[TodoItem]] = [
+        _local_todo(lead_id=lead_id, today=today, text=task) if LOCAL_DATES else None for task in tasks
+    ]
+    pending = [position for position, item in enumerate(items) if item is None]
+    metrics.increment('todo.local', len(tasks) - len(pending))
+    try:
+        _ask_assistant(items, pending, tasks, lead_id=lead_id, today=today)
+    except llm_client.LLMNotConfigured as exc:
+        if len(pending) == len(tasks):
+            raise
+        resolved = [item for item in items if item is not None]
+        raise TodoBatchIncomplete(str(exc), items=resolved, unresolved=[tasks[p] for p in pending]) from exc
+    return [item for item in items if item is not None]
+
+
+def _ask_assistant(
+    items: list[Optional[TodoItem]], pending: list[int], tasks: list[str], *, lead_id: str, today: str
+) -> None:
+    """Fill ``items`` at the ``pending`` positions from one assistant call."""
+
+    if len(pending) == 1:
+        position = pending[0]
+        items[position] = process_todo_submission(lead_id=lead_id, today=today, text=tasks[position])
+    elif pending:
+        metrics.increment('todo.llm', len(pending))
+        prompt = prompts.get(PROMPT_NAME)
+        messages = _build_batch_messages(prompt, lead_id=lead_id, today=today, tasks=[tasks[p] for p in pending])
+        response = llm_client.chat(messages, enforce_json=True)
+        answers = extract_json_object(response.content, BATCH_SCHEMA).get('todos') or []
+        for offset, position in enumerate(pending):
+            answer = answers[offset] if offset < len(answers) and isinstance(answers[offset], dict) else {}
+            items[position] = _todo_from_answer(answer, lead_id=lead_id, text=tasks[position])
+
+
+def _todo_from_answer(parsed: dict, *, lead_id: str, text: str) -> TodoItem:
     # Basic shape validation; tolerate minor casing/spacing issues
     lead = str(parsed.get('lead_id') or lead_id)
     task = str(parsed.get('task') or text).strip()
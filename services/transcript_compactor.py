@@ -0,0 +1,127 @@
+"""Shrink PDF transcripts before they are sent to the LLM.
+
+pypdf output repeats page footers, traveller counts and supplier policy
+blurbs, and carries pages of terms and conditions the parsers never use.
+Prompt size drives both latency and cost, so each document type has a
+profile of sections to drop; repeated lines are kept once and whitespace
+is collapsed. The raw transcript is still what gets stored on the draft.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from .llm_scheduler import estimate_tokens
+from .metrics import timed
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv('SKYDESK_COMPACT_TRANSCRIPTS', '1').strip().lower() not in {'0', 'false', 'no', 'off'}
+
+_PAGE_MARKER = re.compile(r'^\d+ / \d+$')
+_WHITESPACE = re.compile(r'[ \t ]+')
+_PRICE_LINE = r'\$[\d,]+\.\d{2}'
+
+
+@dataclass(frozen=True)
+class CompactionProfile:
+    """``drop_sections`` pairs a start-line pattern with the extra patterns that end it.
+
+    Patterns are full-line regular expressions. A dropped section also ends
+    at any of ``anchors``, and the line that ends it is kept. Lines of at least ``min_repeat_length``
+    characters seen ``repeat_limit`` times or more, and any repeated line of
+    ``long_line`` characters or more, are kept only where they first appear.
+    """
+
+    drop_sections: tuple[tuple[str, tuple[str, ...]], ...] = ()
+    anchors: tuple[str, ...] = ()
+    repeat_limit: int = 3
+    min_repeat_length: int = 16
+    long_line: int = 60
+
+
+_SECTIONS = (
+    # Captain's Pack and travel insurance policy wording
+    ('Your Peace of Mind', ()),
+    ('Fare Rules', (_PRICE_LINE,)),
+    # Transfer operator luggage and meeting point policies
+    ('IMPORTANT INFORMATION', ('Cancellation Policy', _PRICE_LINE)),
+    ('Essential Information', ()),
+    ('Payment Fees', ()),
+    ('Terms and Conditions', ()),
+)
+_ANCHORS = (
+    'Trip Details', 'Stays', 'Flights', 'Transfers', 'Total Price', 'Payment Details', 'Price Breakdown', 'Grand Total',
+)
+
+PROFILES = {
+    'quote': CompactionProfile(drop_sections=_SECTIONS, anchors=_ANCHORS),
+    # Booking invoices also list payments and the balance owing; never drop past them
+    'booking': CompactionProfile(
+        drop_sections=_SECTIONS,
+        anchors=_ANCHORS + (r'Total Remaining Balance Owing.*', r'\d{2} \w{3} \d{4}\s+Payment\b.*'),
+    ),
+}
+
+
+def _drop_sections(lines: list[str], profile: CompactionProfile) -> list[str]:
+    sections = [
+        (re.compile(start), [re.compile(stop) for stop in stops]) for start, stops in profile.drop_sections
+    ]
+    # Sub-headings inside a dropped section (say IMPORTANT INFORMATION under Your Peace of Mind) don't end it
+    always_stop = [re.compile(anchor) for anchor in profile.anchors]
+    kept: list[str] = []
+    stops = None
+    for line in lines:
+        if stops is not None:
+            if not any(stop.fullmatch(line) for stop in (*stops, *always_stop)):
+                continue
+            stops = None
+        for start, section_stops in sections:
+            if start.fullmatch(line):
+                stops = section_stops
+                break
+        else:
+            kept.append(line)
+    return kept
+
+
+def _drop_repeats(lines: list[str], profile: CompactionProfile) -> list[str]:
+    counts = Counter(lines)
+    seen: set[str] = set()
+    kept = []
+    for line in lines:
+        repeated = (counts[line] >= profile.repeat_limit and len(line) >= profile.min_repeat_length) or (
+            counts[line] > 1 and len(line) >= profile.long_line
+        )
+        if repeated and line in seen:
+            continue
+        seen.add(line)
+        kept.append(line)
+    return kept
+
+
+def compact_transcript(record_type: str, transcript: str) -> str:
+    """The prompt-ready version of ``transcript`` for ``record_type`` (``quote``/``booking``)."""
+
+    profile = PROFILES.get(record_type)
+    if not ENABLED or profile is None:
+        return transcript
+
+    with timed('compact'):
+        lines = (_WHITESPACE.sub(' ', line).strip() for line in transcript.splitlines())
+        lines = [line for line in lines if line and not _PAGE_MARKER.match(line)]
+        lines = _drop_repeats(_drop_sections(lines, profile), profile)
+        compacted = '\n'.join(lines)
+
+    before = estimate_tokens([{'content': transcript}])
+    after = estimate_tokens([{'content': compacted}])
+    logger.info(
+        'Compacted %s transcript from ~%s to ~%s tokens (%.0f%% smaller)',
+        record_type, before, after, 100 * (1 - after / before) if before else 0,
+    )
+    return compacted
@@ -0,0 +1,104 @@
+import json
+import sqlite3
+import time
+from contextlib import closing
+
+import pytest
+
+from services.draft_lifecycle import DRAFT_FILENAME, READY, DraftIndex, DraftSweeper
+from services.file_lock import FileLock
+from services.ingest_queue import JOB_FILENAME, LOCK_FILENAME, QUEUED, RUNNING
+
+HOUR = 3600
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DraftIndex(tmp_path / 'drafts.sqlite3', {'quote': tmp_path / 'quote_drafts'})
+
+
+def _draft(index, draft_id, *, size=100, job=None, age=0.0):
+    """A draft folder of about ``size`` bytes, indexed as last touched ``age`` seconds ago."""
+
+    directory = index.directories['quote'] / draft_id
+    directory.mkdir(parents=True)
+    (directory / 'source.pdf').write_bytes(b'x' * size)
+    if job is None:
+        (directory / DRAFT_FILENAME).write_text('{}')
+    else:
+        (directory / JOB_FILENAME).write_text(json.dumps({'status': job}))
+    index.upsert('quote', draft_id, status=job or READY)
+    with closing(sqlite3.connect(str(index.db_path))) as conn, conn:
+        conn.execute('UPDATE drafts SET updated_at = ? WHERE draft_id = ?', (time.time() - age, draft_id))
+    return directory
+
+
+def _sweeper(index, *, ttl=HOUR, quota_bytes=0):
+    return DraftSweeper(index, ttl=ttl, quota_bytes=quota_bytes, interval=0)
+
+
+def test_removes_only_expired_drafts(index):
+    old = _draft(index, 'old', age=2 * HOUR)
+    fresh = _draft(index, 'fresh')
+    report = _sweeper(index).sweep()
+    assert report.removed == [('quote', 'old')]
+    assert report.expired == 1 and report.kept == 1
+    assert not old.exists() and fresh.exists()
+    assert [row['draft_id'] for row in index.pending()] == ['fresh']
+
+
+def test_quota_removes_least_recently_touched_first(index):
+    for number, age in enumerate([30, 20, 10]):
+        _draft(index, f'd{number}', size=1000, age=age)
+    report = _sweeper(index, ttl=0, quota_bytes=2500).sweep()
+    assert report.removed == [('quote', 'd0')]
+    assert report.expired == 0
+    assert report.reclaimed_bytes >= 1000
+
+
+def test_dry_run_keeps_everything(index):
+    old = _draft(index, 'old', age=2 * HOUR)
+    report = _sweeper(index).sweep(dry_run=True)
+    assert report.removed == [('quote', 'old')]
+    assert old.exists() and len(index.pending()) == 1
+
+
+def test_queued_job_is_never_swept(index):
+    # A job waiting for a pool thread holds no lock yet
+    queued = _draft(index, 'queued', job=QUEUED, age=2 * HOUR)
+    report = _sweeper(index, quota_bytes=1).sweep()
+    assert report.removed == []
+    assert queued.exists()
+
+
+def test_running_job_is_kept_while_its_worker_holds_the_lock(index):
+    running = _draft(index, 'running', job=RUNNING, age=2 * HOUR)
+    lock = FileLock(running / LOCK_FILENAME)
+    assert lock.acquire(blocking=False)
+    try:
+        assert _sweeper(index).sweep().removed == []
+    finally:
+        lock.release()
+    # Past the TTL with nobody holding the lock: the worker died
+    assert _sweeper(index).sweep().removed == [('quote', 'running')]
+    assert not running.exists()
+
+
+def test_running_job_within_the_ttl_is_kept_over_quota(index):
+    _draft(index, 'running', job=RUNNING)
+    assert _sweeper(index, quota_bytes=1).sweep().removed == []
+
+
+def test_touch_restarts_the_ttl(index):
+    _draft(index, 'opened', age=2 * HOUR)
+    index.touch('quote', 'opened')
+    assert _sweeper(index).sweep().removed == []
+
+
+def test_reconcile_picks_up_folders_made_out_of_band(index):
+    directory = index.directories['quote'] / 'stray'
+    directory.mkdir(parents=True)
+    (directory / DRAFT_FILENAME).write_text('{}')
+    report = _sweeper(index).sweep(now=time.time() + 2 * HOUR)
+    assert report.removed == [('quote', 'stray')]
+    assert not directory.exists()
@@ -0,0 +1,145 @@
+import json
+import time
+
+import pytest
+
+from services.file_lock import FileLock
+from services.ingest_queue import DONE, FAILED, JOB_FILENAME, LOCK_FILENAME, QUEUED, RUNNING, IngestQueue, job_locked
+
+
+class PermanentError(Exception):
+    pass
+
+
+class Runner:
+    """Job runner that fails its first ``failures`` calls with ``error``."""
+
+    def __init__(self, failures=0, error=RuntimeError):
+        self.failures = failures
+        self.error = error
+        self.calls = []
+
+    def __call__(self, kind, draft_dir, job):
+        self.calls.append((kind, draft_dir.name, dict(job['params']), job_locked(draft_dir)))
+        if len(self.calls) <= self.failures:
+            raise self.error(f'attempt {len(self.calls)} failed')
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(runner, **options):
+        options.setdefault('retry_delay', 0)
+        queue = IngestQueue({'quote': tmp_path / 'quote_drafts'}, runner, **options)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        if queue._executor is not None:
+            queue._executor.shutdown(wait=True)
+
+
+def _wait(queue, draft_id, *, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.status('quote', draft_id)
+        if job and job['status'] in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {draft_id} did not finish: {queue.status("quote", draft_id)}')
+
+
+def test_job_runs_under_its_lock(make_queue):
+    runner = Runner()
+    queue = make_queue(runner)
+    queued = queue.submit('quote', 'd1', original_filename='a.pdf')
+    assert queued['status'] == QUEUED
+    job = _wait(queue, 'd1')
+    assert job['status'] == DONE and job['attempts'] == 1 and job['error'] is None
+    assert runner.calls == [('quote', 'd1', {'original_filename': 'a.pdf'}, True)]
+    assert set(job['timings']) == {'wait_seconds', 'attempt_seconds', 'total_seconds'}
+    queue._executor.shutdown(wait=True)
+    assert not job_locked(queue.directories['quote'] / 'd1')
+
+
+def test_transient_errors_are_retried(make_queue):
+    runner = Runner(failures=2)
+    queue = make_queue(runner, max_attempts=3)
+    queue.submit('quote', 'd1')
+    job = _wait(queue, 'd1')
+    assert job['status'] == DONE and job['attempts'] == 3 and job['error'] is None
+    assert len(job['timings']['attempt_seconds']) == 3
+
+
+def test_job_fails_once_attempts_run_out(make_queue):
+    runner = Runner(failures=5)
+    queue = make_queue(runner, max_attempts=2)
+    queue.submit('quote', 'd1')
+    job = _wait(queue, 'd1')
+    assert job['status'] == FAILED and job['attempts'] == 2
+    assert job['error'] == 'attempt 2 failed'
+
+
+def test_permanent_error_is_not_retried(make_queue):
+    runner = Runner(failures=1, error=PermanentError)
+    queue = make_queue(runner, max_attempts=3, permanent_errors=(PermanentError,))
+    queue.submit('quote', 'd1')
+    job = _wait(queue, 'd1')
+    assert job['status'] == FAILED and job['attempts'] == 1
+    assert len(runner.calls) == 1
+
+
+def test_claim_lost_to_a_probe_is_retried(make_queue):
+    runner = Runner()
+    queue = make_queue(runner, claim_retry_delay=0.05)
+    draft_dir = queue.directories['quote'] / 'd1'
+    draft_dir.mkdir(parents=True)
+    # Stands in for the sweeper's job_locked probe holding the lock as the worker claims it
+    probe = FileLock(draft_dir / LOCK_FILENAME)
+    assert probe.acquire(blocking=False)
+    queue.submit('quote', 'd1')
+    time.sleep(0.2)
+    assert queue.status('quote', 'd1')['status'] == QUEUED
+    probe.release()
+    assert _wait(queue, 'd1')['status'] == DONE
+    assert len(runner.calls) == 1
+
+
+def test_job_running_elsewhere_is_left_to_its_holder(make_queue):
+    runner = Runner()
+    queue = make_queue(runner, claim_retry_delay=0.01)
+    queue.start()
+    draft_dir = queue.directories['quote'] / 'd1'
+    draft_dir.mkdir(parents=True)
+    (draft_dir / JOB_FILENAME).write_text(json.dumps({'status': RUNNING}))
+    holder = FileLock(draft_dir / LOCK_FILENAME)
+    assert holder.acquire(blocking=False)
+    runs = []
+    run = queue._run
+    queue._run = lambda *args: runs.append(args) or run(*args)
+    try:
+        queue._executor.submit(queue._run, 'quote', 'd1').result(timeout=5)
+        time.sleep(0.1)
+        assert runs == [('quote', 'd1')]
+        assert runner.calls == []
+    finally:
+        holder.release()
+
+
+def test_start_resumes_unfinished_jobs(make_queue, tmp_path):
+    first = make_queue(Runner(), claim_retry_delay=60)
+    draft_dir = first.directories['quote'] / 'd1'
+    draft_dir.mkdir(parents=True)
+    holder = FileLock(draft_dir / LOCK_FILENAME)
+    assert holder.acquire(blocking=False)
+    first.submit('quote', 'd1')  # cannot claim it, so it stays queued
+    first._executor.shutdown(wait=True)  # as if its process died before the claim retry
+    holder.release()
+
+    runner = Runner()
+    second = make_queue(runner)
+    second.start()
+    assert _wait(second, 'd1')['status'] == DONE
+    assert len(runner.calls) == 1
@@ -0,0 +1,48 @@
+import pytest
+
+from services.json_extract import conform, extract_json_object
+
+
+def test_plain_object():
+    assert extract_json_object('  {"a": 1}\n') == {'a': 1}
+
+
+def test_object_in_prose_and_code_fence():
+    text = 'Here you go:\n```json\n{"a": {"b": "}"}}\n```\nThanks'
+    assert extract_json_object(text) == {'a': {'b': '}'}}
+
+
+def test_escaped_quotes_do_not_end_the_string():
+    assert extract_json_object('Answer: {"a": "x\\"}"}') == {'a': 'x"}'}
+
+
+def test_largest_object_wins():
+    assert extract_json_object('x {"a": 1} y {"a": 1, "b": 2}') == {'a': 1, 'b': 2}
+
+
+def test_repairs_trailing_commas_comments_and_smart_quotes():
+    text = '{"a": [1, 2,], // note\n "b": “x”}'
+    assert extract_json_object(text) == {'a': [1, 2], 'b': 'x'}
+
+
+def test_repairs_a_truncated_tail():
+    assert extract_json_object('{"a": {"b": "trunc') == {'a': {'b': 'trunc'}}
+
+
+@pytest.mark.parametrize('text', ['', 'no json here', '[1, 2]'])
+def test_raises_when_nothing_is_recoverable(text):
+    with pytest.raises(ValueError):
+        extract_json_object(text)
+
+
+def test_schema_rejects_an_unrelated_object():
+    with pytest.raises(ValueError):
+        extract_json_object('{"zzz": 1}', {'flights': list})
+
+
+def test_conform_fixes_safe_shape_slips():
+    fixed = conform(
+        {'flights': {'from': 'SYD'}, 'ref': 12, 'pax': 'two', 'notes': None, 'extra': 1},
+        {'flights': list, 'ref': str, 'pax': int, 'notes': str},
+    )
+    assert fixed == {'flights': [{'from': 'SYD'}], 'ref': '12', 'pax': None, 'notes': None, 'extra': 1}
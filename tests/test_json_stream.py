@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services import json_stream, llm_client
+from services.json_stream import JSONFieldStream
+
+ANSWER = 'Sure:\n```json\n{"client": {"name": "A, \\"B\\" {C}"}, "trip": [1, [2]], "pax": 3, "note": null}\n```'
+
+
+def _feed_all(chunks):
+    fields = JSONFieldStream()
+    closed = []
+    for chunk in chunks:
+        closed.extend(fields.feed(chunk))
+    return fields, closed
+
+
+def test_fields_close_in_order():
+    fields, closed = _feed_all([ANSWER])
+    assert closed == [
+        ('client', {'name': 'A, "B" {C}'}),
+        ('trip', [1, [2]]),
+        ('pax', 3),
+        ('note', None),
+    ]
+    assert fields.done
+
+
+@pytest.mark.parametrize('size', [1, 2, 7])
+def test_chunk_boundaries_do_not_matter(size):
+    _, whole = _feed_all([ANSWER])
+    _, split = _feed_all([ANSWER[i : i + size] for i in range(0, len(ANSWER), size)])
+    assert split == whole
+
+
+def test_field_is_emitted_as_soon_as_it_closes():
+    fields = JSONFieldStream()
+    assert fields.feed('{"client": {"name": "A"}') == [('client', {'name': 'A'})]
+    assert fields.feed(', "pax": 1') == []
+    assert fields.feed('2}') == [('pax', 12)]
+
+
+def test_unparseable_value_is_skipped():
+    _, closed = _feed_all(['{"a": nope, "b": 1}'])
+    assert closed == [('b', 1)]
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.usage = None
+        self.choices = [SimpleNamespace(delta=SimpleNamespace(content=text))]
+
+
+class _FakeClient:
+    """Stands in for the OpenAI client; records whether the HTTP stream was closed."""
+
+    def __init__(self, parts):
+        self.closed = False
+        client = self
+
+        class Stream:
+            def __iter__(self):
+                for part in parts:
+                    yield _Chunk(part)
+
+            def close(self):
+                client.closed = True
+
+        raw = SimpleNamespace(headers={}, parse=Stream)
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=lambda **kwargs: raw))
+        )
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = _FakeClient(['{"client": {"name": "A"}, ', '"pax": 2}'])
+    monkeypatch.setattr(llm_client, '_client', lambda: client)
+    return client
+
+
+def _free_slots():
+    return llm_client.scheduler._slots._value
+
+
+def test_stream_json_fields_reports_each_field(fake_client):
+    seen = []
+    response = json_stream.stream_json_fields([{'role': 'user', 'content': 'x'}], lambda key, value: seen.append(key))
+    assert seen == ['client', 'pax']
+    assert response.content == '{"client": {"name": "A"}, "pax": 2}'
+    assert fake_client.closed
+
+
+def test_failing_callback_releases_the_stream_and_slot(fake_client):
+    free = _free_slots()
+
+    def fail(key, value):
+        raise RuntimeError('preview write failed')
+
+    with pytest.raises(RuntimeError):
+        json_stream.stream_json_fields([{'role': 'user', 'content': 'x'}], fail)
+    assert fake_client.closed
+    assert _free_slots() == free
+
+
+def test_abandoned_chat_stream_releases_the_stream_and_slot(fake_client):
+    free = _free_slots()
+    deltas = iter(llm_client.chat_stream([{'role': 'user', 'content': 'x'}]))
+    assert next(deltas) == '{"client": {"name": "A"}, '
+    assert _free_slots() == free - 1
+    deltas.close()
+    assert fake_client.closed
+    assert _free_slots() == free
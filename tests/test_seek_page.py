@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+
+from services.lead_index import decode_cursor, encode_cursor, seek_page
+
+COLUMNS = ('name_sort', 'record_id')
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE leads (kind TEXT, record_id TEXT, name_sort TEXT, payload TEXT)')
+    conn.execute('CREATE INDEX leads_by_name ON leads (kind, name_sort, record_id)')
+    # Two rows per name, so ties are broken by record_id
+    rows = [('quote', f'r{i:02d}', f'name{i // 2:02d}', f'{{"id": "r{i:02d}"}}') for i in range(10)]
+    rows.append(('booking', 'b01', 'name00', '{"id": "b01"}'))
+    conn.executemany('INSERT INTO leads VALUES (?, ?, ?, ?)', rows)
+    yield conn
+    conn.close()
+
+
+def _page(conn, **kwargs):
+    options = dict(
+        table='leads', payload='payload', where='kind = ?', params=['quote'],
+        columns=COLUMNS, descending=False, limit=4,
+    )
+    options.update(kwargs)
+    return seek_page(conn, **options)
+
+
+def _ids(page):
+    return [row['id'] for row in page.rows]
+
+
+def test_cursor_round_trip():
+    token = encode_cursor(['Smith', 'r01'])
+    assert '=' not in token
+    assert decode_cursor(token, 2) == ['Smith', 'r01']
+
+
+@pytest.mark.parametrize('token', [None, '', 'not a cursor', encode_cursor(['a']), encode_cursor(['a', 1])])
+def test_bad_cursor_is_ignored(token):
+    assert decode_cursor(token, 2) is None
+
+
+def test_first_page_has_only_next_cursor(conn):
+    page = _page(conn)
+    assert _ids(page) == ['r00', 'r01', 'r02', 'r03']
+    assert page.next_cursor is not None
+    assert page.prev_cursor is None
+
+
+def test_forward_walk_visits_every_row_once(conn):
+    seen, after = [], None
+    while True:
+        page = _page(conn, after=after)
+        seen.extend(_ids(page))
+        if page.next_cursor is None:
+            break
+        after = page.next_cursor
+    assert seen == [f'r{i:02d}' for i in range(10)]
+    assert _ids(page) == ['r08', 'r09']
+    assert page.prev_cursor is not None
+
+
+def test_previous_cursor_returns_the_page_before(conn):
+    second = _page(conn, after=_page(conn).next_cursor)
+    third = _page(conn, after=second.next_cursor)
+    back = _page(conn, before=third.prev_cursor)
+    assert _ids(back) == _ids(second)
+    assert back.next_cursor == second.next_cursor
+    assert back.prev_cursor == second.prev_cursor
+
+
+def test_walking_back_past_the_start_returns_the_first_page(conn):
+    # Only r00 precedes r01, so the fresh first page is served instead of a one-row page
+    back = _page(conn, before=encode_cursor(['name00', 'r01']))
+    assert _ids(back) == ['r00', 'r01', 'r02', 'r03']
+    assert back.prev_cursor is None
+    assert back.next_cursor is not None
+
+
+def test_descending_order(conn):
+    first = _page(conn, descending=True)
+    assert _ids(first) == ['r09', 'r08', 'r07', 'r06']
+    second = _page(conn, descending=True, after=first.next_cursor)
+    assert _ids(second) == ['r05', 'r04', 'r03', 'r02']
+    assert _ids(_page(conn, descending=True, before=second.prev_cursor)) == _ids(first)
+
+
+def test_filters_apply_alongside_the_cursor(conn):
+    page = _page(conn, params=['booking'], after=encode_cursor(['name00', 'a']))
+    assert _ids(page) == ['b01']
+    assert page.next_cursor is None
+
+
+def test_empty_result(conn):
+    page = _page(conn, params=['enquiry'])
+    assert page.rows == [] and page.next_cursor is None and page.prev_cursor is None
@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+from services.todo_dates import find_due_date, has_date_words
+
+TODAY = date(2026, 10, 18)  # a Sunday
+
+
+@pytest.mark.parametrize(
+    'text, due, task',
+    [
+        ('Chase deposit 12-03-2026', '12-03-2026', 'Chase deposit'),
+        ('Chase deposit by 12/03/2026.', '12-03-2026', 'Chase deposit'),
+        ('Send invoice 2026-11-02', '02-11-2026', 'Send invoice'),
+        ('Call back tomorrow', '19-10-2026', 'Call back'),
+        ('Call back day after tomorrow', '20-10-2026', 'Call back'),
+        ('Send EOD', '18-10-2026', 'Send'),
+        ('Follow up next Friday', '23-10-2026', 'Follow up'),
+        ('Follow up on Friday about seats', '23-10-2026', 'Follow up about seats'),
+        ('Final docs end of May', '31-05-2027', 'Final docs'),
+        ('Final docs end of December', '31-12-2026', 'Final docs'),
+        ('Balance due mid June 2027', '15-06-2027', 'Balance due'),
+        ('Send docs end of next month', '30-11-2026', 'Send docs'),
+        ('Review in 2 weeks', '01-11-2026', 'Review'),
+        ('Review in a fortnight', '01-11-2026', 'Review'),
+        ('Check visas in three months', '18-01-2027', 'Check visas'),
+        ('Ticketing 3rd March', '03-03-2027', 'Ticketing'),
+        ('Ticketing March 3, 2027', '03-03-2027', 'Ticketing'),
+        ('Passports June 2027', '01-06-2027', 'Passports'),
+        ('Call 5/11', '05-11-2026', 'Call'),
+        ('Chase $1200 deposit 12-03-2026', '12-03-2026', 'Chase $1200 deposit'),
+        ('Client may call 20-10-2026', '20-10-2026', 'Client may call'),
+        ('Send marketing pack 12-03-2026', '12-03-2026', 'Send marketing pack'),
+    ],
+)
+def test_resolves_locally(text, due, task):
+    found = find_due_date(text, TODAY)
+    assert found is not None
+    assert found.formatted == due
+    assert found.task == task
+
+
+@pytest.mark.parametrize(
+    'text',
+    [
+        'Call client',
+        'Call before Easter',
+        'Sometime late May',
+        'Remind in June',
+        'Deposit 31-02-2026',
+        'Chase deposit 12-03-2026 or 14-03-2026',
+        'Call next week or the week after',
+    ],
+)
+def test_leaves_ambiguous_text_to_the_assistant(text):
+    assert find_due_date(text, TODAY) is None
+
+
+def test_next_weekday_within_the_same_week_is_ambiguous():
+    thursday = date(2026, 10, 22)
+    assert find_due_date('Follow up next Friday', thursday) is None
+    assert find_due_date('Follow up on Friday', thursday).formatted == '23-10-2026'
+
+
+def test_date_words():
+    assert has_date_words('Remind in June')
+    assert has_date_words('Back in a few days')
+    assert not has_date_words('Call client')
+    assert not has_date_words('Client may call')
+    assert not has_date_words('Good day to call')